@@ -0,0 +1,285 @@
+import argparse
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+from sqlalchemy import select, literal, exists, table, column, text
+from sqlalchemy.orm import Session
+
+from sql_engine import create_sqlite_engine
+from sql_import_offers import ImportSink
+from sql_models import (
+    Offer, ExperienceLevel, WorkplaceType, WorkingTime, Company, Location, Skill, Language,
+    EmploymentType, RequiredSkillAssociation, NiceToHaveSkillAssociation,
+    LanguageAssociation, OfferLocationAssociation
+)
+
+try:
+    import duckdb
+except ImportError:  # opcjonalna zależność – bez niej baza analityczna jest wyłączona
+    duckdb = None
+
+load_dotenv()
+
+# Analityczna kopia ofert w DuckDB (kolumnowo, zapytania wielowątkowe).
+# SQLite pozostaje bazą źródłową – DuckDB jest zasilana tymi samymi
+# znormalizowanymi rekordami podczas importu (DuckDBSink), a braki są
+# uzupełniane z SQLite (sync_from_sqlite) po id oferty.
+DUCKDB_PATH = os.getenv("DUCKDB_PATH")
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "0"))
+SYNC_BATCH = 10000
+
+SALARY_COLUMNS = [
+    "type", "currency", "unit", "gross", "from_amount", "to_amount",
+    "from_pln", "to_pln", "from_usd", "to_usd", "from_eur", "to_eur",
+    "from_gbp", "to_gbp", "from_chf", "to_chf",
+]
+# waluty przeliczonych widełek (kolumny from_<waluta>/to_<waluta>)
+SALARY_CURRENCIES = tuple(column[len("from_"):] for column in SALARY_COLUMNS
+                          if column.startswith("from_") and column != "from_amount")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS offers (
+        offer_id BIGINT PRIMARY KEY,
+        original_id VARCHAR,
+        title VARCHAR,
+        published_at TIMESTAMP,
+        category_id INTEGER,
+        experience_level VARCHAR,
+        workplace_type VARCHAR,
+        working_time VARCHAR,
+        company VARCHAR
+    )""",
+    "CREATE TABLE IF NOT EXISTS offer_skills (offer_id BIGINT, skill VARCHAR, required BOOLEAN)",
+    """CREATE TABLE IF NOT EXISTS offer_locations (
+        offer_id BIGINT, city VARCHAR, street VARCHAR, latitude DOUBLE, longitude DOUBLE, is_main BOOLEAN
+    )""",
+    "CREATE TABLE IF NOT EXISTS offer_languages (offer_id BIGINT, code VARCHAR, level VARCHAR)",
+    """CREATE TABLE IF NOT EXISTS offer_salaries (
+        offer_id BIGINT, type VARCHAR, currency VARCHAR, unit VARCHAR, gross BOOLEAN,
+        from_amount DOUBLE, to_amount DOUBLE,
+        from_pln DOUBLE, to_pln DOUBLE, from_usd DOUBLE, to_usd DOUBLE, from_eur DOUBLE, to_eur DOUBLE,
+        from_gbp DOUBLE, to_gbp DOUBLE, from_chf DOUBLE, to_chf DOUBLE
+    )""",
+]
+
+INSERTS = {
+    "offers": "INSERT OR IGNORE INTO offers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "offer_skills": "INSERT INTO offer_skills VALUES (?, ?, ?)",
+    "offer_locations": "INSERT INTO offer_locations VALUES (?, ?, ?, ?, ?, ?)",
+    "offer_languages": "INSERT INTO offer_languages VALUES (?, ?, ?)",
+    "offer_salaries": f"INSERT INTO offer_salaries VALUES ({', '.join(['?'] * (len(SALARY_COLUMNS) + 1))})",
+}
+
+###########################################
+def is_enabled(path: str = DUCKDB_PATH) -> bool:
+    return bool(path) and duckdb is not None
+###########################################
+def connect(path: str = DUCKDB_PATH, read_only: bool = False):
+    if duckdb is None:
+        raise RuntimeError("Brak pakietu duckdb – zainstaluj go, aby korzystać z bazy analitycznej")
+    conn = duckdb.connect(path, read_only=read_only)
+    if DUCKDB_THREADS:
+        conn.execute(f"SET threads = {DUCKDB_THREADS}")
+    if not read_only:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+###########################################
+def _write_rows(conn, rows: dict):
+    # Cała partia w jednej transakcji DuckDB – albo wszystkie tabele, albo nic
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        for table, table_rows in rows.items():
+            if table_rows:
+                conn.executemany(INSERTS[table], table_rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+###########################################
+def _empty_rows() -> dict:
+    return {table: [] for table in INSERTS}
+
+###########################################
+class DuckDBSink(ImportSink):
+    # Zapis do DuckDB dopiero po commicie SQLite – baza analityczna nigdy
+    # nie zawiera ofert, których nie ma w bazie źródłowej
+    def __init__(self, path: str = DUCKDB_PATH):
+        self.conn = connect(path)
+        self.rows = _empty_rows()
+        self.count = 0
+        self.failed = False
+    ####################################################
+    def add(self, record, offer_id: int):
+        if self.failed:
+            return
+        self.rows["offers"].append((
+            offer_id, record.original_id, record.title, record.published_at, record.category_id,
+            record.experience_level, record.workplace_type, record.working_time, record.company_name,
+        ))
+        for skill in dict.fromkeys(record.required_skills):
+            self.rows["offer_skills"].append((offer_id, skill, True))
+        for skill in dict.fromkeys(record.nice_skills):
+            self.rows["offer_skills"].append((offer_id, skill, False))
+        seen = set()
+        for loc in record.locations:
+            location = (loc.city, loc.street, loc.latitude, loc.longitude, loc.is_main)
+            if location not in seen:
+                seen.add(location)
+                self.rows["offer_locations"].append((offer_id, *location))
+        for code, level in record.languages:
+            self.rows["offer_languages"].append((offer_id, code, level))
+        for salary in record.salaries:
+            self.rows["offer_salaries"].append((offer_id, *(getattr(salary, name) for name in SALARY_COLUMNS)))
+    ####################################################
+    def commit(self):
+        offers = len(self.rows["offers"])
+        if not offers:
+            return
+        try:
+            _write_rows(self.conn, self.rows)
+            self.count += offers
+        except Exception as e:
+            # po błędzie nie zapisujemy już nic w tym przebiegu – brakujące oferty
+            # uzupełni sync_from_sqlite po imporcie
+            logging.error(f"❌ Błąd zapisu {offers} ofert do DuckDB: {e}")
+            self.failed = True
+        self.rows = _empty_rows()
+    ####################################################
+    def rollback(self):
+        self.rows = _empty_rows()
+    ####################################################
+    def close(self):
+        self.conn.close()
+        logging.info(f"🦆 DuckDB: dopisano {self.count} ofert")
+
+###########################################
+# id ofert obecnych w DuckDB, skopiowane do tabeli tymczasowej połączenia SQLite
+DUCKDB_IDS = table("duckdb_offer_ids", column("offer_id"), schema="temp")
+
+###########################################
+def _missing(offer_id_column):
+    # anty-złączenie: oferty, których nie ma w DuckDB (także starsze niż najnowsze z DuckDB)
+    return ~exists().where(DUCKDB_IDS.c.offer_id == offer_id_column)
+###########################################
+def _sync_queries() -> dict:
+    return {
+        "offers": select(
+            Offer.id, Offer.original_id, Offer.title, Offer.published_at, Offer.category_id,
+            ExperienceLevel.name, WorkplaceType.name, WorkingTime.name, Company.name,
+        ).join(ExperienceLevel, Offer.experience_level_id == ExperienceLevel.id)
+         .join(WorkplaceType, Offer.workplace_type_id == WorkplaceType.id)
+         .join(WorkingTime, Offer.working_time_id == WorkingTime.id)
+         .join(Company, Offer.company_id == Company.id)
+         .where(_missing(Offer.id)).order_by(Offer.id),
+        "offer_skills": select(RequiredSkillAssociation.offer_id, Skill.name, literal(True))
+         .join(Skill, RequiredSkillAssociation.skill_id == Skill.id)
+         .where(_missing(RequiredSkillAssociation.offer_id))
+         .union_all(
+             select(NiceToHaveSkillAssociation.offer_id, Skill.name, literal(False))
+             .join(Skill, NiceToHaveSkillAssociation.skill_id == Skill.id)
+             .where(_missing(NiceToHaveSkillAssociation.offer_id))
+         ),
+        "offer_locations": select(
+            OfferLocationAssociation.offer_id, Location.city, Location.street,
+            Location.latitude, Location.longitude, Location.is_main,
+        ).join(Location, OfferLocationAssociation.location_id == Location.id)
+         .where(_missing(OfferLocationAssociation.offer_id)),
+        "offer_languages": select(LanguageAssociation.offer_id, Language.code, Language.level)
+         .join(Language, LanguageAssociation.language_id == Language.id)
+         .where(_missing(LanguageAssociation.offer_id)),
+        "offer_salaries": select(EmploymentType.offer_id, *(getattr(EmploymentType, name) for name in SALARY_COLUMNS))
+         .where(_missing(EmploymentType.offer_id)),
+    }
+###########################################
+def _load_duckdb_ids(conn, session: Session):
+    # sesja nie jest zatwierdzana – tabela tymczasowa znika z wycofaniem transakcji przy zamknięciu
+    session.execute(text("CREATE TEMP TABLE IF NOT EXISTS duckdb_offer_ids (offer_id INTEGER PRIMARY KEY)"))
+    session.execute(text("DELETE FROM temp.duckdb_offer_ids"))
+    conn.execute("SELECT offer_id FROM offers")
+    while True:
+        batch = conn.fetchmany(SYNC_BATCH)
+        if not batch:
+            break
+        session.execute(text("INSERT INTO temp.duckdb_offer_ids (offer_id) VALUES (:offer_id)"),
+                        [{"offer_id": row[0]} for row in batch])
+###########################################
+def sync_from_sqlite(engine, path: str = DUCKDB_PATH) -> int:
+    # Dopisanie ofert z SQLite, których brakuje w DuckDB (pierwsze zasilenie istniejącej
+    # bazy, braki po błędach zapisu, oferty z importów bez DuckDBSink, np. jobs_replay)
+    conn = connect(path)
+    try:
+        with Session(bind=engine) as session:
+            _load_duckdb_ids(conn, session)
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                synced = 0
+                for table_name, query in _sync_queries().items():
+                    result = session.execute(query)
+                    while True:
+                        batch = result.fetchmany(SYNC_BATCH)
+                        if not batch:
+                            break
+                        conn.executemany(INSERTS[table_name], [tuple(row) for row in batch])
+                        if table_name == "offers":
+                            synced += len(batch)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logging.info(f"🦆 Zsynchronizowano DuckDB z SQLite: {synced} brakujących ofert")
+        return synced
+    finally:
+        conn.close()
+
+###########################################
+def skill_demand(conn, months: int = 12):
+    # Liczba ofert wymagających danej umiejętności w kolejnych miesiącach
+    return conn.execute("""
+        SELECT date_trunc('month', o.published_at) AS month, s.skill, count(*) AS offers
+        FROM offer_skills s JOIN offers o USING (offer_id)
+        WHERE s.required AND o.published_at >= current_date - to_months(?)
+        GROUP BY ALL ORDER BY month, offers DESC
+    """, [months]).fetchall()
+###########################################
+def salary_by_skill(conn, currency: str = "pln", min_offers: int = 20):
+    # Mediana widełek (środek przedziału, w przeliczeniu na walutę) dla umiejętności;
+    # waluta trafia do nazwy kolumny, więc tylko ze znanej listy
+    currency = currency.lower()
+    if currency not in SALARY_CURRENCIES:
+        raise ValueError(f"Nieznana waluta: {currency} (dostępne: {', '.join(SALARY_CURRENCIES)})")
+    return conn.execute(f"""
+        SELECT s.skill, o.experience_level, count(*) AS offers,
+               median((e.from_{currency} + e.to_{currency}) / 2) AS median_salary
+        FROM offer_salaries e
+        JOIN offers o USING (offer_id)
+        JOIN offer_skills s USING (offer_id)
+        WHERE s.required AND e.unit = 'month' AND e.from_{currency} IS NOT NULL
+        GROUP BY ALL HAVING count(*) >= ? ORDER BY median_salary DESC
+    """, [min_offers]).fetchall()
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analityczna baza DuckDB z ofertami (synchronizacja z SQLite)")
+    parser.add_argument("--duckdb", default=DUCKDB_PATH, help="ścieżka pliku DuckDB (domyślnie DUCKDB_PATH)")
+    parser.add_argument("--sqlite", default="sqlite:///data/sql/jobs.sqlite", help="URL bazy SQLite")
+    parser.add_argument("--query", help="zapytanie SQL do wykonania po synchronizacji")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    if not args.duckdb:
+        parser.error("podaj --duckdb albo ustaw DUCKDB_PATH")
+
+    engine = create_sqlite_engine(args.sqlite)
+    sync_from_sqlite(engine, args.duckdb)
+    engine.dispose()
+
+    if args.query:
+        conn = connect(args.duckdb, read_only=True)
+        for row in conn.execute(args.query).fetchall():
+            print(*row, sep="\t")
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,12 +12,19 @@ from scheduler import TaskScheduler
 from datetime import datetime, timedelta
 import shutil
 import os
-from sqlalchemy import create_engine, text
+import sys
 from sqlalchemy.orm import sessionmaker
-from sql_models import Base
-from sql_import_offers import import_offers_from_jsonl
+from sql_import_offers import import_offers_from_jsonl, replay_dead_letters
+from sql_dead_letter import DEAD_LETTER_PATH
 from sql_import_s3 import import_all_from_s3
-from sqlalchemy import create_engine
+from sql_engine import create_sqlite_engine, finish_sqlite
+from sql_migrate import migrate
+import analytics_duckdb
+from sql_aggregates import AggregateSink, ensure_aggregates
+from sql_search import SearchSink, sync_search_index
+from sqlite_sync import SqliteChunkSync
+from backup_store import BackupStore
+from metrics import job_metrics
 
 
 
@@ -37,12 +44,28 @@ RAW_DATA_FOLDER.mkdir(exist_ok=True)
 
 SQL_FILE_NAME = "jobs.sqlite"
 SQL_DATABASE_URL = f"sqlite:///{SQL_DATAFOLDER}/{SQL_FILE_NAME}"
+FAILED_PREFIX = "jobs/sql/offers_failed_"
+# maks. losowa przerwa (s) między stronami listy ofert; 0 – bez przerw
+DOWNLOAD_PAGE_DELAY = int(os.getenv("DOWNLOAD_PAGE_DELAY", "15"))
 
 log = LogManager("main.log")
 
 # scheduler = TaskScheduler()
 
 ##########################################################################################
+def pull_sqlite(s3, sync, local_path, s3_key) -> bool:
+    # Pobranie bazy porcjami (tylko zmienione części pliku). Dopóki w S3 nie ma
+    # wersji porcjowanych – jednorazowo pełny plik spod dotychczasowego klucza.
+    pulled = sync.pull(local_path)
+    if pulled is not None:
+        return pulled
+    if local_path.exists() and s3.is_sqlite_up_to_date(str(local_path), s3_key):
+        logging.info("✅ Lokalna baza danych jest aktualna – pomijam pobieranie")
+        return True
+    return s3.download_sqlite_db(s3_key, str(local_path))
+
+##########################################################################################
+@job_metrics("download")
 def jobs_download(ppage=100):
     log_download = LogManager("justjoinit.log")
     s3 = S3Client()
@@ -51,7 +74,7 @@ def jobs_download(ppage=100):
     logging.info("Pobieranie ofert z JustJoin.it")
     jjc = JustJoinClient(offers_per_page=ppage)
     current_page = 1
-    sleep = 15
+    sleep = DOWNLOAD_PAGE_DELAY
     pages_total = 0
     pages_readed = 0
     offers_total = 0
@@ -90,8 +113,9 @@ def jobs_download(ppage=100):
         current_page = next_page
 
         # Pauza, aby nie przeciążać serwera (opcjonalnie)
-        rsleep = random.randint(1, sleep)
-        time.sleep(rsleep)
+        if sleep > 0:
+            rsleep = random.randint(1, sleep)
+            time.sleep(rsleep)
         
     end_text = f"Zakończono pobieranie ofert z JustJoin.it: wczytano {offers_readed} ofert z {pages_readed} stron. Zapisano {offers_saved} ofert, pominięto {offers_skipped} duplikatów."
     logging.info(end_text)  
@@ -101,6 +125,7 @@ def jobs_download(ppage=100):
         notifier.send("Logi przesłane do S3")
     return True
 #####################################################
+@job_metrics("sql")
 def jobs_sql():
     log_sql = LogManager("sql.log")
     s3 = S3Client()
@@ -112,63 +137,77 @@ def jobs_sql():
     # s3_key = f"jobs/sql/jobs.sqlite"
     s3_key = f"jobs/sql/{SQL_FILE_NAME}"
 
-    # ✅ 1. Czy plik lokalny istnieje?
-    if local_path.exists():
-        # 🔄 1a. Backup lokalnej bazy do S3
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-        backup_key = f"jobs/sql/backup/jobs_local_{timestamp}.sqlite"
-        s3.upload_file(str(local_path), backup_key)
-        logging.info(f"🛡 Wysłano backup lokalnej bazy do S3: {backup_key}")
-
-        # 🔍 1b. Porównanie MD5 z wersją w S3
-        if s3.is_sqlite_up_to_date(str(local_path), s3_key):
-            logging.info("✅ Lokalna baza danych jest aktualna – pomijam pobieranie")
-        else:
-            logging.info("📦 Baza lokalna nieaktualna – pobieram z S3")
-            if not s3.download_sqlite_db(s3_key, str(local_path)):
-                logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – nadpisuję lokalną pustą bazą")
-                local_path.touch()
-    else:
-        # ❗ Plik lokalny nie istnieje – tworzymy nowy
-        logging.warning("📄 Brak lokalnej bazy – tworzę nową lokalną bazę danych")
+    sync = SqliteChunkSync(s3)
+
+    # ✅ 1. Czy plik lokalny istnieje? (jedyna kopia zadania to wersja wysłana po imporcie)
+    if not local_path.exists():
+        logging.warning("📄 Brak lokalnej bazy – pobieram z S3")
         local_path.parent.mkdir(parents=True, exist_ok=True)
-        if not s3.download_sqlite_db(s3_key, str(local_path)):
-            logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – tworzę nową lokalną bazę danych")
-            local_path.touch()
+
+    # 🔍 1b. Pobranie porcji różniących się od wersji w S3
+    if not pull_sqlite(s3, sync, local_path, s3_key):
+        logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – używam lokalnej (lub nowej pustej) bazy")
+        local_path.touch()
     
     # Utworzenie sesji SQLAlchemy i importowanie danych
-    engine = create_engine(SQL_DATABASE_URL)
+    engine = create_sqlite_engine(SQL_DATABASE_URL, profile="import")
     Session = sessionmaker(bind=engine)
     session = Session()
 
-    Base.metadata.create_all(engine)
+    migrate(engine)
+    ensure_aggregates(session)
+    sync_search_index(session)
+    # Tabele zagregowane i indeks wyszukiwania aktualizowane w transakcji
+    # importu; opcjonalnie analityczna kopia w DuckDB (DUCKDB_PATH)
+    sinks = [AggregateSink(), SearchSink()]
+    if analytics_duckdb.is_enabled():
+        # 🦆 najpierw braki z poprzednich przebiegów (pierwsze włączenie DuckDB, jobs_replay);
+        # DuckDBSink tylko, gdy baza analityczna jest już zgodna z SQLite
+        try:
+            analytics_duckdb.sync_from_sqlite(engine)
+            sinks.append(analytics_duckdb.DuckDBSink())
+        except Exception as e:
+            logging.error(f"Synchronizacja DuckDB przed importem nie powiodła się – import bez DuckDB: {e}")
     try:
-        files_total, files_imported, files_skipped, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate = import_all_from_s3(session)
+        # raz w tygodniu lista plików z manifestu jest uzgadniana z zawartością bucketu
+        reconcile = datetime.today().weekday() == 6
+        files_total, files_imported, files_skipped, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate = import_all_from_s3(session, reconcile=reconcile, sinks=sinks)
         logging.info("SQL import completed successfully")
     except Exception as e:
         logging.error(f"SQL import failed: {e}")
     finally:
         session.close()
-        engine.dispose()
+        for sink in sinks:
+            sink.close()
+
+    # 🦆 Uzupełnienie bazy analitycznej o oferty, których nie zapisał DuckDBSink (błąd zapisu)
+    # albo całego importu, gdy synchronizacja przed nim się nie powiodła
+    if analytics_duckdb.is_enabled():
+        try:
+            analytics_duckdb.sync_from_sqlite(engine)
+        except Exception as e:
+            logging.error(f"Synchronizacja DuckDB nie powiodła się: {e}")
+    finish_sqlite(engine, analyze=True)
 
     # Zapisanie pliku SQLite z powrotem na S3
-    if not s3.upload_sqlite_db(s3_key, local_path, backup_prefix="jobs/sql/backup"):
+    # nowa wersja w S3 – poprzednie zostają do odtworzenia (sqlite_sync.py pull --version)
+    if not sync.push(local_path):
         logging.error("Nie udało się wysłać pliku SQLite na S3")
         return
+    # 🧹 retencja kopii (godzinowe / dzienne / tygodniowe) i usunięcie nieużywanych porcji
+    BackupStore(sync).maintain()
 
     # Po zakończeniu sprawdź, czy istnieje plik błędów i wyślij go do S3
-    failed_path = "offers_failed.jsonl"
+    failed_path = DEAD_LETTER_PATH
     if os.path.exists(failed_path):
-        today = datetime.today()  # Define the current date
-        failed_key = f"jobs/sql/offers_failed_{today.strftime('%Y%m%d')}.jsonl"
-        s3.upload_file(failed_path, failed_key)
+        # import działa kilka razy dziennie – godzina w nazwie, żeby nie nadpisać wcześniejszego pliku
+        failed_key = f"{FAILED_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M')}.jsonl"
         if s3.upload_file(failed_path, failed_key):
             logging.info(f"📤 Wysłano plik błędów do S3: {failed_key}")
             os.remove(failed_path)
             logging.info("🗑 Usunięto lokalny plik błędów")
 
 
-
     end_text = f"Zakończono import ofert z S3: wczytano {files_imported} plików z {files_total} plików. Zapisano {offers_ok} ofert, pominięto {offers_duplikate} duplikatów, {offers_failed} błędów."
     logging.info(end_text) 
     notifier.send(end_text) 
@@ -177,6 +216,90 @@ def jobs_sql():
         notifier.send("Logi sql przesłane do S3")
     return True
 #####################################################
+def jobs_download_sql():
+    # Import przyrostowy pobiera tylko nowe linie, więc SQL można uruchomić
+    # od razu po pobraniu ofert, zamiast czekać na kolejny dzień
+    jobs_download()
+    jobs_sql()
+#####################################################
+@job_metrics("replay")
+def jobs_replay():
+    # Ponowny import linii z plików błędów (lokalnego i archiwalnych w S3),
+    # uruchamiany ręcznie po poprawce importera: python app.py replay
+    log_replay = LogManager("sql.log")
+    s3 = S3Client()
+    notifier = DiscordNotifier()
+    logging.info("Ponowny import błędnych linii")
+
+    local_path = SQL_DATAFOLDER / SQL_FILE_NAME
+    s3_key = f"jobs/sql/{SQL_FILE_NAME}"
+    sync = SqliteChunkSync(s3)
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    if not pull_sqlite(s3, sync, local_path, s3_key):
+        logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – przerywam działanie")
+        return False
+
+    engine = create_sqlite_engine(SQL_DATABASE_URL, profile="import")
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    migrate(engine)
+
+    replay_dir = SQL_DATAFOLDER / "replay"
+    replay_dir.mkdir(exist_ok=True)
+    replayed_ok = replayed_failed = replayed_total = 0
+    # Pliki błędów (lokalny i z S3) są odtwarzane z kopii w replay_dir – oryginały
+    # podmieniamy dopiero po wysłaniu bazy, inaczej nieudany push zgubiłby linie
+    local_failed = Path(DEAD_LETTER_PATH)
+    sources = []
+    try:
+        if local_failed.exists():
+            local_copy = replay_dir / f"local_{local_failed.name}"
+            shutil.copyfile(local_failed, local_copy)
+            sources.append((local_copy, None))
+        for failed_key in s3.list_keys(FAILED_PREFIX):
+            failed_path = replay_dir / failed_key.split("/")[-1]
+            response = s3.get_file(failed_key)
+            if not response:
+                continue
+            failed_path.write_bytes(response["Body"].read())
+            sources.append((failed_path, failed_key))
+
+        for failed_path, failed_key in sources:
+            lines_ok, lines_failed, lines_duplikate, lines_total = replay_dead_letters(failed_path, session, sinks=[AggregateSink(), SearchSink()])
+            replayed_ok += lines_ok + lines_duplikate
+            replayed_failed += lines_failed
+            replayed_total += lines_total
+    finally:
+        session.close()
+        finish_sqlite(engine, analyze=True)
+
+    # nowa wersja w S3 – poprzednie zostają do odtworzenia (sqlite_sync.py pull --version)
+    if not sync.push(local_path):
+        logging.error("Nie udało się wysłać pliku SQLite na S3 – pliki błędów zostają bez zmian")
+        for failed_path, _ in sources:
+            failed_path.unlink(missing_ok=True)
+        return False
+
+    # w plikach błędów zostaje tylko to, czego nadal nie da się zaimportować
+    for failed_path, failed_key in sources:
+        if failed_key is None:
+            if failed_path.exists():
+                failed_path.replace(local_failed)
+            else:
+                local_failed.unlink(missing_ok=True)
+        elif failed_path.exists():
+            if s3.upload_file(str(failed_path), failed_key):
+                failed_path.unlink()
+        else:
+            s3.delete_file(failed_key)
+
+    end_text = f"Zakończono ponowny import błędnych linii: {replayed_total} linii, zaimportowano {replayed_ok}, nadal błędne: {replayed_failed}."
+    logging.info(end_text)
+    notifier.send(end_text)
+    log_replay.upload_logs_s3(s3, backup_type="sql")
+    return True
+#####################################################
+@job_metrics("scraper")
 def jobs_scraper():
     log_scraper = LogManager("scraper.log")
     s3 = S3Client()
@@ -189,36 +312,26 @@ def jobs_scraper():
     # s3_key = "jobs/sql/jobs.sqlite"
     s3_key = f"jobs/sql/{SQL_FILE_NAME}"
 
+    sync = SqliteChunkSync(s3)
+
     # ✅ Sprawdzenie lokalnej bazy danych
-    if local_path.exists():
-        # 🔄 Backup lokalnej bazy do S3
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-        backup_key = f"jobs/sql/backup/jobs_local_{timestamp}.sqlite"
-        s3.upload_file(str(local_path), backup_key)
-        logging.info(f"🛡 Wysłano backup lokalnej bazy do S3: {backup_key}")
-
-        # 🔍 Porównanie MD5 z wersją w S3
-        if s3.is_sqlite_up_to_date(str(local_path), s3_key):
-            logging.info("✅ Lokalna baza danych jest aktualna – pomijam pobieranie")
-        else:
-            logging.info("📦 Baza lokalna nieaktualna – pobieram z S3")
-            if not s3.download_sqlite_db(s3_key, str(local_path)):
-                logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – przerywam działanie")
-                raise SystemExit(1)
-    else:
-        # ❗ Plik lokalny nie istnieje – próbujemy pobrać z S3
+    if not local_path.exists():
         logging.warning("📄 Brak lokalnej bazy – próbuję pobrać z S3")
         local_path.parent.mkdir(parents=True, exist_ok=True)
-        if not s3.download_sqlite_db(s3_key, str(local_path)):
-            logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – przerywam działanie")
-            raise SystemExit(1)
+
+    # 🔍 Pobranie porcji różniących się od wersji w S3
+    if not pull_sqlite(s3, sync, local_path, s3_key):
+        logging.error("❌ Nie udało się pobrać pliku SQLite z S3 – przerywam działanie")
+        raise SystemExit(1)
 
     # Utworzenie sesji SQLAlchemy i importowanie danych
-    engine = create_engine(SQL_DATABASE_URL)
+    engine = create_sqlite_engine(SQL_DATABASE_URL, profile="scraper")
     Session = sessionmaker(bind=engine)
     session = Session()
 
-    Base.metadata.create_all(engine)
+    migrate(engine)
+    # indeks musi zawierać tytuły przed zapisem opisów przez scraper
+    sync_search_index(session)
 
     try:
         total, success, errors, no_notes, skills_updated, skills_nice = jjc.scrape_offer_details(SQL_DATABASE_URL)
@@ -226,15 +339,20 @@ def jobs_scraper():
     except Exception as e:
         logging.error(f"Scraping failed: {e}")
         session.close()
-        engine.dispose()
+        finish_sqlite(engine)
         return
 
+    # scraper dopisuje skille – kontrola zgodności agregatu przed wysłaniem bazy
+    ensure_aggregates(session)
     session.close()
-    engine.dispose()
+    finish_sqlite(engine)
 
-    if not s3.upload_sqlite_db(s3_key, local_path, backup_prefix="jobs/sql/backup"):
+    # nowa wersja w S3 – poprzednie zostają do odtworzenia (sqlite_sync.py pull --version)
+    if not sync.push(local_path):
         logging.error("Nie udało się wysłać pliku SQLite na S3")
         return
+    # 🧹 retencja kopii (godzinowe / dzienne / tygodniowe) i usunięcie nieużywanych porcji
+    BackupStore(sync).maintain()
 
     end_text = (
         f"Zakończono scrapowanie ofert z JustJoin.it:\n"
@@ -260,7 +378,7 @@ def main():
         # Dodajemy zadanie do harmonogramu, np. codziennie o 10:00
         # print("Uruchomiono harmonogram")
         scheduler.add_daily_job("04:00", jobs_sql)
-        scheduler.add_daily_job("08:30", jobs_download)
+        scheduler.add_daily_job("08:30", jobs_download_sql)
         scheduler.add_daily_job("13:15", jobs_scraper)
         # # Uruchamiamy harmonogram
         scheduler.run_pending()
@@ -268,4 +386,7 @@ def main():
         logging.error(f"Błąd głównego zadania: {e}")
 #####################################################
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        jobs_replay()
+    else:
+        main()
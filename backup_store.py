@@ -0,0 +1,180 @@
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+from client_s3 import S3Client, ZSTD_SUFFIX
+from sqlite_sync import SqliteChunkSync
+
+load_dotenv()
+
+# Kopie zapasowe jobs.sqlite = wersje z sqlite_sync (manifesty + współdzielone
+# porcje). Tu: retencja wersji (ostatnia w każdej z N godzin / dni / tygodni),
+# usuwanie nieużywanych porcji i sprzątanie dawnych pełnych kopii z jobs/sql/backup/.
+BACKUP_KEEP_HOURLY = int(os.getenv("BACKUP_KEEP_HOURLY", "24"))
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "14"))
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY", "8"))
+# porcje młodsze niż okres karencji nie są usuwane – mogą należeć do wersji,
+# której manifest jest właśnie zapisywany
+BACKUP_GC_GRACE_HOURS = int(os.getenv("BACKUP_GC_GRACE_HOURS", "24"))
+LEGACY_BACKUP_PREFIX = "jobs/sql/backup/"
+
+_LEGACY_TS_RE = re.compile(r"_(\d{8}_\d{4})\.sqlite(\.zst)?$")
+
+###########################################
+def version_time(version: str):
+    # Wersje nazywane są RRRRMMDD_GGMMSS_<hash>
+    try:
+        return datetime.strptime(version[:15], "%Y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+###########################################
+def legacy_backup_time(key: str):
+    match = _LEGACY_TS_RE.search(key)
+    if not match:
+        return None
+    return datetime.strptime(match[1], "%Y%m%d_%H%M").replace(tzinfo=timezone.utc)
+###########################################
+def retained(times: dict, hourly: int = BACKUP_KEEP_HOURLY, daily: int = BACKUP_KEEP_DAILY,
+             weekly: int = BACKUP_KEEP_WEEKLY) -> set:
+    # Najnowsza kopia w każdym z ostatnich `hourly` godzin, `daily` dni i `weekly`
+    # tygodni (liczą się okresy, w których kopia istnieje) + zawsze najnowsza
+    ordered = sorted(times.items(), key=lambda item: item[1], reverse=True)
+    keep = {ordered[0][0]} if ordered else set()
+    for count, period in ((hourly, "%Y%m%d%H"), (daily, "%Y%m%d"), (weekly, "%G%V")):
+        seen = set()
+        for name, ts in ordered:
+            if len(seen) >= count:
+                break
+            bucket = ts.strftime(period)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(name)
+    return keep
+
+###########################################
+class BackupStore:
+    def __init__(self, sync: SqliteChunkSync):
+        self.sync = sync
+        self.client = sync.s3.s3_client
+        self.bucket = sync.s3.bucket_name
+    ####################################################
+    def _list_objects(self, prefix: str) -> list:
+        objects = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for result in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects.extend(result.get("Contents", []))
+        return objects
+    ####################################################
+    def _delete(self, keys: list) -> int:
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                "Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True,
+            })
+        return len(keys)
+    ####################################################
+    def snapshots(self) -> dict:
+        # wersja ➜ czas utworzenia
+        times = {}
+        for version in self.sync.list_versions():
+            ts = version_time(version)
+            if ts is not None:
+                times[version] = ts
+        return times
+    ####################################################
+    def prune(self, dry_run: bool = False) -> list:
+        times = self.snapshots()
+        keep = retained(times)
+        head = self.sync.load_head()
+        if head:
+            keep.add(head["version"])
+        removed = sorted(version for version in times if version not in keep)
+        if removed and not dry_run:
+            self._delete([self.sync.version_key(version) for version in removed])
+        logging.info(f"🧹 Retencja kopii bazy: zostaje {len(times) - len(removed)}, usunięto {len(removed)} wersji"
+                     + (" (próba)" if dry_run else ""))
+        return removed
+    ####################################################
+    def collect_garbage(self, grace_hours: int = BACKUP_GC_GRACE_HOURS, dry_run: bool = False) -> int:
+        # Usuwa porcje, do których nie odwołuje się żaden manifest
+        referenced = set()
+        head = self.sync.load_head()
+        if head:
+            referenced.update(head["chunks"])
+        for version in self.sync.list_versions():
+            manifest = self.sync.load_version(version)
+            if manifest is None:
+                # manifest zniknął w trakcie (równoległa retencja) – lepiej nie usuwać niczego
+                logging.warning(f"⚠️ Nie udało się wczytać wersji {version} – pomijam usuwanie porcji")
+                return 0
+            referenced.update(manifest["chunks"])
+
+        threshold = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+        data_prefix = f"{self.sync.prefix}/data/"
+        garbage = []
+        size = 0
+        for obj in self._list_objects(data_prefix):
+            chunk_hash = obj["Key"].rsplit("/", 1)[-1].removesuffix(ZSTD_SUFFIX)
+            if chunk_hash not in referenced and obj["LastModified"] < threshold:
+                garbage.append(obj["Key"])
+                size += obj.get("Size", 0)
+        if garbage and not dry_run:
+            self._delete(garbage)
+        logging.info(f"🗑 Nieużywane porcje: {len(garbage)} ({size / 1024 / 1024:.1f} MiB)"
+                     + (" (próba)" if dry_run else ""))
+        return len(garbage)
+    ####################################################
+    def prune_legacy(self, prefix: str = LEGACY_BACKUP_PREFIX, dry_run: bool = False) -> list:
+        # Pełne kopie jobs_*.sqlite sprzed sqlite_sync – ta sama retencja co dla wersji
+        times = {}
+        for obj in self._list_objects(prefix):
+            ts = legacy_backup_time(obj["Key"])
+            if ts is not None:
+                times[obj["Key"]] = ts
+        keep = retained(times)
+        removed = sorted(key for key in times if key not in keep)
+        if removed and not dry_run:
+            self._delete(removed)
+        if removed:
+            logging.info(f"🧹 Dawne pełne kopie bazy: usunięto {len(removed)} z {len(times)}"
+                         + (" (próba)" if dry_run else ""))
+        return removed
+    ####################################################
+    def maintain(self, dry_run: bool = False):
+        # Wywoływane po wysłaniu nowej wersji bazy
+        try:
+            self.prune(dry_run=dry_run)
+            self.collect_garbage(dry_run=dry_run)
+            self.prune_legacy(dry_run=dry_run)
+            return True
+        except Exception as e:
+            logging.error(f"❌ Błąd podczas porządkowania kopii bazy: {e}")
+            return False
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kopie zapasowe jobs.sqlite w S3: lista, retencja, sprzątanie porcji")
+    parser.add_argument("command", choices=["list", "prune", "gc", "maintain"])
+    parser.add_argument("--dry-run", action="store_true", help="tylko pokaż, co zostałoby usunięte")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    store = BackupStore(SqliteChunkSync(S3Client()))
+    if args.command == "list":
+        times = store.snapshots()
+        keep = retained(times)
+        for version, ts in sorted(times.items(), key=lambda item: item[1]):
+            print(version, ts.isoformat(), "zostaje" if version in keep else "do usunięcia")
+    elif args.command == "prune":
+        store.prune(dry_run=args.dry_run)
+    elif args.command == "gc":
+        store.collect_garbage(dry_run=args.dry_run)
+    else:
+        return 0 if store.maintain(dry_run=args.dry_run) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Syntetyczny korpus JSONL ofert w trzech kształtach rozróżnianych przez
+# sql_normalize.detect_version (v1 – z "guid", v2 – bez "guid", v3 – dawne
+# API z "id"/"published_at") do benchmarków importera (bench_import.py).
+# Deterministyczny dla danego seeda; część linii to powtórzenia wcześniejszych
+# ofert (ten sam original_id i published_at) – ścieżka pomijania duplikatów.
+DEFAULT_MIX = {"v1": 0.6, "v2": 0.3, "v3": 0.1}
+CATEGORY_IDS = range(1, 26)
+
+CITIES = {
+    "Warszawa": ("warszawa", 52.2297, 21.0122), "Kraków": ("krakow", 50.0647, 19.9450),
+    "Wrocław": ("wroclaw", 51.1079, 17.0385), "Gdańsk": ("gdansk", 54.3520, 18.6466),
+    "Poznań": ("poznan", 52.4064, 16.9252), "Łódź": ("lodz", 51.7592, 19.4560),
+    "Katowice": ("katowice", 50.2649, 19.0238), "Lublin": ("lublin", 51.2465, 22.5684),
+}
+SKILLS = [
+    "Python", "SQL", "AWS", "Docker", "Kubernetes", "Java", "Spring", "React", "TypeScript", "JavaScript",
+    "Git", "Linux", "C#", ".NET", "Go", "Terraform", "Azure", "GCP", "Kafka", "PostgreSQL", "C++", "Angular",
+]
+TITLES = ["Python Developer", "Data Engineer", "Java Developer", "Frontend Developer", "DevOps Engineer",
+          "QA Engineer", ".NET Developer", "Fullstack Developer", "Data Scientist", "Cloud Architect"]
+EXPERIENCE = ["junior", "mid", "senior", "c_level"]
+WORKPLACE = ["remote", "hybrid", "office"]
+WORKING_TIME = ["full_time", "part_time", "b2b", "internship"]
+CONTRACTS = ["b2b", "permanent", "mandate_contract"]
+
+###########################################
+def parse_mix(value: str) -> dict:
+    # "v1=0.6,v2=0.3,v3=0.1"
+    mix = {}
+    for part in value.split(","):
+        version, _, weight = part.partition("=")
+        if version.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Nieznana wersja w mix: {version}")
+        mix[version.strip()] = float(weight)
+    return mix
+###########################################
+def _location(rnd: random.Random):
+    city = rnd.choice(list(CITIES))
+    slug_city, lat, lon = CITIES[city]
+    return city, slug_city, round(lat + rnd.uniform(-0.05, 0.05), 6), round(lon + rnd.uniform(-0.05, 0.05), 6)
+###########################################
+def _salary(rnd: random.Random):
+    low = rnd.randrange(6000, 30000, 500)
+    return low, low + rnd.randrange(2000, 12000, 500)
+###########################################
+def offer_v2(i: int, rnd: random.Random, published: datetime) -> dict:
+    company = f"Firma {rnd.randrange(2000)}"
+    title = rnd.choice(TITLES)
+    city, slug_city, lat, lon = _location(rnd)
+    slug = f"{company.lower().replace(' ', '-')}-{title.lower().replace(' ', '-').replace('.', '')}-{slug_city}-{i}"
+    multilocation = [{"city": city, "slug": slug, "street": f"ul. Prosta {rnd.randint(1, 99)}", "latitude": lat, "longitude": lon}]
+    for n in range(rnd.choice([0, 0, 0, 1, 2])):
+        other, other_slug, other_lat, other_lon = _location(rnd)
+        multilocation.append({"city": other, "slug": f"{slug}-{other_slug}-{n}", "street": "ul. Długa 1",
+                              "latitude": other_lat, "longitude": other_lon})
+    employment = []
+    for contract in rnd.sample(CONTRACTS, rnd.randint(1, 2)):
+        low, high = _salary(rnd) if rnd.random() < 0.8 else (None, None)
+        employment.append({
+            "type": contract, "currency": "pln", "unit": "month", "gross": contract == "permanent",
+            "from": low, "to": high, "fromPln": low and float(low), "toPln": high and float(high),
+            "fromUsd": low and round(low / 4.0, 2), "toUsd": high and round(high / 4.0, 2),
+        })
+    return {
+        "slug": slug, "title": title, "requiredSkills": rnd.sample(SKILLS, rnd.randint(1, 6)),
+        "niceToHaveSkills": rnd.sample(SKILLS, rnd.randint(0, 3)) or None,
+        "workplaceType": rnd.choice(WORKPLACE), "workingTime": rnd.choice(WORKING_TIME),
+        "experienceLevel": rnd.choice(EXPERIENCE), "employmentTypes": employment,
+        "categoryId": rnd.choice(CATEGORY_IDS), "multilocation": multilocation,
+        "city": city, "street": multilocation[0]["street"], "latitude": lat, "longitude": lon,
+        "remoteInterview": rnd.random() < 0.9, "companyName": company,
+        "companyLogoThumbUrl": f"https://public.justjoin.it/companies/logos/thumb/{company.lower().replace(' ', '_')}.png",
+        "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "lastPublishedAt": published.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "expiredAt": (published + timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "openToHireUkrainians": rnd.random() < 0.5, "languages": [{"code": "en", "level": rnd.choice(["B1", "B2", "C1"])}],
+        "isSuperOffer": rnd.random() < 0.1, "promotedPosition": None,
+    }
+###########################################
+def offer_v1(i: int, rnd: random.Random, published: datetime) -> dict:
+    offer = offer_v2(i, rnd, published)
+    offer["guid"] = f"{rnd.getrandbits(32):08x}-{i >> 16 & 0xffff:04x}-4{i & 0xfff:03x}-8000-{rnd.getrandbits(48):012x}"
+    return offer
+###########################################
+def offer_v3(i: int, rnd: random.Random, published: datetime) -> dict:
+    company = f"Firma {rnd.randrange(2000)}"
+    city, slug_city, lat, lon = _location(rnd)
+    offer_id = f"{company.lower().replace(' ', '-')}-{rnd.choice(TITLES).lower().replace(' ', '-')}-{slug_city}-{i}"
+    low, high = _salary(rnd)
+    offer = {
+        "title": rnd.choice(TITLES), "street": "ul. Prosta 1", "city": city, "country_code": "PL",
+        "address_text": f"ul. Prosta 1, {city}", "marker_icon": rnd.choice(["python", "java", "devops", "data"]),
+        "workplace_type": rnd.choice(WORKPLACE), "company_name": company, "company_url": "https://example.com",
+        "company_size": f"{rnd.choice([10, 50, 200, 1000])}+", "experience_level": rnd.choice(EXPERIENCE[:3]),
+        "latitude": str(lat), "longitude": str(lon), "published_at": published.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "remote_interview": rnd.random() < 0.8, "open_to_hire_ukrainians": rnd.random() < 0.5,
+        "id": offer_id, "display_offer": True,
+        "employment_types": [{"type": rnd.choice(CONTRACTS), "salary": {"from": low, "to": high, "currency": "pln"}}],
+        "company_logo_url": "https://example.com/logo.png",
+        "skills": [{"name": name, "level": rnd.randint(1, 5)} for name in rnd.sample(SKILLS, rnd.randint(1, 5))],
+        "remote": rnd.random() < 0.5,
+    }
+    if rnd.random() < 0.3:
+        offer["multilocation"] = [{"city": city, "street": "ul. Prosta 1", "slug": offer_id}]
+    return offer
+
+GENERATORS = {"v1": offer_v1, "v2": offer_v2, "v3": offer_v3}
+
+###########################################
+def generate_offers(count: int, mix: dict = None, duplicate_ratio: float = 0.0, seed: int = 1,
+                    start: datetime = None, days: int = 30):
+    # Generator słowników ofert; co `duplicate_ratio` – powtórka wcześniejszej oferty
+    rnd = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    versions, weights = list(mix), list(mix.values())
+    start = start or datetime(2025, 3, 1, tzinfo=timezone.utc)
+    step = timedelta(days=days) / max(count, 1)
+    emitted = []
+    for i in range(count):
+        if emitted and rnd.random() < duplicate_ratio:
+            yield rnd.choice(emitted)
+            continue
+        version = rnd.choices(versions, weights)[0]
+        # v3 to oferty sprzed 2024 – starsze daty publikacji
+        published = start + step * i - (timedelta(days=500) if version == "v3" else timedelta(0))
+        offer = GENERATORS[version](i, rnd, published)
+        emitted.append(offer)
+        yield offer
+###########################################
+def generate_lines(count: int, mix: dict = None, duplicate_ratio: float = 0.0, seed: int = 1, **kwargs):
+    for offer in generate_offers(count, mix, duplicate_ratio, seed, **kwargs):
+        yield json.dumps(offer, ensure_ascii=False)
+###########################################
+def write_corpus(path, count: int, mix: dict = None, duplicate_ratio: float = 0.0, seed: int = 1) -> int:
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for line in generate_lines(count, mix, duplicate_ratio, seed):
+            f.write(line + "\n")
+            written += 1
+    return written
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Syntetyczny korpus JSONL ofert (v1/v2/v3) do benchmarków importu")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="udział wersji, np. v1=0.6,v2=0.3,v3=0.1")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="udział powtórzonych ofert (0-1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", "-o", help="plik wynikowy (domyślnie stdout)")
+    args = parser.parse_args(argv)
+
+    if args.out:
+        write_corpus(args.out, args.lines, args.mix, args.duplicates, args.seed)
+    else:
+        for line in generate_lines(args.lines, args.mix, args.duplicates, args.seed):
+            sys.stdout.write(line + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
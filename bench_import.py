@@ -0,0 +1,200 @@
+import argparse
+import json
+import logging
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy.orm import Session
+
+import sqlalchemy
+from bench_corpus import CATEGORY_IDS, DEFAULT_MIX, parse_mix, write_corpus
+from sql_dead_letter import DeadLetterWriter
+from sql_engine import create_sqlite_engine, finish_sqlite
+from sql_import_offers import import_offers_from_jsonl, parse_offer_lines
+from sql_migrate import migrate
+from sql_models import Category
+from sql_normalize import detect_version, normalize_offer
+
+# Mikrobenchmarki importera na korpusie z bench_corpus.py:
+#   detect_version  – samo rozpoznanie kształtu linii (na zdekodowanych słownikach)
+#   normalize_offer – rozpoznanie + normalizacja (dispatch do normalize_v1/v2/v3)
+#   parse_lines     – json.loads + normalizacja linii (parse_offer_lines)
+#   import_jsonl    – import_offers_from_jsonl do pustej bazy (z duplikatami z korpusu)
+#   dedup           – ponowny import tego samego pliku: same duplikaty (save_offer)
+# Wyniki dopisywane są jako linie JSON (commit, parametry korpusu, czasy), więc
+# przebiegi z różnych commitów można porównać: `bench_import.py compare A B`.
+BENCHMARKS = ["detect_version", "normalize_offer", "parse_lines", "import_jsonl", "dedup"]
+RESULTS_PATH = "bench_results.jsonl"
+
+###########################################
+def git_commit():
+    # commit repozytorium z kodem importera (niezależnie od katalogu uruchomienia)
+    repo = Path(__file__).resolve().parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+###########################################
+def _timed(func, repeat: int, setup=None) -> list:
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        times.append(time.perf_counter() - start)
+    return times
+
+###########################################
+class ImportBenchmark:
+    def __init__(self, workdir: Path, lines: int, mix: dict, duplicates: float, seed: int):
+        self.workdir = workdir
+        self.corpus = {"lines": lines, "mix": mix, "duplicates": duplicates, "seed": seed}
+        self.corpus_path = workdir / "corpus.jsonl"
+        self.template_path = workdir / "template.sqlite"
+        self.db_path = workdir / "run.sqlite"
+        self.dead_letters_path = workdir / "offers_failed.jsonl"
+        write_corpus(self.corpus_path, lines, mix, duplicates, seed)
+        with open(self.corpus_path, "rb") as f:
+            self.raw_lines = f.read().splitlines()
+        self.dicts = [json.loads(line) for line in self.raw_lines]
+        self._create_template()
+    ####################################################
+    def _create_template(self):
+        # Pusta baza po migracji; oferty v1 nie niosą nazwy kategorii (szukane po id)
+        engine = create_sqlite_engine(f"sqlite:///{self.template_path}", profile="import")
+        migrate(engine)
+        with Session(bind=engine) as session:
+            session.add_all(Category(id=i, name=f"Kategoria {i}") for i in [0, *CATEGORY_IDS])
+            session.commit()
+        finish_sqlite(engine)
+    ####################################################
+    def _import(self, filename: str):
+        engine = create_sqlite_engine(f"sqlite:///{self.db_path}", profile="import")
+        try:
+            with Session(bind=engine) as session, DeadLetterWriter(self.dead_letters_path) as dead_letters:
+                return import_offers_from_jsonl(self.corpus_path, session, filename, dead_letters=dead_letters)
+        finally:
+            engine.dispose()
+    ####################################################
+    def _fresh_db(self):
+        shutil.copyfile(self.template_path, self.db_path)
+    ####################################################
+    def _imported_db(self):
+        self._fresh_db()
+        self._import("corpus.jsonl")
+    ####################################################
+    def run(self, name: str, repeat: int) -> dict:
+        if name == "detect_version":
+            times = _timed(lambda _: [detect_version(data) for data in self.dicts], repeat)
+        elif name == "normalize_offer":
+            times = _timed(lambda _: [normalize_offer(data) for data in self.dicts], repeat)
+        elif name == "parse_lines":
+            times = _timed(lambda _: list(parse_offer_lines(self.raw_lines)), repeat)
+        elif name == "import_jsonl":
+            times = _timed(lambda _: self._import("corpus.jsonl"), repeat, setup=self._fresh_db)
+        elif name == "dedup":
+            times = _timed(lambda _: self._import("corpus_again.jsonl"), repeat, setup=self._imported_db)
+        else:
+            raise ValueError(f"Nieznany benchmark: {name}")
+        median = statistics.median(times)
+        return {
+            "benchmark": name, "items": len(self.raw_lines), "repeat": repeat,
+            "seconds_median": median, "seconds_min": min(times), "seconds": times,
+            "items_per_sec": len(self.raw_lines) / median if median else None,
+        }
+
+###########################################
+def run_benchmarks(names: list, lines: int, mix: dict, duplicates: float, seed: int, repeat: int) -> list:
+    commit, dirty = git_commit()
+    created_at = datetime.now(timezone.utc).isoformat()
+    with tempfile.TemporaryDirectory(prefix="bench_import_") as workdir:
+        bench = ImportBenchmark(Path(workdir), lines, mix, duplicates, seed)
+        results = []
+        for name in names:
+            print(f"⏱ {name}...", file=sys.stderr, flush=True)
+            result = bench.run(name, repeat)
+            result.update({
+                "commit": commit, "dirty": dirty, "created_at": created_at, "corpus": bench.corpus,
+                "python": platform.python_version(), "sqlalchemy": sqlalchemy.__version__,
+            })
+            results.append(result)
+    return results
+###########################################
+def load_results(path) -> list:
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+###########################################
+def _result_key(result: dict) -> tuple:
+    return result["benchmark"], json.dumps(result["corpus"], sort_keys=True)
+###########################################
+def compare(results: list, base: str, head: str) -> list:
+    # [(benchmark, korpus, wynik base, wynik head)] – ostatni przebieg każdego commitu
+    def latest(commit):
+        found = {}
+        for result in results:
+            if result.get("commit") and result["commit"].startswith(commit):
+                found[_result_key(result)] = result
+        return found
+
+    base_results, head_results = latest(base), latest(head)
+    return [(key[0], key[1], base_results[key], head_results[key]) for key in base_results if key in head_results]
+###########################################
+def print_results(results: list):
+    print(f"{'benchmark':<16} {'linie':>7} {'mediana s':>10} {'min s':>9} {'linie/s':>10}")
+    for result in results:
+        print(f"{result['benchmark']:<16} {result['items']:>7} {result['seconds_median']:>10.4f} "
+              f"{result['seconds_min']:>9.4f} {result['items_per_sec']:>10.0f}")
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki importu ofert (sql_import_offers)")
+    sub = parser.add_subparsers(dest="command")
+    cmp_parser = sub.add_parser("compare", help="porównaj wyniki dwóch commitów")
+    cmp_parser.add_argument("base")
+    cmp_parser.add_argument("head")
+    cmp_parser.add_argument("--results", default=RESULTS_PATH)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="udział wersji, np. v1=0.6,v2=0.3,v3=0.1")
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--results", default=RESULTS_PATH, help="plik JSONL, do którego dopisywane są wyniki")
+    parser.add_argument("--log-level", default="WARNING", help="poziom logów importera podczas pomiaru")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        rows = compare(load_results(args.results), args.base, args.head)
+        if not rows:
+            print(f"Brak wspólnych wyników dla {args.base} i {args.head} w {args.results}")
+            return 1
+        print(f"{'benchmark':<16} {args.base:>10} {args.head:>10} {'przysp.':>8}  korpus")
+        for name, corpus, base, head in rows:
+            # dodatnia wartość – head szybszy niż base
+            change = base["seconds_median"] / head["seconds_median"] - 1 if head["seconds_median"] else 0
+            print(f"{name:<16} {base['seconds_median']:>10.4f} {head['seconds_median']:>10.4f} {change:>+8.1%}  {corpus}")
+        return 0
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s - %(message)s")
+    results = run_benchmarks(args.only, args.lines, args.mix, args.duplicates, args.seed, args.repeat)
+    print_results(results)
+    with open(args.results, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench_import import RESULTS_PATH, git_commit
+from scraper_pages import parse_description_text, parse_page_notes, parse_skill_levels
+
+# Korpus zapisanych stron ofert (fixtures/pages/<wersja>/) i benchmark parserów
+# scraper_pages: strony/s i szczyt pamięci na stronę dla każdego ekstraktora.
+# Obok stron leżą wzorcowe wyniki (<strona>.golden.json); `check` porównuje z nimi
+# bieżące wyniki, `bench` robi to przed pomiarem – przyspieszenie parsera nie może
+# po cichu zmienić notatek ani poziomów skilli. Nowy układ strony = nowa wersja korpusu.
+CORPUS_DIR = Path(__file__).resolve().parent / "fixtures" / "pages" / "v1"
+
+EXTRACTORS = {
+    "page_notes": lambda text, page: parse_page_notes(text),
+    "skill_levels": lambda text, page: parse_skill_levels(text, page["skills"]),
+    "description_text": lambda text, page: parse_description_text(text),
+}
+
+###########################################
+def load_corpus(corpus_dir: Path):
+    manifest = json.loads((corpus_dir / "manifest.json").read_text(encoding="utf-8"))
+    pages = []
+    for page in manifest["pages"]:
+        page = dict(page, text=(corpus_dir / f"{page['name']}.html").read_text(encoding="utf-8"))
+        pages.append(page)
+    return manifest, pages
+###########################################
+def golden_path(corpus_dir: Path, name: str) -> Path:
+    return corpus_dir / f"{name}.golden.json"
+###########################################
+def extract_all(page: dict) -> dict:
+    # Wynik każdego ekstraktora albo klasa wyjątku – brak sekcji też jest częścią wzorca
+    result = {}
+    for name, extractor in EXTRACTORS.items():
+        try:
+            result[name] = extractor(page["text"], page)
+        except Exception as e:
+            result[name] = {"error": type(e).__name__}
+    return result
+###########################################
+def check_corpus(corpus_dir: Path, pages: list) -> list:
+    # [(strona, ekstraktor, oczekiwane, otrzymane)] dla rozbieżności
+    mismatches = []
+    for page in pages:
+        path = golden_path(corpus_dir, page["name"])
+        if not path.exists():
+            mismatches.append((page["name"], "*", "brak pliku wzorca", None))
+            continue
+        expected = json.loads(path.read_text(encoding="utf-8"))
+        actual = extract_all(page)
+        for name in EXTRACTORS:
+            if expected.get(name) != actual[name]:
+                mismatches.append((page["name"], name, expected.get(name), actual[name]))
+    return mismatches
+###########################################
+def update_golden(corpus_dir: Path, pages: list):
+    for page in pages:
+        path = golden_path(corpus_dir, page["name"])
+        path.write_text(json.dumps(extract_all(page), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+###########################################
+def bench_extractor(name: str, pages: list, repeat: int) -> dict:
+    extractor = EXTRACTORS[name]
+
+    def run_once():
+        for page in pages:
+            try:
+                extractor(page["text"], page)
+            except ValueError:
+                pass
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_once()
+        times.append(time.perf_counter() - start)
+
+    # pamięć mierzona osobno – tracemalloc spowalnia kilkukrotnie
+    peaks = []
+    tracemalloc.start()
+    try:
+        for page in pages:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            try:
+                extractor(page["text"], page)
+            except ValueError:
+                pass
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "benchmark": f"pages.{name}", "items": len(pages), "repeat": repeat,
+        "seconds_median": median, "seconds_min": min(times), "seconds": times,
+        "items_per_sec": len(pages) / median if median else None,
+        "peak_kib_mean": statistics.mean(peaks) / 1024, "peak_kib_max": max(peaks) / 1024,
+    }
+###########################################
+def add_page(corpus_dir: Path, source: str, name: str, skills: list):
+    # Dopisanie strony do korpusu (URL albo plik); wzorzec trzeba potem przejrzeć
+    # i zapisać przez `update-golden`
+    if source.startswith(("http://", "https://")):
+        import requests
+        response = requests.get(source, timeout=30)
+        response.raise_for_status()
+        text = response.text
+    else:
+        text = Path(source).read_text(encoding="utf-8")
+    (corpus_dir / f"{name}.html").write_text(text, encoding="utf-8")
+    manifest_path = corpus_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest["pages"] = [page for page in manifest["pages"] if page["name"] != name] + [{"name": name, "skills": skills}]
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Korpus stron ofert: poprawność i wydajność parserów scraper_pages")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="porównaj wyniki parserów ze wzorcami")
+    sub.add_parser("update-golden", help="zapisz bieżące wyniki jako wzorce")
+    bench = sub.add_parser("bench", help="strony/s i pamięć na ekstraktor")
+    bench.add_argument("--repeat", type=int, default=5)
+    bench.add_argument("--results", default=RESULTS_PATH, help="plik JSONL, do którego dopisywane są wyniki")
+    add = sub.add_parser("add", help="dodaj stronę (URL lub plik) do korpusu")
+    add.add_argument("source")
+    add.add_argument("--name", required=True)
+    add.add_argument("--skills", nargs="*", default=[], help="wymagane skille oferty (jak w bazie)")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        add_page(args.corpus, args.source, args.name, args.skills)
+        print(f"Dodano {args.name} – sprawdź wynik i zapisz wzorzec: bench_pages.py update-golden")
+        return 0
+
+    manifest, pages = load_corpus(args.corpus)
+    if args.command == "update-golden":
+        update_golden(args.corpus, pages)
+        print(f"Zapisano wzorce dla {len(pages)} stron korpusu {manifest['version']}")
+        return 0
+
+    mismatches = check_corpus(args.corpus, pages)
+    for page, extractor, expected, actual in mismatches:
+        print(f"❌ {page} / {extractor}:\n   oczekiwane: {str(expected)[:300]}\n   otrzymane:  {str(actual)[:300]}")
+    if args.command == "check":
+        print(f"{'✅' if not mismatches else '❌'} {len(pages)} stron, rozbieżności: {len(mismatches)}")
+        return 1 if mismatches else 0
+
+    commit, dirty = git_commit()
+    created_at = datetime.now(timezone.utc).isoformat()
+    results = []
+    for name in EXTRACTORS:
+        result = bench_extractor(name, pages, args.repeat)
+        result.update({
+            "commit": commit, "dirty": dirty, "created_at": created_at, "correct": not mismatches,
+            "corpus": {"pages": manifest["version"], "count": len(pages)},
+        })
+        results.append(result)
+
+    print(f"{'ekstraktor':<24} {'strony/s':>9} {'ms/stronę':>10} {'szczyt KiB':>11} {'maks. KiB':>10}")
+    for result in results:
+        print(f"{result['benchmark']:<24} {result['items_per_sec']:>9.1f} {1000 / result['items_per_sec']:>10.2f} "
+              f"{result['peak_kib_mean']:>11.0f} {result['peak_kib_max']:>10.0f}")
+    with open(args.results, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    if mismatches:
+        print("⚠️ Wyniki parserów różnią się od wzorców – pomiar nie jest porównywalny")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from bench_corpus import SKILLS, offer_v2
+
+# Benchmark całego potoku bez sieci: jobs_download ➜ jobs_sql ➜ jobs_scraper
+# na lokalnym serwerze HTTP (lista ofert, strony ofert i lista proxy z nagranych
+# plików) i S3 w katalogu (s3_local.LocalS3). Każdy etap działa w osobnym procesie
+# we wspólnym katalogu roboczym – osobno mierzony czas, żądania, bajty, wiersze/s
+# i szczytowe RSS. Fixtures:
+#   listing/page_0001.json – odpowiedzi API listy ofert (data + meta)
+#   offers/<slug>.html     – strony ofert dla scrapera
+# Nagranie z prawdziwego API: `record`, dane syntetyczne: `synth`.
+FIXTURES_DIR = Path("fixtures/pipeline")
+STAGES = ["download", "sql", "scraper"]
+MB = 1024 * 1024
+
+###########################################
+class FixtureServer:
+    # Lokalny odpowiednik api.justjoin.it, justjoin.it/job-offer i listy proxy.
+    # Lista proxy wskazuje na ten sam serwer, więc żądania przez proxy
+    # (absolutny URL w ścieżce) też trafiają tutaj.
+    def __init__(self, fixtures):
+        self.fixtures = Path(fixtures)
+        self.stats = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body, content_type = server.response(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.count(urlsplit(self.path).path, len(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    ####################################################
+    def __enter__(self):
+        self.thread.start()
+        return self
+    ####################################################
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    ####################################################
+    def response(self, raw_path: str):
+        url = urlsplit(raw_path)
+        if url.path == "/proxies":
+            host, port = self.httpd.server_address[:2]
+            return 200, f"{host}:{port}:bench:bench\n".encode(), "text/plain"
+        if url.path == "/api/offers":
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            path = self.fixtures / "listing" / f"page_{page:04d}.json"
+            if path.exists():
+                return 200, path.read_bytes(), "application/json"
+            return 200, json.dumps({"data": [], "meta": {"totalItems": 0, "totalPages": 0, "nextPage": None}}).encode(), "application/json"
+        if url.path.startswith("/job-offer/"):
+            path = self.fixtures / "offers" / f"{unquote(url.path.rsplit('/', 1)[-1])}.html"
+            if path.exists():
+                return 200, path.read_bytes(), "text/html; charset=utf-8"
+        return 404, b"Not Found", "text/plain"
+    ####################################################
+    def count(self, path: str, size: int):
+        kind = "proxy" if path == "/proxies" else "listing" if path == "/api/offers" else "offer"
+        with self._lock:
+            stat = self.stats.setdefault(kind, {"requests": 0, "bytes": 0})
+            stat["requests"] += 1
+            stat["bytes"] += size
+    ####################################################
+    def take_stats(self) -> dict:
+        with self._lock:
+            stats, self.stats = self.stats, {}
+        return stats
+
+###########################################
+def _count_table(db_path: Path, table: str) -> int:
+    if not db_path.exists():
+        return 0
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+###########################################
+def count_rows(stage: str) -> int:
+    # download – linie w partycjach JSONL w S3, sql – oferty, scraper – wpisy scrapera
+    if stage == "download":
+        root = Path(os.environ["S3_LOCAL_DIR"]) / os.environ["BUCKET_NAME"] / "jobs"
+        total = 0
+        for path in root.rglob("justjoinit_*.jsonl"):
+            with open(path, "rb") as f:
+                total += sum(1 for _ in f)
+        return total
+    db_path = Path("data/sql/jobs.sqlite")
+    return _count_table(db_path, "offers" if stage == "sql" else "scraper")
+###########################################
+def run_stage(stage: str, result_path: str):
+    # Uruchamiane w procesie potomnym (cwd = katalog roboczy, środowisko z run_pipeline)
+    import app
+    import metrics
+    from client_s3 import get_s3_client
+
+    jobs = {"download": app.jobs_download, "sql": app.jobs_sql, "scraper": app.jobs_scraper}
+    rows_before = count_rows(stage)
+    start = time.perf_counter()
+    ok = jobs[stage]()
+    elapsed = time.perf_counter() - start
+    rows = count_rows(stage) - rows_before
+    # ru_maxrss w KiB; procesy parsujące importu liczą się osobno (RUSAGE_CHILDREN)
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    result = {
+        "stage": stage, "ok": bool(ok), "seconds": elapsed, "rows": rows,
+        "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": rss / 1024, "s3": dict(getattr(get_s3_client(), "stats", {})),
+        # metryki zadania (metrics.job_metrics) – czasy HTTP, S3, parsowania, flush/commit
+        "metrics": metrics.REGISTRY.summary(),
+    }
+    Path(result_path).write_text(json.dumps(result), encoding="utf-8")
+    return 0
+
+###########################################
+def bench_env(server_url: str, workdir: Path) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "S3_LOCAL_DIR": str(workdir / "s3"),
+        "BUCKET_NAME": "bench",
+        "JUSTJOIN_API_URL": f"{server_url}/api/offers",
+        "JUSTJOIN_OFFER_URL": f"{server_url}/job-offer/",
+        "PROXY_URL": f"{server_url}/proxies",
+        # puste wartości nie są nadpisywane przez .env (load_dotenv)
+        "DISCORD_WEBHOOK_URL": "",
+        "DUCKDB_PATH": "",
+        "DOWNLOAD_PAGE_DELAY": "0",
+        "SCRAPER_DELAY_MIN": "0",
+        "SCRAPER_DELAY_MAX": "0",
+    })
+    return env
+###########################################
+def run_pipeline(fixtures, workdir: Path, stages: list) -> list:
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    with FixtureServer(fixtures) as server:
+        env = bench_env(server.url, workdir)
+        for stage in stages:
+            result_path = workdir / f"bench_{stage}.json"
+            result_path.unlink(missing_ok=True)
+            logging.info(f"⏱ Etap {stage}...")
+            start = time.perf_counter()
+            with open(workdir / f"bench_{stage}.log", "w", encoding="utf-8") as log:
+                process = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "stage", stage, "--result", str(result_path)],
+                    cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                )
+            elapsed = time.perf_counter() - start
+            if process.returncode != 0 or not result_path.exists():
+                logging.error(f"❌ Etap {stage} zakończony błędem ({process.returncode}) – log: {workdir / f'bench_{stage}.log'}")
+                result = {"stage": stage, "ok": False}
+            else:
+                result = json.loads(result_path.read_text(encoding="utf-8"))
+            result["process_seconds"] = elapsed
+            result["http"] = server.take_stats()
+            results.append(result)
+    return results
+###########################################
+def print_results(results: list):
+    print(f"{'etap':<10} {'czas s':>8} {'HTTP':>6} {'HTTP MiB':>9} {'S3':>6} {'S3 wys.':>8} {'S3 pob.':>8} "
+          f"{'wiersze':>8} {'wiersze/s':>10} {'RSS MiB':>8}")
+    for result in results:
+        if "seconds" not in result:
+            print(f"{result['stage']:<10} błąd")
+            continue
+        http = result["http"].values()
+        s3 = result["s3"]
+        print(f"{result['stage']:<10} {result['seconds']:>8.2f} {sum(h['requests'] for h in http):>6} "
+              f"{sum(h['bytes'] for h in http) / MB:>9.2f} {s3.get('requests', 0):>6} "
+              f"{s3.get('bytes_in', 0) / MB:>8.2f} {s3.get('bytes_out', 0) / MB:>8.2f} "
+              f"{result['rows']:>8} {result['rows_per_sec']:>10.1f} {result['peak_rss_mb']:>8.1f}")
+
+###########################################
+def record_fixtures(out: Path, pages: int, per_page: int, details: int, delay: float):
+    # Nagranie odpowiedzi prawdziwego API i stron ofert (jednorazowo, z siecią)
+    import requests
+    from client_justjoin import JUSTJOIN_API_URL, JUSTJOIN_OFFER_URL
+
+    (out / "listing").mkdir(parents=True, exist_ok=True)
+    (out / "offers").mkdir(parents=True, exist_ok=True)
+    slugs = []
+    for page in range(1, pages + 1):
+        params = {"sortBy": "published", "orderBy": "DESC", "perPage": per_page, "page": page, "salaryCurrencies": "PLN"}
+        response = requests.get(JUSTJOIN_API_URL, headers={"Version": "2"}, params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        meta = data.setdefault("meta", {})
+        if page == pages or not meta.get("nextPage"):
+            meta["nextPage"] = None  # koniec nagrania = koniec listy dla jobs_download
+        (out / "listing" / f"page_{page:04d}.json").write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        slugs.extend(offer["slug"] for offer in data.get("data", []) if offer.get("slug"))
+        logging.info(f"📥 Strona {page}: {len(data.get('data', []))} ofert")
+        if meta["nextPage"] is None:
+            break
+        time.sleep(delay)
+
+    for slug in slugs[:details]:
+        response = requests.get(f"{JUSTJOIN_OFFER_URL}{slug}", timeout=30)
+        if response.status_code == 200:
+            (out / "offers" / f"{slug}.html").write_text(response.text, encoding="utf-8")
+        time.sleep(delay)
+    logging.info(f"✅ Nagrano {len(slugs)} ofert i {min(details, len(slugs))} stron ofert do {out}")
+###########################################
+###########################################
+def synthetic_page(offer: dict, rnd: random.Random) -> str:
+    # Strona oferty z klasami CSS, których szuka scraper_pages.Pages
+    skills = "".join(
+        f'<div class="MuiBox-root css-qsaw8"><h4 class="MuiTypography-root">{name}</h4>'
+        f'<ul class="MuiBox-root css-1qii1b7">'
+        + "".join(f'<li class="{"css-j1kr6i" if n < level else "css-1xm32e0"}"></li>' for n in range(5))
+        + "</ul></div>"
+        for name, level in ((name, rnd.randint(1, 5)) for name in offer["requiredSkills"])
+    )
+    description = "".join(f"<p>Wymaganie {n}: doświadczenie z {rnd.choice(SKILLS)}.</p>" for n in range(rnd.randint(5, 20)))
+    return (
+        f'<!DOCTYPE html><html><head><title>{offer["title"]}</title><style>.x{{color:red}}</style></head><body>'
+        f'<script>window.__STATE__ = {{}};</script><main>'
+        f'<div class="MuiBox-root css-16nvqld"><h3>Tech stack</h3>{skills}</div>'
+        f'<div class="MuiBox-root css-16nvqld"><h3>Job description</h3><div>{description}</div></div>'
+        f"</main></body></html>"
+    )
+###########################################
+def synth_fixtures(out: Path, offers: int, per_page: int, seed: int = 1):
+    rnd = random.Random(seed)
+    (out / "listing").mkdir(parents=True, exist_ok=True)
+    (out / "offers").mkdir(parents=True, exist_ok=True)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    # od najnowszej, jak przy sortBy=published DESC; kształt v2 – obecne API dodaje
+    # "guid" (v1), ale v1 nie niesie nazw kategorii i nie zaimportuje się do pustej bazy
+    items = [offer_v2(i, rnd, now - timedelta(minutes=17 * i)) for i in range(offers)]
+    pages = max(1, -(-offers // per_page))
+    for page in range(1, pages + 1):
+        data = items[(page - 1) * per_page:page * per_page]
+        meta = {"page": page, "perPage": per_page, "totalItems": offers, "totalPages": pages,
+                "nextPage": page + 1 if page < pages else None}
+        (out / "listing" / f"page_{page:04d}.json").write_text(json.dumps({"data": data, "meta": meta}, ensure_ascii=False), encoding="utf-8")
+    for offer in items:
+        (out / "offers" / f"{offer['slug']}.html").write_text(synthetic_page(offer, rnd), encoding="utf-8")
+    logging.info(f"✅ Wygenerowano {offers} ofert na {pages} stronach w {out}")
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark potoku download ➜ sql ➜ scraper bez sieci")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="uruchom etapy na lokalnym serwerze i S3 w katalogu")
+    run.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    run.add_argument("--workdir", help="katalog roboczy (domyślnie tymczasowy, usuwany po zakończeniu)")
+    run.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    run.add_argument("--json", help="zapisz wyniki do pliku JSON")
+    record = sub.add_parser("record", help="nagraj fixtures z prawdziwego API")
+    record.add_argument("--out", default=str(FIXTURES_DIR))
+    record.add_argument("--pages", type=int, default=3)
+    record.add_argument("--per-page", type=int, default=100)
+    record.add_argument("--details", type=int, default=50, help="liczba stron ofert do nagrania")
+    record.add_argument("--delay", type=float, default=2.0)
+    synth = sub.add_parser("synth", help="wygeneruj syntetyczne fixtures")
+    synth.add_argument("--out", default=str(FIXTURES_DIR))
+    synth.add_argument("--offers", type=int, default=500)
+    synth.add_argument("--per-page", type=int, default=100)
+    synth.add_argument("--seed", type=int, default=1)
+    stage = sub.add_parser("stage")  # wewnętrzne – pojedynczy etap w procesie potomnym
+    stage.add_argument("name", choices=STAGES)
+    stage.add_argument("--result", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "stage":
+        return run_stage(args.name, args.result)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    if args.command == "record":
+        record_fixtures(Path(args.out), args.pages, args.per_page, args.details, args.delay)
+        return 0
+    if args.command == "synth":
+        synth_fixtures(Path(args.out), args.offers, args.per_page, args.seed)
+        return 0
+
+    fixtures = Path(args.fixtures).resolve()
+    if not (fixtures / "listing").is_dir():
+        parser.error(f"brak fixtures w {fixtures} – użyj `record` albo `synth`")
+    if args.workdir:
+        results = run_pipeline(fixtures, Path(args.workdir).resolve(), args.stages)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+            results = run_pipeline(fixtures, Path(workdir), args.stages)
+    print_results(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0 if all(result.get("ok") for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
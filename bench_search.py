@@ -0,0 +1,62 @@
+import argparse
+import logging
+import statistics
+import sys
+import time
+from sqlalchemy.orm import Session
+
+from sql_engine import create_sqlite_engine
+from sql_search import search_offers, like_search, sync_search_index
+
+# Porównanie wyszukiwania FTS5 (sql_search.search_offers) z dotychczasowym
+# LIKE po tytule i HTML-u opisów: czas zapytań i pokrycie wyników.
+DEFAULT_QUERIES = ["python", "java", "kubernetes", "react", "c++", "data engineer", "krakow"]
+
+###########################################
+def _measure(func, repeat: int):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+###########################################
+def run_benchmark(session: Session, queries: list, repeat: int = 5, limit: int = 1000) -> list:
+    rows = []
+    for query in queries:
+        fts_ids, fts_time = _measure(lambda: search_offers(session, query, limit=limit), repeat)
+        # LIKE szuka frazy w całości – dla wielu słów porównanie jest orientacyjne
+        like_ids, like_time = _measure(lambda: like_search(session, query, limit=limit), repeat)
+        common = len(set(fts_ids) & set(like_ids))
+        rows.append({
+            "query": query, "fts_ms": fts_time * 1000, "like_ms": like_time * 1000,
+            "fts": len(fts_ids), "like": len(like_ids), "common": common,
+        })
+    return rows
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark wyszukiwania: FTS5 vs LIKE")
+    parser.add_argument("--db", default="sqlite:///data/sql/jobs.sqlite", help="URL bazy SQLite")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    engine = create_sqlite_engine(args.db)
+    with Session(bind=engine) as session:
+        # indeks musi być kompletny, inaczej porównanie wyników nie ma sensu
+        sync_search_index(session)
+        rows = run_benchmark(session, args.queries, args.repeat, args.limit)
+    engine.dispose()
+
+    print(f"{'zapytanie':<20} {'FTS5 ms':>9} {'LIKE ms':>9} {'x':>6} {'FTS5':>6} {'LIKE':>6} {'wspólne':>8}")
+    for row in rows:
+        speedup = row["like_ms"] / row["fts_ms"] if row["fts_ms"] else 0
+        print(f"{row['query']:<20} {row['fts_ms']:>9.2f} {row['like_ms']:>9.2f} {speedup:>6.1f} "
+              f"{row['fts']:>6} {row['like']:>6} {row['common']:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import argparse
+import importlib.util
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Sprawdzenie warstwy S3 bez sieci, na S3 w katalogu (s3_local.LocalS3):
+#   transfer    – upload_file/get_file oraz upload_sqlite_db/download_sqlite_db
+#   ranged_get  – ranged GET od pozycji kursora (get_object_from, fetch_jsonl_from_s3,
+#                 stream_jsonl_from_s3), także ostatnia linia bez "\n" i dopisanie za nią
+#   sqlite_sync – push/pull porcjami: pełne pobranie, zmiana bazy, pobranie różnic
+#                 i odtworzenie poprzedniej wersji
+# client_s3 czyta konfigurację przy imporcie, więc każdy tryb (bez kompresji, zstd)
+# działa w osobnym procesie z własnym S3_LOCAL_DIR i SQLITE_COMPRESSION.
+# Kod wyjścia 0 – wszystkie sprawdzenia zgodne.
+CHECKS = ["transfer", "ranged_get", "sqlite_sync"]
+MODES = ["none", "zstd"]
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+###########################################
+class CheckFailed(Exception):
+    pass
+###########################################
+def expect(condition, message: str):
+    if not condition:
+        raise CheckFailed(message)
+###########################################
+def make_db(path: Path, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", ((i, f"wiersz {i} " * 20) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+###########################################
+def check_transfer(workdir: Path, mode: str):
+    from client_s3 import S3Client, ZSTD_SUFFIX
+
+    s3 = S3Client()
+    src = workdir / "transfer.sqlite"
+    make_db(src, 2000)
+
+    expect(s3.upload_file(str(src), "check/raw/plain.bin"), "upload_file zwrócił False")
+    response = s3.get_file("check/raw/plain.bin")
+    expect(response and response["Body"].read() == src.read_bytes(), "get_file: treść różni się od wysłanej")
+
+    key = "check/sql/jobs.sqlite"
+    expect(s3.upload_sqlite_db(key, src), "upload_sqlite_db zwrócił False")
+    stored = s3.sqlite_key(key)
+    if mode == "zstd":
+        expect(stored == key + ZSTD_SUFFIX, f"baza powinna leżeć pod {key + ZSTD_SUFFIX}, a leży pod {stored}")
+        body = s3.get_file(stored)["Body"].read()
+        expect(body.startswith(ZSTD_MAGIC), "obiekt .zst nie zaczyna się ramką zstd")
+        expect(len(body) < src.stat().st_size, f"skompresowana baza nie jest mniejsza ({len(body)} B)")
+    else:
+        expect(stored == key, f"baza bez kompresji powinna leżeć pod {key}, a leży pod {stored}")
+
+    out = workdir / "transfer_out.sqlite"
+    expect(s3.download_sqlite_db(key, str(out)), "download_sqlite_db zwrócił False")
+    expect(out.read_bytes() == src.read_bytes(), "pobrana baza różni się od wysłanej")
+    expect(s3.is_sqlite_up_to_date(str(out), key), "pobrana baza nie jest uznana za aktualną")
+###########################################
+def check_ranged_get(workdir: Path, mode: str):
+    from client_s3 import S3Client
+    from sql_import_offers import FileCursor, parse_jsonl_bytes, parse_offer_lines
+    from sql_import_s3 import get_object_from, fetch_jsonl_from_s3, stream_jsonl_from_s3
+
+    s3 = S3Client()
+    key = "check/jobs/ranged.jsonl"
+    lines = [f'{{"id": {i}, "pole": "{"x" * i}"}}'.encode() for i in range(1, 10)]
+    data = b"\n".join(lines)  # ostatnia linia bez "\n"
+    expect(s3.put_file(key, data), "put_file zwrócił False")
+    offset = len(lines[0]) + len(lines[1]) + 2
+
+    expect(get_object_from(key)["Body"].read() == data, "GET bez zakresu: treść różni się od wysłanej")
+    expect(get_object_from(key, offset)["Body"].read() == data[offset:], "ranged GET: treść różni się od data[offset:]")
+
+    cursor = FileCursor(offset)
+    fetched = fetch_jsonl_from_s3(key, cursor)
+    expect(fetched == data[offset:], "fetch_jsonl_from_s3: oczekiwane linie od pozycji kursora do końca pliku")
+    expect(cursor.etag == s3.get_s3_etag(key), f"kursor: ETag {cursor.etag} różny od obiektu w S3")
+    parsed = list(cursor.track(parse_jsonl_bytes(fetched, 3)))
+    expect([p.line_number for p in parsed] == list(range(3, 10)), "numery linii od pozycji kursora niezgodne")
+    expect(cursor.offset == len(data), f"kursor po imporcie: {cursor.offset}, oczekiwano {len(data)}")
+
+    cursor = FileCursor(offset)
+    streamed = list(cursor.track(parse_offer_lines(stream_jsonl_from_s3(key, cursor), 3)))
+    expect([p.raw for p in streamed] == lines[2:], "stream_jsonl_from_s3: oczekiwane linie od pozycji kursora")
+    expect(cursor.offset == len(data), f"kursor po imporcie strumieniowym: {cursor.offset}, oczekiwano {len(data)}")
+
+    # dopisanie za linią bez "\n" zaczyna się od "\n" – nie jest osobną (pustą) linią
+    appended = b'{"id": 10}'
+    expect(s3.put_file(key, data + b"\n" + appended + b"\n"), "put_file zwrócił False")
+    for name, read in (("fetch", lambda c: parse_jsonl_bytes(fetch_jsonl_from_s3(key, c), 10)),
+                       ("stream", lambda c: parse_offer_lines(stream_jsonl_from_s3(key, c), 10))):
+        cursor = FileCursor(len(data))
+        tail = list(cursor.track(read(cursor)))
+        expect([p.raw for p in tail] == [appended], f"{name}: dopisany ogon to {[p.raw for p in tail]}")
+        expect(cursor.offset == len(data) + len(appended) + 2, f"{name}: kursor po dopisaniu: {cursor.offset}")
+###########################################
+def check_sqlite_sync(workdir: Path, mode: str):
+    from client_s3 import S3Client
+    from sqlite_sync import SqliteChunkSync
+
+    s3 = S3Client()
+    prefix = "check/chunks"
+    sync = SqliteChunkSync(s3, prefix=prefix, chunk_size=16384)
+    db = workdir / "sync.sqlite"
+    make_db(db, 3000)
+
+    first = sync.push(db)
+    expect(first is not None, "push zwrócił None")
+    expect(first["compression"] == (None if mode == "none" else mode), f"kompresja porcji: {first['compression']}")
+    original = db.read_bytes()
+
+    copy = workdir / "sync_copy.sqlite"
+    expect(sync.pull(copy) is True, "pull do nowego pliku nie powiódł się")
+    expect(copy.read_bytes() == original, "pobrana baza różni się od wysłanej")
+
+    # zmiana kilku wierszy – druga wersja wysyła tylko zmienione porcje
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE t SET body = 'zmieniony' WHERE id < 5")
+    conn.commit()
+    conn.close()
+    chunks_before = set(s3.list_keys(f"{prefix}/data/"))
+    second = sync.push(db)
+    expect(second is not None and second["parent"] == first["version"], "druga wersja nie wskazuje poprzedniej")
+    new_chunks = set(s3.list_keys(f"{prefix}/data/")) - chunks_before
+    expect(0 < len(new_chunks) < len(second["chunks"]),
+           f"druga wersja wysłała {len(new_chunks)} z {len(second['chunks'])} porcji")
+
+    expect(sync.pull(copy) is True, "pull zmienionej bazy nie powiódł się")
+    expect(copy.read_bytes() == db.read_bytes(), "baza po pobraniu różnic różni się od wysłanej")
+
+    previous = workdir / "sync_previous.sqlite"
+    expect(sync.pull(previous, version=first["version"]) is True, "pull poprzedniej wersji nie powiódł się")
+    expect(previous.read_bytes() == original, "odtworzona poprzednia wersja różni się od oryginału")
+
+###########################################
+def run_checks(mode: str, workdir: Path, only: list) -> int:
+    # Uruchamiane w procesie potomnym (środowisko z check_env)
+    checks = {"transfer": check_transfer, "ranged_get": check_ranged_get, "sqlite_sync": check_sqlite_sync}
+    failed = 0
+    for name in only:
+        try:
+            checks[name](workdir, mode)
+            print(f"✅ [{mode}] {name}")
+        except CheckFailed as e:
+            failed += 1
+            print(f"❌ [{mode}] {name}: {e}")
+        except Exception as e:
+            failed += 1
+            logging.exception(f"❌ [{mode}] {name}: nieoczekiwany błąd: {e}")
+    return 1 if failed else 0
+###########################################
+def check_env(workdir: Path, mode: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "S3_LOCAL_DIR": str(workdir / "s3"),
+        "BUCKET_NAME": "check",
+        # puste wartości nie są nadpisywane przez .env (load_dotenv)
+        "SQLITE_COMPRESSION": "" if mode == "none" else mode,
+        "ENDPOINT_URL": "",
+    })
+    return env
+###########################################
+def run_modes(workdir: Path, modes: list, only: list) -> bool:
+    ok = True
+    for mode in modes:
+        if mode == "zstd" and importlib.util.find_spec("zstandard") is None:
+            print(f"⏭ [{mode}] pominięto – brak pakietu zstandard")
+            continue
+        mode_dir = workdir / mode
+        mode_dir.mkdir(parents=True, exist_ok=True)
+        process = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "run", mode, "--workdir", str(mode_dir), "--only", *only],
+            cwd=mode_dir, env=check_env(mode_dir, mode),
+        )
+        ok = ok and process.returncode == 0
+    return ok
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sprawdzenie S3Client, ranged GET i sqlite_sync na lokalnym S3")
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("run")  # wewnętrzne – jeden tryb w procesie potomnym
+    run.add_argument("mode", choices=MODES)
+    run.add_argument("--workdir", required=True)
+    run.add_argument("--only", nargs="+", choices=CHECKS, default=CHECKS)
+    parser.add_argument("--workdir", help="katalog roboczy (domyślnie tymczasowy, usuwany po sprawdzeniu)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--only", nargs="+", choices=CHECKS, default=CHECKS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    if args.command == "run":
+        return run_checks(args.mode, Path(args.workdir), args.only)
+    if args.workdir:
+        ok = run_modes(Path(args.workdir).resolve(), args.modes, args.only)
+    else:
+        with tempfile.TemporaryDirectory(prefix="check_s3_local_") as workdir:
+            ok = run_modes(Path(workdir), args.modes, args.only)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,11 +14,29 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from scraper_db import Database
 from scraper_pages import Pages
 from scraper_parser_gpt import OfferParserGPT
+from s3_manifest import Manifest
+from log_manager import SAMPLED
+import metrics
+
+load_dotenv()
+
+# Adresy API i stron ofert (podmieniane np. przez bench_pipeline.py na lokalny serwer)
+JUSTJOIN_API_URL = os.getenv("JUSTJOIN_API_URL", "https://api.justjoin.it/v2/user-panel/offers")
+JUSTJOIN_OFFER_URL = os.getenv("JUSTJOIN_OFFER_URL", "https://justjoin.it/job-offer/")
+# losowa przerwa (s) między stronami ofert w scraperze
+SCRAPER_DELAY_RANGE = (float(os.getenv("SCRAPER_DELAY_MIN", "2")), float(os.getenv("SCRAPER_DELAY_MAX", "10")))
+
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "Czas zapytań HTTP (API listy ofert, strony ofert)")
+HTTP_BYTES = metrics.counter("http_response_bytes", "Rozmiar odpowiedzi HTTP")
+JSON_DECODE_SECONDS = metrics.histogram("json_decode_seconds", "Czas json.loads pojedynczej oferty / odpowiedzi")
+DEDUP_SECONDS = metrics.histogram("dedup_seconds", "Sprawdzenie, czy oferta już istnieje")
+DOWNLOAD_OFFERS = metrics.counter("download_offers", "Oferty z API wg wyniku zapisu do partycji")
+SCRAPER_OFFER_SECONDS = metrics.histogram("scraper_offer_seconds", "Przetworzenie jednej oferty przez scraper (bez losowej przerwy)")
 
 class JustJoinClient:
     def __init__(self,offers_per_page=1):
         requests_cache.install_cache("justjoin_cache", backend="sqlite", expire_after=86400)
-        self.base_url = "https://api.justjoin.it/v2/user-panel/offers"
+        self.base_url = JUSTJOIN_API_URL
         self.proxy_manager = ProxyManager()
         self.total_offers = 0
         self.offers_per_page = offers_per_page
@@ -26,6 +44,7 @@ class JustJoinClient:
         self.current_page = 1
         self.next_page = 1
         self.offers = []
+        self.manifest = None
         self.offers, self.total_pages, self.total_offers, self.next_page = self.get_page(self.current_page)
 
     #####################################
@@ -45,6 +64,7 @@ class JustJoinClient:
             "salaryCurrencies": "PLN"
         }
         proxy_url = self.proxy_manager.get_random_proxy()
+        start = time.perf_counter()
         try:
             if proxy_url is None:
                 response = requests.get(self.base_url, headers=headers, params=params, timeout=10)
@@ -55,9 +75,13 @@ class JustJoinClient:
                 }
                 response = requests.get(self.base_url, headers=headers, params=params, proxies=proxies, timeout=10)
                 logging.info(f"Pobieranie strony {page} przy użyciu proxy {proxy_url}")
+            HTTP_SECONDS.observe(time.perf_counter() - start, client="api", status=response.status_code,
+                                 cached=getattr(response, "from_cache", False))
+            HTTP_BYTES.inc(len(response.content), client="api")
             response.raise_for_status()
             try:
-                response_json = response.json()
+                with JSON_DECODE_SECONDS.time(source="api"):
+                    response_json = response.json()
             except ValueError as e:
                 logging.error(f"Błąd parsowania JSON dla strony {page}: {e}")
                 return None, 0, 0, None
@@ -74,6 +98,8 @@ class JustJoinClient:
             return self.offers, self.total_pages, self.total_offers, self.next_page
         
         except requests.exceptions.RequestException as e:
+            if getattr(e, "response", None) is None:
+                HTTP_SECONDS.observe(time.perf_counter() - start, client="api", status="error", cached=False)
             logging.error(f"Błąd HTTP przy pobieraniu strony {page}: {e}")
             raise
             # return None, 0, 0, None
@@ -124,7 +150,7 @@ class JustJoinClient:
                                 logging.error("Błąd przy wczytywaniu oferty z istniejącego pliku:", e)
             # Sprawdzenie, czy oferta o danym slug już została dodana
             if slug in seen_slugs[date_str]:
-                logging.warning(f"Duplikat oferty '{slug}' dla daty {date_str} - pomijam.")
+                logging.warning(f"Duplikat oferty '{slug}' dla daty {date_str} - pomijam.", extra=SAMPLED)
                 duplicate_offers += 1
                 continue
             
@@ -136,13 +162,25 @@ class JustJoinClient:
                 out_file.write("\n")
                 saved_offers += 1
             
-            logging.info(f"Oferta z kluczem '{slug}' dodana do pliku {output_filename}.")
+            logging.info(f"Oferta z kluczem '{slug}' dodana do pliku {output_filename}.", extra=SAMPLED)
 
         if total_offers == duplicate_offers:
             logging.warning("Wszystkie oferty to duplikaty, przerwanie zapisu.")
             return False, saved_offers, duplicate_offers
         return True, saved_offers, duplicate_offers
     #####################################
+    def get_manifest(self, s3_client):
+        if self.manifest is None:
+            try:
+                self.manifest = Manifest.load(s3_client.s3_client, s3_client.bucket_name)
+                if not self.manifest.exists:
+                    # pierwszy zapis manifestu musi objąć też starsze partycje
+                    self.manifest.reconcile(s3_client.s3_client, s3_client.bucket_name)
+            except Exception as e:
+                logging.error(f"Błąd przy wczytywaniu manifestu partycji: {e}")
+                self.manifest = None
+        return self.manifest
+    #####################################
     def save_offers_s3(self,s3_client,offers):
         # Grupujemy oferty według daty publikacji
         offers_by_date = {}
@@ -186,6 +224,7 @@ class JustJoinClient:
                 else:
                     existing_content = response['Body'].read().decode('utf-8')
                 # Parsowanie istniejących ofert, aby wyłapać duplikaty
+                decode_start = time.perf_counter()
                 for line in existing_content.splitlines():
                     try:
                         existing_offer = json.loads(line)
@@ -194,6 +233,7 @@ class JustJoinClient:
                             seen_slugs.add(existing_slug)
                     except Exception as e:
                         logging.error(f"Błąd przy wczytywaniu oferty z S3 {s3_key}: {e}")
+                JSON_DECODE_SECONDS.observe(time.perf_counter() - decode_start, source="partition")
             except ClientError as e:
                 if e.response['Error']['Code'] == 'NoSuchKey':
                     logging.info(f"Obiekt {s3_key} nie istnieje. Zostanie utworzony nowy.")
@@ -206,34 +246,51 @@ class JustJoinClient:
                 existing_content = ""
 
             new_lines = []
+            dedup_start = time.perf_counter()
             for offer in offers_list:
                 slug = offer.get("slug")
                 if slug in seen_slugs:
-                    logging.warning(f"Duplikat oferty '{slug}' dla daty {date_str} - pomijam.")
+                    logging.warning(f"Duplikat oferty '{slug}' dla daty {date_str} - pomijam.", extra=SAMPLED)
                     duplicate_offers += 1 # Zliczanie duplikatów
+                    DOWNLOAD_OFFERS.inc(result="duplicate")
                     continue
                 seen_slugs.add(slug)
                 new_lines.append(json.dumps(offer, ensure_ascii=False))
+            DEDUP_SECONDS.observe(time.perf_counter() - dedup_start, stage="download")
 
             if new_lines:
                 if existing_content and not existing_content.endswith("\n"):
                     existing_content += "\n"
                 updated_content = existing_content + "\n".join(new_lines) + "\n"
                 try:
-                    s3_client.put_file(s3_key,updated_content.encode('utf-8'))
+                    body = updated_content.encode('utf-8')
+                    uploaded = s3_client.put_file(s3_key, body)
+                    if not uploaded:
+                        raise RuntimeError("put_file nie powiódł się")
                     saved_offers += len(new_lines)
+                    DOWNLOAD_OFFERS.inc(len(new_lines), result="saved")
                     logging.info(f"Zapisano {len(new_lines)} nowych ofert do obiektu S3: {s3_key}.")
+                    manifest = self.get_manifest(s3_client)
+                    if manifest is not None:
+                        etag = uploaded if isinstance(uploaded, str) else s3_client.get_s3_etag(s3_key)
+                        manifest.update(s3_key, len(body), etag, updated_content.count("\n"))
                 except Exception as e:
                     logging.error(f"Błąd przy zapisywaniu obiektu {s3_key} do S3: {e}")
             else:
                 logging.warning(f"Wszystkie oferty dla daty {date_str} są duplikatami.")
 
+        if self.manifest is not None and self.manifest.changed:
+            try:
+                self.manifest.save(s3_client.s3_client, s3_client.bucket_name)
+            except Exception as e:
+                logging.error(f"Błąd przy zapisie manifestu partycji: {e}")
+
         if total_offers == duplicate_offers:
             logging.warning("Wszystkie oferty to duplikaty, przerwanie zapisu do S3.")
             return False, saved_offers, duplicate_offers
         return True, saved_offers, duplicate_offers
     #####################################
-    def scrape_offer_details(self, db_url: str, delay_range=(2, 10)):
+    def scrape_offer_details(self, db_url: str, delay_range=SCRAPER_DELAY_RANGE):
         db = Database(db_url)
         pages = Pages(self.proxy_manager)
 
@@ -248,10 +305,12 @@ class JustJoinClient:
         skills_nice_to_have = 0
 
         for slug_entry in slugs:
-            time.sleep(random.uniform(*delay_range))
+            if delay_range[1] > 0:
+                time.sleep(random.uniform(*delay_range))
             slug = slug_entry.slug
             offer_id = slug_entry.offer_id
-            url = f"https://justjoin.it/job-offer/{slug}"
+            url = f"{JUSTJOIN_OFFER_URL}{slug}"
+            start = time.perf_counter()
 
             try:
                 logging.info(f"[START] Przetwarzanie oferty {slug} (offer_id={offer_id})")
@@ -302,10 +361,13 @@ class JustJoinClient:
                             skills_nice_to_have += 1
 
                 logging.info(f"[OK] {slug}")
+                SCRAPER_OFFER_SECONDS.observe(time.perf_counter() - start, status="ok")
 
             except Exception as e:
                 logging.error(f"[ERROR] {slug}: {e}")
                 db.save_scraper_entry(offer_id, "error", url, str(e))
                 errors += 1
+                SCRAPER_OFFER_SECONDS.observe(time.perf_counter() - start, status="error")
 
+        db.close()
         return total, success, errors, no_notes, skills_updated, skills_nice_to_have
\ No newline at end of file
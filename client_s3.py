@@ -1,31 +1,231 @@
+import json
+import math
+import mmap
 import os
+import threading
+import time
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from dotenv import load_dotenv
 import logging
-from datetime import datetime
 from botocore.exceptions import ClientError
 import hashlib
 from pathlib import Path
+import metrics
+
+try:
+    import zstandard
+except ImportError:  # opcjonalna zależność – bez niej bazy wysyłane są bez kompresji
+    zstandard = None
 
 load_dotenv()
 
 ENDPOINT_URL = os.getenv("ENDPOINT_URL")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
+# katalog zamiast bucketu (s3_local.LocalS3) – uruchomienia lokalne i testy transferów
+S3_LOCAL_DIR = os.getenv("S3_LOCAL_DIR")
+
+MB = 1024 * 1024
+# Transfery wieloczęściowe: próg, rozmiar części i liczba równoległych wątków
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16")) * MB
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "16")) * MB
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+# Wspólny klient boto3: pula połączeń HTTP (domyślnie w botocore tylko 10)
+# i tryb ponawiania (legacy / standard / adaptive)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "standard")
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))  # łącznie z pierwszą próbą
+# "zstd" – bazy SQLite w S3 jako <klucz>.zst (kompresja strumieniowa)
+SQLITE_COMPRESSION = os.getenv("SQLITE_COMPRESSION", "").lower()
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+ZSTD_SUFFIX = ".zst"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+S3_REQUEST_SECONDS = metrics.histogram("s3_request_seconds", "Czas operacji S3 (transfery plików – całość, get_object – do nagłówków odpowiedzi)")
+S3_BYTES = metrics.counter("s3_bytes", "Bajty przesłane do (out) i pobrane z (in) S3")
+S3_ERRORS = metrics.counter("s3_errors", "Nieudane operacje S3")
+
+###########################################
+def _reset_clients():
+    # Po fork() (ProcessPoolExecutor) proces potomny nie może używać puli
+    # połączeń rodzica – klient zostanie utworzony od nowa przy pierwszym użyciu
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_clients)
+###########################################
+def _request_bytes(operation: str, kwargs: dict, response) -> tuple:
+    # (wysłane, pobrane) – o ile da się je ustalić bez czytania treści
+    if operation == "put_object":
+        body = kwargs.get("Body")
+        return (len(body) if isinstance(body, (bytes, bytearray)) else 0), 0
+    if operation == "get_object" and isinstance(response, dict):
+        return 0, response.get("ContentLength", 0)
+    if operation == "upload_file":
+        return os.path.getsize(kwargs.get("Filename")), 0
+    if operation == "download_file" and os.path.exists(kwargs.get("Filename", "")):
+        return 0, os.path.getsize(kwargs["Filename"])
+    return 0, 0
+
+class InstrumentedS3Client:
+    # Pośrednik wspólnego klienta: czas i bajty każdej operacji z OPERATIONS
+    # (niezależnie od miejsca wywołania – S3Client, sqlite_sync, manifest, import)
+    OPERATIONS = {
+        "get_object", "put_object", "head_object", "copy_object", "delete_object", "delete_objects",
+        "list_objects_v2", "upload_file", "download_file", "upload_fileobj", "download_fileobj",
+    }
+    POSITIONAL = {"upload_file": ("Filename", "Bucket", "Key"), "download_file": ("Bucket", "Key", "Filename")}
+
+    def __init__(self, client):
+        self._client = client
+    ####################################################
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self.OPERATIONS:
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = attr(*args, **kwargs)
+            except Exception:
+                S3_ERRORS.inc(operation=name)
+                raise
+            finally:
+                S3_REQUEST_SECONDS.observe(time.perf_counter() - start, operation=name)
+            named = dict(zip(self.POSITIONAL.get(name, ()), args), **kwargs)
+            sent, received = _request_bytes(name, named, response)
+            if sent:
+                S3_BYTES.inc(sent, direction="out")
+            if received:
+                S3_BYTES.inc(received, direction="in")
+            return response
+        return call
+###########################################
+def client_config() -> Config:
+    # pula nie mniejsza niż liczba wątków transferu, inaczej wątki czekają na połączenie
+    return Config(
+        max_pool_connections=max(S3_MAX_POOL_CONNECTIONS, S3_MAX_CONCURRENCY),
+        retries={"mode": S3_RETRY_MODE, "total_max_attempts": S3_MAX_ATTEMPTS},
+    )
+###########################################
+def get_s3_client(endpoint_url=ENDPOINT_URL):
+    # Jeden klient na endpoint, tworzony leniwie przy pierwszym użyciu (nie przy
+    # imporcie modułu). Klienty boto3 są bezpieczne wątkowo, samo tworzenie nie –
+    # stąd blokada i osobna sesja.
+    client = _clients.get(endpoint_url)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(endpoint_url)
+        if client is None:
+            if S3_LOCAL_DIR:
+                from s3_local import LocalS3
+                client = LocalS3(S3_LOCAL_DIR)
+                logging.info(f"S3 client created (lokalny katalog {S3_LOCAL_DIR})")
+            else:
+                client = boto3.session.Session().client("s3", endpoint_url=endpoint_url, config=client_config())
+                logging.info(f"S3 client created (pula {max(S3_MAX_POOL_CONNECTIONS, S3_MAX_CONCURRENCY)} połączeń, "
+                             f"ponawianie {S3_RETRY_MODE}/{S3_MAX_ATTEMPTS})")
+            _clients[endpoint_url] = client = InstrumentedS3Client(client)
+    return client
+###########################################
+def transfer_config() -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=S3_MAX_CONCURRENCY,
+        use_threads=S3_MAX_CONCURRENCY > 1,
+    )
+###########################################
+def compression_enabled() -> bool:
+    if SQLITE_COMPRESSION != "zstd":
+        return False
+    if zstandard is None:
+        logging.warning("⚠️ SQLITE_COMPRESSION=zstd, ale brak pakietu zstandard – wysyłam bez kompresji")
+        return False
+    return True
+###########################################
+def compress_bytes(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+###########################################
+def decompress_bytes(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+###########################################
+def log_transfer(action: str, s3_key: str, size: int, elapsed: float, wire_size: int = None):
+    # Przepustowość liczona od rozmiaru pliku lokalnego; przy kompresji także rozmiar w S3
+    speed = size / MB / elapsed if elapsed > 0 else 0
+    ratio = f", w S3 {wire_size / MB:.1f} MiB ({wire_size / size:.0%})" if wire_size is not None and size else ""
+    logging.info(f"📶 {action} {s3_key}: {size / MB:.1f} MiB w {elapsed:.1f} s ({speed:.1f} MiB/s{ratio})")
+
+###########################################
+def part_size_for(size: int, chunksize: int = S3_MULTIPART_CHUNKSIZE) -> int:
+    # Rozmiar części tak jak w s3transfer: min. 5 MiB, maks. 10000 części
+    chunksize = max(chunksize, 5 * MB)
+    while math.ceil(size / chunksize) > 10000:
+        chunksize *= 2
+    return chunksize
+###########################################
+def multipart_etag(path, part_size: int = None) -> str:
+    # ETag jak w S3: MD5 pliku (part_size=None) albo MD5 z MD5 części + "-<liczba części>".
+    # Plik mapowany w pamięci – części hashowane bez kopiowania do bufora Pythona
+    size = os.path.getsize(path)
+    if size == 0:
+        return hashlib.md5(b"").hexdigest()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            if part_size is None:
+                return hashlib.md5(view).hexdigest()
+            digests = [hashlib.md5(view[start:start + part_size]).digest() for start in range(0, size, part_size)]
+            return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+        finally:
+            view.release()
+###########################################
+def etag_part_sizes(size: int, s3_etag: str) -> list:
+    # Możliwe rozmiary części dla ETagu z S3 ("<md5>-N"); None – wysyłka jednoczęściowa
+    if "-" not in s3_etag:
+        return [None]
+    parts = int(s3_etag.rsplit("-", 1)[1])
+    candidates = [part_size_for(size), part_size_for(size, 8 * MB)] + [2 ** i * MB for i in range(3, 12)]
+    return [ps for ps in dict.fromkeys(candidates) if math.ceil(size / ps) == parts]
+###########################################
+def file_fingerprint(path) -> dict:
+    stat = os.stat(path)
+    return {"inode": stat.st_ino, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+###########################################
+class _CountingReader:
+    # Licznik bajtów przekazanych do upload_fileobj (rozmiar po kompresji)
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
 
 class S3Client:
     def __init__(self, endpoint_url=ENDPOINT_URL, bucket_name=BUCKET_NAME):
         self.endpoint_url = endpoint_url
         self.bucket_name = bucket_name
+        self.transfer_config = transfer_config()
         try:
-            self.s3_client = boto3.client('s3', endpoint_url=endpoint_url)
-            logging.info("S3 client created")
+            self.s3_client = get_s3_client(endpoint_url)
         except Exception as e:
             logging.error(f"Failed to create S3 client: {e}")
     #####################################
     def upload_file(self, file_path,s3_key):
         try:
-            self.s3_client.upload_file(file_path, Bucket=self.bucket_name, Key=s3_key)
+            start = time.perf_counter()
+            self.s3_client.upload_file(file_path, Bucket=self.bucket_name, Key=s3_key, Config=self.transfer_config)
             logging.info(f"File uploaded to S3: {s3_key}")
+            log_transfer("Wysłano", s3_key, os.path.getsize(file_path), time.perf_counter() - start)
             return True
         except Exception as e:
             logging.error(f"Failed to upload file to S3: {e}")
@@ -42,57 +242,109 @@ class S3Client:
             return False
     #####################################
     def put_file(self, s3_key, body):
+        # ETag zapisanego obiektu (z odpowiedzi PUT, bez dodatkowego HEAD) albo False przy błędzie
         try:
-            self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=body)
+            response = self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=body)
             logging.info(f"File uploaded to S3: {s3_key}")
-            return True
+            return (response.get("ETag") or "").strip('"') or True
         except Exception as e:
             logging.error(f"Failed to upload file to S3: {e}")
             return False
     #####################################
-    def download_sqlite_db(self, s3_key: str, local_path: str) -> bool:
+    def list_keys(self, prefix: str) -> list:
+        keys = []
         try:
-            self.s3_client.download_file(self.bucket_name, s3_key, local_path)
-            logging.info(f"📥 Pobrano bazę danych z S3: {s3_key}")
-            self.save_etag_for_file(local_path, s3_key)
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            for result in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                keys.extend(obj["Key"] for obj in result.get("Contents", []))
+        except Exception as e:
+            logging.error(f"Failed to list S3 objects: {e}")
+        return keys
+    #####################################
+    def delete_file(self, s3_key: str) -> bool:
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            logging.info(f"File deleted from S3: {s3_key}")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to delete file from S3: {e}")
+            return False
+    #####################################
+    def _exists(self, s3_key: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
             return True
         except ClientError as e:
+            if e.response['Error']['Code'] in ("404", "NoSuchKey"):
+                return False
+            raise
+    #####################################
+    def sqlite_key(self, s3_key: str) -> str:
+        # Klucz, pod którym faktycznie leży baza: wersja .zst, gdy kompresja jest
+        # włączona i plik istnieje (starsze pliki bez kompresji nadal są czytane)
+        if compression_enabled() and self._exists(s3_key + ZSTD_SUFFIX):
+            return s3_key + ZSTD_SUFFIX
+        return s3_key
+    #####################################
+    def upload_file_zstd(self, file_path: str, s3_key: str):
+        # Kompresja strumieniowa prosto do uploadu wieloczęściowego – bez pliku tymczasowego
+        start = time.perf_counter()
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+        with open(file_path, "rb") as f, compressor.stream_reader(f) as reader:
+            counting = _CountingReader(reader)
+            self.s3_client.upload_fileobj(counting, self.bucket_name, s3_key, Config=self.transfer_config)
+        log_transfer("Wysłano (zstd)", s3_key, os.path.getsize(file_path), time.perf_counter() - start, counting.count)
+    #####################################
+    def download_file_zstd(self, s3_key: str, local_path: str):
+        # Części pobierane równolegle, dekompresja w trakcie zapisu do pliku tymczasowego
+        start = time.perf_counter()
+        tmp_path = f"{local_path}.download"
+        try:
+            with open(tmp_path, "wb") as out:
+                with zstandard.ZstdDecompressor().stream_writer(out, closefd=False) as writer:
+                    self.s3_client.download_fileobj(self.bucket_name, s3_key, writer, Config=self.transfer_config)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        wire_size = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)["ContentLength"]
+        log_transfer("Pobrano (zstd)", s3_key, os.path.getsize(local_path), time.perf_counter() - start, wire_size)
+    #####################################
+    def download_sqlite_db(self, s3_key: str, local_path: str) -> bool:
+        try:
+            source_key = self.sqlite_key(s3_key)
+            start = time.perf_counter()
+            if source_key.endswith(ZSTD_SUFFIX):
+                self.download_file_zstd(source_key, local_path)
+            else:
+                self.s3_client.download_file(self.bucket_name, source_key, local_path, Config=self.transfer_config)
+                log_transfer("Pobrano", source_key, os.path.getsize(local_path), time.perf_counter() - start)
+            logging.info(f"📥 Pobrano bazę danych z S3: {source_key}")
+            self.save_etag_for_file(local_path, source_key)
+            return True
+        except Exception as e:
             logging.error(f"❌ Błąd podczas pobierania bazy danych: {e}")
             return False
     #####################################
-    def upload_sqlite_db(self, s3_key: str, local_path: str, backup_prefix: str = None) -> bool:
+    def upload_sqlite_db(self, s3_key: str, local_path: str) -> bool:
+        # Kopie zapasowe wersji bazy prowadzi backup_store (porcje sqlite_sync z retencją)
         try:
-            if backup_prefix:
-                try:
-                    self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
-                    timestamp = datetime.today().strftime('%Y%m%d_%H%M')
-                    backup_key = f"{backup_prefix}/jobs_{timestamp}.sqlite"
-                    copy_source = {
-                        'Bucket': self.bucket_name,
-                        'Key': s3_key
-                    }
-                    self.s3_client.copy_object(
-                        Bucket=self.bucket_name,
-                        CopySource=copy_source,
-                        Key=backup_key
-                    )
-                    logging.info(f"💾 Backup bazy wykonany w S3: {s3_key} ➜ {backup_key}")
-                except ClientError as e:
-                    if e.response['Error']['Code'] == "404":
-                        logging.info(f"ℹ️ Brak pliku do backupu na S3: {s3_key}")
-                    else:
-                        raise
-
-            self.s3_client.upload_file(local_path, self.bucket_name, s3_key)
+            if compression_enabled():
+                s3_key = s3_key + ZSTD_SUFFIX
+                self.upload_file_zstd(str(local_path), s3_key)
+            else:
+                start = time.perf_counter()
+                self.s3_client.upload_file(str(local_path), self.bucket_name, s3_key, Config=self.transfer_config)
+                log_transfer("Wysłano", s3_key, os.path.getsize(local_path), time.perf_counter() - start)
             logging.info(f"📤 Wysłano bazę danych na S3: {s3_key}")
             self.save_etag_for_file(local_path, s3_key)
             return True
 
-        except ClientError as e:
+        except Exception as e:
             logging.error(f"❌ Błąd podczas wysyłania bazy danych: {e}")
             return False
     #####################################
-    def with_synced_sqlite_db(self, s3_key: str, local_path: str, backup_prefix: str = None):
+    def with_synced_sqlite_db(self, s3_key: str, local_path: str):
         def decorator(func):
             def wrapper(*args, **kwargs):
                 if not self.download_sqlite_db(s3_key, local_path):
@@ -101,7 +353,7 @@ class S3Client:
                     result = func(local_path, *args, **kwargs)
                     return result
                 finally:
-                    if not self.upload_sqlite_db(s3_key, local_path, backup_prefix):
+                    if not self.upload_sqlite_db(s3_key, local_path):
                         raise RuntimeError("Nie udało się wysłać zaktualizowanej bazy SQLite na S3.")
             return wrapper
         return decorator
@@ -112,7 +364,6 @@ class S3Client:
 # @s3.with_synced_sqlite_db(
 #     s3_key="jobs/sql/jobs.sqlite",
 #     local_path="/tmp/jobs.sqlite",
-#     backup_prefix="jobs/sql/backup"
 # )
 # def insert_offer(db_path, offer):
 #     import sqlite3
@@ -125,12 +376,39 @@ class S3Client:
 # # Wywołanie:
 # insert_offer({"title": "Data Scientist", "company": "AI Corp"})
     #####################################
-    def get_local_md5(self, filepath: str) -> str:
-        hash_md5 = hashlib.md5()
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+    def get_local_etag(self, local_path: str, s3_etag: str):
+        # ETag pliku lokalnego w formacie ETagu z S3. Wynik zapisany w <plik>.etag
+        # razem z inode/mtime/rozmiarem – ponowne liczenie tylko po zmianie pliku.
+        cache_path = Path(f"{local_path}.etag")
+        fingerprint = file_fingerprint(local_path)
+        cache = {}
+        if cache_path.exists():
+            try:
+                cache = json.loads(cache_path.read_text())
+            except ValueError:
+                cache = {}  # stary format (sam ETag) – bez zaufania
+        etags = cache.get("etags", {}) if cache.get("fingerprint") == fingerprint else {}
+        if s3_etag in etags.values():
+            return s3_etag
+
+        local_etag = None
+        for part_size in etag_part_sizes(fingerprint["size"], s3_etag):
+            cache_key = str(part_size or 0)
+            if cache_key not in etags:
+                start = time.perf_counter()
+                etags[cache_key] = multipart_etag(local_path, part_size)
+                logging.info(f"#️⃣ Policzono ETag lokalnej bazy ({fingerprint['size'] / MB:.1f} MiB w {time.perf_counter() - start:.1f} s)")
+            local_etag = etags[cache_key]
+            if local_etag == s3_etag:
+                break
+        self._save_etag_cache(local_path, fingerprint, etags, cache.get("s3_etag"))
+        return local_etag
+    #####################################
+    def _save_etag_cache(self, local_path: str, fingerprint: dict, etags: dict, s3_etag: str = None):
+        cache_path = Path(f"{local_path}.etag")
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        tmp_path.write_text(json.dumps({"fingerprint": fingerprint, "etags": etags, "s3_etag": s3_etag}))
+        os.replace(tmp_path, cache_path)
     #####################################
     def get_s3_etag(self, s3_key: str) -> str:
         try:
@@ -142,31 +420,44 @@ class S3Client:
             return None
     #####################################
     def is_sqlite_up_to_date(self, local_path: str, s3_key: str) -> bool:
-        etag_path = Path(f"{local_path}.etag")
-        if not etag_path.exists():
-            logging.info("📄 Brak lokalnego pliku .etag – pobieranie wymagane")
+        # Porównanie treści pliku lokalnego z obiektem w S3 (ETag), a nie tylko
+        # zapisanego ETagu – zmiana lokalnej bazy po pobraniu wymusza pobranie
+        if not os.path.exists(local_path):
             return False
-
         try:
-            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            source_key = self.sqlite_key(s3_key)
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=source_key)
             s3_etag = response['ETag'].strip('"')
 
-            with open(etag_path, "r") as f:
-                local_etag = f.read().strip()
+            if source_key.endswith(ZSTD_SUFFIX):
+                # ETag skompresowanego pliku – treści nie da się porównać, sprawdzamy
+                # tylko, czy plik lokalny nie zmienił się od pobrania/wysłania
+                cache_path = Path(f"{local_path}.etag")
+                cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+                fresh = cache.get("s3_etag") == s3_etag and cache.get("fingerprint") == file_fingerprint(local_path)
+                logging.info(f"🔍 Porównanie ETag (zstd): S3={s3_etag}, plik lokalny {'bez zmian' if fresh else 'zmieniony lub nieznany'}")
+                return fresh
 
+            local_etag = self.get_local_etag(local_path, s3_etag)
             logging.info(f"🔍 Porównanie ETag: lokalny={local_etag}, S3={s3_etag}")
-            return s3_etag == local_etag
+            return local_etag == s3_etag
 
         except Exception as e:
             logging.warning(f"❌ Błąd pobierania ETag z S3: {e}")
             return False
     #####################################
     def save_etag_for_file(self, local_path: str, s3_key: str):
+        # Po pobraniu/wysłaniu treść pliku = obiekt w S3 – ETag trafia do cache bez liczenia
         try:
             response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
             s3_etag = response['ETag'].strip('"')
-            with open(f"{local_path}.etag", "w") as f:
-                f.write(s3_etag)
+            fingerprint = file_fingerprint(local_path)
+            etags = {}
+            if not s3_key.endswith(ZSTD_SUFFIX):
+                # klucz = rozmiar części – nowy ETag w S3 o tej samej liczbie części porównamy bez liczenia
+                part_size = (etag_part_sizes(fingerprint["size"], s3_etag) or ["s3"])[0]
+                etags[str(part_size or 0)] = s3_etag
+            self._save_etag_cache(local_path, fingerprint, etags, s3_etag)
             logging.info(f"💾 Zapisano ETag do pliku: {local_path}.etag")
         except Exception as e:
             logging.warning(f"❌ Nie udało się zapisać ETag: {e}")
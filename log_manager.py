@@ -1,51 +1,239 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
 import datetime
+import queue
+import re
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
 
+load_dotenv()
+
+# Logi trafiają do kolejki (QueueHandler na root), a zapisem do pliku i na konsolę
+# zajmuje się osobny wątek (QueueListener) – pętle importu nie czekają na formatowanie i I/O.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# text – jak dotąd; json – jedna linia JSON na wpis (tylko plik, konsola zostaje tekstowa)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# poziomy dla pojedynczych modułów, np. "sql_import_offers=WARNING,client_justjoin=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# komunikaty oznaczone extra=SAMPLED: pierwsze LOG_SAMPLE_BURST z danego miejsca w kodzie,
+# potem co LOG_SAMPLE_EVERY-ty (0 – bez próbkowania); błędy zawsze przechodzą
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+SAMPLED = {"sampled": True}
+TIMESTAMP_FORMAT = "%Y-%m-%d-%H-%M-%S"
+
+_listener = None
+_listener_lock = threading.Lock()
+
+###########################################
+def parse_levels(value: str) -> dict:
+    # "moduł=POZIOM,..." ➜ {moduł: numer poziomu}
+    levels = {}
+    for part in value.split(","):
+        module, _, level = part.partition("=")
+        if module.strip() and level.strip():
+            levels[module.strip()] = logging.getLevelName(level.strip().upper())
+    return {module: level for module, level in levels.items() if isinstance(level, int)}
+
+###########################################
+class ModuleLevelFilter(logging.Filter):
+    # Moduły logują przez root logger, więc poziom sprawdzany jest po nazwie pliku (record.module)
+    def __init__(self, levels: dict):
+        super().__init__()
+        self.levels = levels
+    ####################################################
+    def filter(self, record):
+        level = self.levels.get(record.module)
+        return level is None or record.levelno >= level
+
+###########################################
+class SamplingFilter(logging.Filter):
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.burst = burst
+        self.every = every
+        self.counts = {}
+        self.pending = {}
+        self.suppressed = 0
+        self._lock = threading.Lock()
+    ####################################################
+    def filter(self, record):
+        if self.every <= 0 or record.levelno >= logging.ERROR or not getattr(record, "sampled", False):
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self.counts.get(key, 0) + 1
+            self.counts[key] = count
+            if count > self.burst and (count - self.burst) % self.every:
+                self.pending[key] = self.pending.get(key, 0) + 1
+                self.suppressed += 1
+                return False
+            skipped = self.pending.pop(key, 0)
+        if skipped:
+            record.msg = f"{record.getMessage()} (pominięto {skipped} podobnych)"
+            record.args = None
+        return True
+
+###########################################
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+###########################################
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Domyślne prepare() wkleja traceback do treści – tu trafia do exc_text,
+    # więc formatter JSON może go zapisać w osobnym polu
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+###########################################
+def _stop_listener():
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()  # opróżnia kolejkę przed zamknięciem plików
+    for handler in listener.handlers:
+        handler.close()
+###########################################
+def _restart_listener_in_child():
+    # Po fork() wątek zapisujący nie istnieje w procesie potomnym – bez tego
+    # logi z procesów roboczych zostałyby w kolejce
+    if _listener is not None:
+        _listener.start()
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+###########################################
 class LogManager:
     def __init__(self, log_file="justjoinit.log"):
         self.log_file = log_file
+        self.file_handler = None
+        self.sampling = None
         self._configure_logging()
     ####################################################
     def _configure_logging(self):
+        global _listener
+        _stop_listener()
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
-            
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file, encoding="utf-8"),
-                logging.StreamHandler()
-            ]
-        )
+
+        self.file_handler = logging.FileHandler(self.log_file, encoding="utf-8")
+        self.file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        # filtry działają w wątku logującym – odrzucony wpis nie trafia do kolejki
+        levels = parse_levels(LOG_LEVELS)
+        if levels:
+            queue_handler.addFilter(ModuleLevelFilter(levels))
+        self.sampling = SamplingFilter()
+        queue_handler.addFilter(self.sampling)
+
+        logging.root.addHandler(queue_handler)
+        logging.root.setLevel(LOG_LEVEL)
+        with _listener_lock:
+            _listener = logging.handlers.QueueListener(log_queue, self.file_handler, stream_handler,
+                                                       respect_handler_level=True)
+            _listener.start()
+    ####################################################
+    def rotate(self):
+        # Przenosi bieżący plik pod nazwę z datą; handler otworzy nowy przy kolejnym wpisie
+        rotated = f"{self.log_file.replace('.log', '')}_{datetime.datetime.now().strftime(TIMESTAMP_FORMAT)}.log"
+        handler = self.file_handler
+        handler.acquire()
+        try:
+            if handler.stream:
+                handler.stream.flush()
+                handler.stream.close()
+                handler.stream = None
+            if not os.path.exists(self.log_file):
+                return None
+            if os.path.exists(rotated):
+                # niewysłany plik z tej samej sekundy – dopisujemy zamiast nadpisywać
+                with open(rotated, "ab") as target, open(self.log_file, "rb") as source:
+                    target.write(source.read())
+                os.remove(self.log_file)
+            else:
+                os.replace(self.log_file, rotated)
+        finally:
+            handler.release()
+        return rotated
+    ####################################################
+    def pending_rotated(self):
+        # Pliki po rotacji, których nie udało się jeszcze wysłać (również z poprzednich uruchomień)
+        path = Path(self.log_file)
+        pattern = re.compile(rf"{re.escape(path.stem)}_\d{{4}}(-\d{{2}}){{5}}\.log")
+        return sorted(str(p) for p in path.parent.glob(f"{path.stem}_*.log") if pattern.fullmatch(p.name))
     ####################################################
     def upload_logs_s3(self,s3_client, backup_type="download"):
-        now = datetime.datetime.now()
-        timestamp = now.strftime("%Y-%m-%d-%H-%M-%S")
-        log_filename = f"{self.log_file.replace('.log', '')}_{timestamp}.log"
-        
-        if backup_type == "download":
-            year = now.strftime("%Y")
-            month = now.strftime("%m")
-            day = now.strftime("%d")
-            s3_key = f"jobs/year={year}/month={month}/day={day}/{log_filename}"
-        elif backup_type == "sql":
-            s3_key = f"jobs/sql/logs/{log_filename}"
-        elif backup_type == "scraper":
-            s3_key = f"jobs/scraper/logs/{log_filename}"
-        
-        if not os.path.exists(self.log_file):
+        if self.sampling is not None and self.sampling.suppressed:
+            logging.info(f"🔇 Próbkowanie logów: pominięto {self.sampling.suppressed} powtarzalnych komunikatów")
+            self.sampling.suppressed = 0
+
+        if not os.path.exists(self.log_file) and not self.pending_rotated():
             logging.warning(f"Plik logów {self.log_file} nie istnieje")
             return
-        try:
-            s3_client.upload_file(self.log_file, s3_key)
+        # wpisy czekające w kolejce mają trafić do wysyłanego pliku
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+        self.rotate()
+
+        now = datetime.datetime.now()
+        sent = True
+        for log_path in self.pending_rotated():
+            log_filename = os.path.basename(log_path)
+            if backup_type == "download":
+                year = now.strftime("%Y")
+                month = now.strftime("%m")
+                day = now.strftime("%d")
+                s3_key = f"jobs/year={year}/month={month}/day={day}/{log_filename}"
+            elif backup_type == "sql":
+                s3_key = f"jobs/sql/logs/{log_filename}"
+            elif backup_type == "scraper":
+                s3_key = f"jobs/scraper/logs/{log_filename}"
+            # plik, którego nie udało się wysłać, zostaje i będzie wysłany przy następnym uruchomieniu
+            # (S3Client.upload_file zgłasza błąd wynikiem False, nie wyjątkiem)
+            try:
+                uploaded = s3_client.upload_file(log_path, s3_key)
+            except Exception as e:
+                logging.error(f"Błąd przesyłania logów: {e}")
+                uploaded = False
+            if not uploaded:
+                logging.error(f"Nie udało się wysłać logów {log_path} – plik zostaje do ponownej wysyłki")
+                sent = False
+                continue
+            os.remove(log_path)
             logging.info(f"Logi przesłane do S3: {s3_key}")
-            with open(self.log_file, 'w', encoding="utf-8") as f:
-                pass # Nic nie robimy, plik jest otwarty w trybie zapisu i natychmiast zamykany
-            logging.info(f"Plik lokalny {self.log_file} został wyczyszczony.")
-            return True
-        except Exception as e:
-            logging.error(f"Błąd przesyłania logów: {e}")
-            return False
-    ####################################################
\ No newline at end of file
+        return sent
+    ####################################################
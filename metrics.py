@@ -0,0 +1,292 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Lekki rejestr metryk zadania: liczniki i histogramy (pomiar czasu = histogram w sekundach).
+# Moduły tworzą metryki przy imporcie (counter()/histogram() zwracają istniejącą metrykę
+# o tej samej nazwie), a dekorator job_metrics() w app.py zeruje je na starcie zadania
+# i po jego zakończeniu zapisuje do METRICS_DIR: <zadanie>_<czas>.prom (OpenMetrics)
+# oraz <zadanie>_<czas>.json (podsumowanie z kwantylami).
+METRICS_DIR = os.getenv("METRICS_DIR", "data/metrics")
+# granice kubełków histogramów czasu (s)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+###########################################
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value).lower() if isinstance(value, bool) else str(value)) for name, value in labels.items()))
+###########################################
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+###########################################
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+###########################################
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+###########################################
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self._lock = threading.Lock()
+    ####################################################
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+    ####################################################
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0)
+    ####################################################
+    def reset(self):
+        with self._lock:
+            self.values = {}
+    ####################################################
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.values)
+    ####################################################
+    def merge(self, values: dict):
+        with self._lock:
+            for key, value in values.items():
+                self.values[key] = self.values.get(key, 0) + value
+    ####################################################
+    def openmetrics(self) -> list:
+        return [f"{self.name}_total{_format_labels(key)} {_format_number(value)}" for key, value in sorted(self.values.items())]
+    ####################################################
+    def summary(self) -> list:
+        return [{"labels": dict(key), "value": value} for key, value in sorted(self.values.items())]
+
+###########################################
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # etykiety ➜ [liczniki kubełków (ostatni = +Inf), suma, liczba, min, max]
+        self.values = {}
+        self._lock = threading.Lock()
+    ####################################################
+    def _state(self, key):
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, None, None]
+        return state
+    ####################################################
+    def observe(self, value: float, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+        key = _label_key(labels)
+        with self._lock:
+            state = self._state(key)
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+            state[3] = value if state[3] is None or value < state[3] else state[3]
+            state[4] = value if state[4] is None or value > state[4] else state[4]
+    ####################################################
+    @contextmanager
+    def time(self, **labels):
+        # `with HIST.time(op="x"):` albo `@HIST.time(op="x")`
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    ####################################################
+    def count(self, **labels) -> int:
+        state = self.values.get(_label_key(labels))
+        return state[2] if state else 0
+    ####################################################
+    def reset(self):
+        with self._lock:
+            self.values = {}
+    ####################################################
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: [list(state[0]), *state[1:]] for key, state in self.values.items()}
+    ####################################################
+    def merge(self, values: dict):
+        with self._lock:
+            for key, (counts, total, count, low, high) in values.items():
+                state = self._state(key)
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+                state[3] = low if state[3] is None or (low is not None and low < state[3]) else state[3]
+                state[4] = high if state[4] is None or (high is not None and high > state[4]) else state[4]
+    ####################################################
+    def quantile(self, q: float, counts: list, count: int, high: float) -> float:
+        # Interpolacja liniowa w kubełku (jak histogram_quantile w Prometheusie);
+        # w ostatnim, otwartym kubełku – maksimum
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if index == len(self.buckets):
+                    return high
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = min(self.buckets[index], high)
+                return lower + (upper - lower) * max(rank - cumulative, 0) / bucket_count
+            cumulative += bucket_count
+        return high
+    ####################################################
+    def openmetrics(self) -> list:
+        lines = []
+        for key, (counts, total, count, low, high) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', _format_number(float(bound))),))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_number(total)}")
+        return lines
+    ####################################################
+    def summary(self) -> list:
+        result = []
+        for key, (counts, total, count, low, high) in sorted(self.values.items()):
+            entry = {"labels": dict(key), "count": count, "sum": total, "mean": total / count if count else None,
+                     "min": low, "max": high}
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}"] = self.quantile(q, counts, count, high) if count else None
+            result.append(entry)
+        return result
+
+###########################################
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.started_at = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+    ####################################################
+    def _get(self, cls, name: str, *args):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = cls(name, *args)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metryka {name} jest już zarejestrowana jako {metric.type}")
+        return metric
+    ####################################################
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+    ####################################################
+    def histogram(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+    ####################################################
+    def reset(self):
+        # Zerowanie wartości – same metryki zostają, bo moduły trzymają do nich referencje
+        for metric in list(self.metrics.values()):
+            metric.reset()
+        self.started_at = datetime.now(timezone.utc)
+    ####################################################
+    def snapshot(self) -> dict:
+        # Wartości do przekazania z procesu roboczego (picklowalne)
+        return {name: (metric.type, metric.help, getattr(metric, "buckets", None), metric.snapshot())
+                for name, metric in list(self.metrics.items()) if metric.values}
+    ####################################################
+    def merge(self, snapshot: dict):
+        for name, (kind, help, buckets, values) in snapshot.items():
+            metric = self.counter(name, help) if kind == "counter" else self.histogram(name, help, buckets)
+            metric.merge(values)
+    ####################################################
+    def to_openmetrics(self) -> str:
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            if not metric.values:
+                continue
+            lines.append(f"# TYPE {name} {metric.type}")
+            if metric.help:
+                lines.append(f"# HELP {name} {_escape(metric.help)}")
+            if metric.type == "histogram":
+                lines.append(f"# UNIT {name} seconds" if name.endswith("_seconds") else "")
+            lines.extend(metric.openmetrics())
+        lines.append("# EOF")
+        return "\n".join(line for line in lines if line) + "\n"
+    ####################################################
+    def summary(self) -> dict:
+        return {name: {"type": metric.type, "help": metric.help, "values": metric.summary()}
+                for name, metric in sorted(self.metrics.items()) if metric.values}
+    ####################################################
+    def dump(self, job: str, directory=METRICS_DIR, **extra):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        finished_at = datetime.now(timezone.utc)
+        base = directory / f"{job}_{finished_at.strftime('%Y%m%d_%H%M%S')}"
+        prom_path = base.with_suffix(".prom")
+        json_path = base.with_suffix(".json")
+        prom_path.write_text(self.to_openmetrics(), encoding="utf-8")
+        document = {"job": job, "started_at": self.started_at.isoformat(), "finished_at": finished_at.isoformat(),
+                    **extra, "metrics": self.summary()}
+        json_path.write_text(json.dumps(document, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        return prom_path, json_path
+    ####################################################
+    def top_timings(self, limit: int = 5) -> list:
+        # [(metryka{etykiety}, łączny czas, liczba)] – największy łączny czas na początku
+        rows = []
+        for name, metric in self.metrics.items():
+            if metric.type != "histogram" or not name.endswith("_seconds"):
+                continue
+            for key, state in list(metric.values.items()):
+                rows.append((f"{name}{_format_labels(key)}", state[1], state[2]))
+        return sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+
+REGISTRY = MetricsRegistry()
+
+###########################################
+def counter(name: str, help: str = "") -> Counter:
+    return REGISTRY.counter(name, help)
+###########################################
+def histogram(name: str, help: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help, buckets)
+###########################################
+def job_metrics(job: str):
+    # Dekorator zadania: metryki od zera, czas całego zadania i zrzut po zakończeniu
+    # (także po błędzie – wtedy najbardziej przydaje się wiedza, gdzie zeszło)
+    job_seconds = histogram("job_seconds", "Czas całego zadania")
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            REGISTRY.reset()
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = bool(result)
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                job_seconds.observe(elapsed, job=job)
+                try:
+                    prom_path, json_path = REGISTRY.dump(job, seconds=elapsed, ok=ok)
+                    timings = ", ".join(f"{name}: {total:.1f} s/{count}" for name, total, count in REGISTRY.top_timings()
+                                        if not name.startswith("job_seconds"))
+                    logging.info(f"📈 Metryki zadania {job} ({elapsed:.1f} s) zapisane w {prom_path} i {json_path.name}: {timings}")
+                except Exception as e:
+                    logging.error(f"❌ Nie udało się zapisać metryk zadania {job}: {e}")
+        return wrapper
+    return decorator
@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from botocore.exceptions import ClientError
+
+# Lokalny zamiennik klienta boto3 S3 (obiekty jako pliki w katalogu) – do
+# uruchamiania zadań i sprawdzania transferów bez bucketu: S3_LOCAL_DIR=/tmp/s3.
+# Obsługuje tylko metody używane w projekcie; Config/Callback są ignorowane.
+# `stats` – liczba żądań i bajtów wysłanych do / pobranych z "bucketu" (bench_pipeline.py).
+
+###########################################
+def _not_found(operation: str, code: str = "NoSuchKey"):
+    return ClientError({"Error": {"Code": code, "Message": "Not Found"}}, operation)
+
+###########################################
+class LocalS3:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0}
+        self._stats_lock = threading.Lock()
+    ####################################################
+    def _count(self, bytes_in: int = 0, bytes_out: int = 0):
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += bytes_out
+    ####################################################
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+    ####################################################
+    def _meta(self, path: Path) -> dict:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                md5.update(block)
+        stat = path.stat()
+        return {
+            "ETag": f'"{md5.hexdigest()}"',
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        }
+    ####################################################
+    def _write(self, bucket: str, key: str, fileobj):
+        path = self._path(bucket, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+            written = out.tell()
+        os.replace(tmp, path)
+        return written
+    ####################################################
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        self._count(bytes_in=self._write(Bucket, Key, io.BytesIO(Body) if isinstance(Body, (bytes, bytearray)) else Body))
+        return {"ETag": self._meta(self._path(Bucket, Key))["ETag"]}
+    ####################################################
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("GetObject")
+        meta = self._meta(path)
+        body = open(path, "rb")
+        size = sent = meta["ContentLength"]
+        if Range:
+            start, _, end = Range.split("=", 1)[1].partition("-")
+            body.seek(int(start))
+            sent -= int(start)
+            if end:
+                body = io.BytesIO(body.read(int(end) - int(start) + 1))
+                sent = len(body.getvalue())
+            # jak w S3: ContentLength to długość zakresu
+            meta["ContentLength"] = sent
+            meta["ContentRange"] = f"bytes {start}-{int(start) + sent - 1}/{size}"
+        self._count(bytes_out=sent)
+        return {"Body": body, **meta}
+    ####################################################
+    def head_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("HeadObject", "404")
+        self._count()
+        return self._meta(path)
+    ####################################################
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, "rb") as f:
+            self._count(bytes_in=self._write(Bucket, Key, f))
+    ####################################################
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self._count(bytes_in=self._write(Bucket, Key, Fileobj))
+    ####################################################
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Callback=None, Config=None):
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("HeadObject", "404")
+        shutil.copyfile(path, Filename)
+        self._count(bytes_out=path.stat().st_size)
+    ####################################################
+    def download_fileobj(self, Bucket, Key, Fileobj, ExtraArgs=None, Callback=None, Config=None):
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("HeadObject", "404")
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, Fileobj, 1024 * 1024)
+        self._count(bytes_out=path.stat().st_size)
+    ####################################################
+    def copy_object(self, Bucket, CopySource, Key, **kwargs):
+        source = self._path(CopySource["Bucket"], CopySource["Key"])
+        if not source.is_file():
+            raise _not_found("CopyObject")
+        with open(source, "rb") as f:
+            self._write(Bucket, Key, f)
+        self._count()  # kopia po stronie serwera – bez transferu
+        return {}
+    ####################################################
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._path(Bucket, Key).unlink(missing_ok=True)
+        self._count()
+        return {}
+    ####################################################
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete["Objects"]:
+            self._path(Bucket, obj["Key"]).unlink(missing_ok=True)
+        self._count()
+        return {}
+    ####################################################
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        base = self.root / Bucket
+        contents = []
+        if base.exists():
+            for path in sorted(base.rglob("*")):
+                key = path.relative_to(base).as_posix()
+                if path.is_file() and key.startswith(Prefix) and not (path.name.startswith(".") and path.name.endswith(".tmp")):
+                    meta = self._meta(path)
+                    contents.append({"Key": key, "Size": meta["ContentLength"], "ETag": meta["ETag"],
+                                     "LastModified": meta["LastModified"]})
+        self._count()
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
+    ####################################################
+    def get_paginator(self, operation: str):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix="", **kwargs):
+                yield client.list_objects_v2(Bucket=Bucket, Prefix=Prefix)
+        return Paginator()
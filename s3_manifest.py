@@ -0,0 +1,104 @@
+import json
+import logging
+import re
+from datetime import datetime, date, timezone
+from botocore.exceptions import ClientError
+
+# Manifest partycji w S3: klucz pliku dziennego ➜ rozmiar, ETag, liczba linii.
+# Aktualizuje go downloader przy każdym zapisie partycji, a importer czyta go
+# zamiast listować cały bucket.
+MANIFEST_KEY = "jobs/manifest.json"
+PARTITION_PREFIX = "jobs/year="
+
+###################################################
+def extract_date(key):
+    match = re.search(r"justjoinit_(\d{4})-(\d{2})-(\d{2})\.jsonl", key)
+    if match:
+        return datetime(int(match[1]), int(match[2]), int(match[3]))
+    print(f"⚠️ Nie udało się sparsować daty z klucza: {key}")
+    return datetime.min
+###################################################
+def partition_prefixes(date_from: date = None, date_to: date = None) -> list:
+    # Prefiksy miesięczne dla zakresu dat; bez zakresu – wszystkie partycje
+    if date_from is None or date_to is None:
+        return [PARTITION_PREFIX]
+    prefixes = []
+    year, month = date_from.year, date_from.month
+    while (year, month) <= (date_to.year, date_to.month):
+        prefixes.append(f"{PARTITION_PREFIX}{year}/month={month:02d}/")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return prefixes
+
+###################################################
+class Manifest:
+    def __init__(self, files: dict = None, exists: bool = False):
+        self.files = files or {}
+        self.exists = exists
+        self.changed = False
+    ####################################################
+    @classmethod
+    def load(cls, client, bucket: str, key: str = MANIFEST_KEY) -> "Manifest":
+        try:
+            response = client.get_object(Bucket=bucket, Key=key)
+            data = json.loads(response["Body"].read())
+            return cls(data.get("files", {}), exists=True)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                logging.info(f"ℹ️ Brak manifestu {key} w S3 – zostanie utworzony")
+                return cls()
+            raise
+    ####################################################
+    def save(self, client, bucket: str, key: str = MANIFEST_KEY):
+        body = json.dumps({
+            "version": 1,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "files": self.files,
+        }, ensure_ascii=False, sort_keys=True)
+        client.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"), ContentType="application/json")
+        self.exists = True
+        self.changed = False
+        logging.info(f"🗂 Zapisano manifest partycji: {key} ({len(self.files)} plików)")
+    ####################################################
+    def update(self, key: str, size: int, etag: str, lines: int = None):
+        if not etag:
+            # wpis bez ETagu zatrzymałby import – plik uzupełni uzgadnianie z bucketem
+            logging.warning(f"⚠️ Brak ETagu dla {key} – pomijam wpis w manifeście")
+            return
+        entry = self.files.get(key)
+        etag = etag.strip('"')
+        if entry and entry["etag"] == etag and entry["size"] == size:
+            return
+        if lines is None and entry and entry["size"] == size:
+            lines = entry.get("lines")
+        self.files[key] = {
+            "size": size,
+            "etag": etag,
+            "lines": lines,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.changed = True
+    ####################################################
+    def reconcile(self, client, bucket: str, date_from: date = None, date_to: date = None) -> int:
+        # Uzgodnienie z rzeczywistą zawartością bucketu (listowanie tylko wskazanego zakresu)
+        before = dict(self.files)
+        paginator = client.get_paginator("list_objects_v2")
+        for prefix in partition_prefixes(date_from, date_to):
+            for result in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                for obj in result.get("Contents", []):
+                    if obj["Key"].endswith(".jsonl"):
+                        self.update(obj["Key"], obj["Size"], obj["ETag"])
+        changed = sum(1 for key, entry in self.files.items() if before.get(key) != entry)
+        logging.info(f"🔄 Uzgodniono manifest z S3: zmienione wpisy: {changed}")
+        return changed
+    ####################################################
+    def objects(self, date_from: date = None, date_to: date = None) -> list:
+        # Wpisy w formacie zgodnym z list_objects_v2 (Key/Size/ETag)
+        result = []
+        for key, entry in self.files.items():
+            file_date = extract_date(key).date()
+            if date_from is not None and file_date < date_from:
+                continue
+            if date_to is not None and file_date > date_to:
+                continue
+            result.append({"Key": key, "Size": entry["size"], "ETag": entry["etag"]})
+        return result
@@ -0,0 +1,268 @@
+import argparse
+import logging
+import os
+import sys
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from sql_engine import create_sqlite_engine
+from sql_models import Offer, EmploymentType, Category, ExperienceLevel
+
+load_dotenv()
+
+# Wektorowy silnik statystyk wynagrodzeń: employment_types wczytywane partiami
+# do tablic NumPy, normalizacja do miesięcznego brutto w PLN (kursy, jednostki,
+# współczynniki B2B/UoP konfigurowalne) i percentyle / histogramy w dowolnym
+# podziale – bez pętli po wierszach w Pythonie.
+
+LOAD_CHUNK = 50000
+
+DEFAULT_RATES = {"pln": 1.0, "eur": 4.3, "usd": 4.0, "gbp": 5.0, "chf": 4.5}
+DEFAULT_UNITS = {"hour": 168.0, "day": 21.0, "week": 4.33, "month": 1.0, "year": 1 / 12}
+# Kwoty netto (gross=False) dla umów o pracę / zlecenie ➜ brutto
+DEFAULT_NET_TO_GROSS = {"permanent": 1 / 0.71, "mandate_contract": 1 / 0.77}
+# Przeliczenie typu umowy na ekwiwalent brutto UoP (np. B2B bez urlopu i ZUS)
+DEFAULT_CONTRACT = {"b2b": 1.0}
+
+###########################################
+def _parse_factors(value: str, defaults: dict) -> dict:
+    # "eur=4.3,usd=4.0" ➜ {"eur": 4.3, "usd": 4.0} nałożone na wartości domyślne
+    factors = dict(defaults)
+    for item in (value or "").split(","):
+        if "=" in item:
+            key, number = item.split("=", 1)
+            factors[key.strip().lower()] = float(number)
+    return factors
+
+###########################################
+class SalaryConfig:
+    def __init__(self, rates: dict = None, units: dict = None, net_to_gross: dict = None, contract: dict = None):
+        self.rates = rates or _parse_factors(os.getenv("SALARY_RATES"), DEFAULT_RATES)
+        self.units = units or _parse_factors(os.getenv("SALARY_UNITS"), DEFAULT_UNITS)
+        self.net_to_gross = net_to_gross or _parse_factors(os.getenv("SALARY_NET_TO_GROSS"), DEFAULT_NET_TO_GROSS)
+        self.contract = contract or _parse_factors(os.getenv("SALARY_CONTRACT_FACTORS"), DEFAULT_CONTRACT)
+
+###########################################
+class SalaryFrame:
+    # Kolumny jako tablice NumPy; pola tekstowe zakodowane jako indeksy do słowników
+    NUMERIC = ("offer_id", "category_id", "experience_level_id", "company_id")
+    CODED = ("type", "currency", "unit")
+
+    def __init__(self, columns: dict, dictionaries: dict):
+        self.columns = columns
+        self.dictionaries = dictionaries
+    ####################################################
+    def __len__(self):
+        return len(self.columns["from_amount"])
+    ####################################################
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+    ####################################################
+    def decode(self, name: str, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(self.dictionaries[name], dtype=object)[codes]
+    ####################################################
+    @classmethod
+    def from_batch(cls, batch) -> "SalaryFrame":
+        # Wynagrodzenia z OfferBatch (sql_normalize) – bez zapisu do bazy
+        columns = batch.columns()
+        records = batch.records
+        offer_idx = _from_array(columns["salary_offer_idx"]).astype(np.int64)
+        published = _from_array(columns["published_ts"])
+        category = np.fromiter((record.category_id for record in records), dtype=np.int64, count=len(records))
+        frame_columns = {
+            "offer_id": offer_idx,
+            "category_id": category[offer_idx],
+            "experience_level_id": np.full(len(offer_idx), -1, dtype=np.int64),
+            "company_id": np.full(len(offer_idx), -1, dtype=np.int64),
+            "month": _month_from_timestamp(published[offer_idx]),
+            "gross": _from_array(columns["salary_gross"]),
+            "from_amount": _from_array(columns["salary_from"]),
+            "to_amount": _from_array(columns["salary_to"]),
+        }
+        dictionaries = {}
+        for name in cls.CODED:
+            codes, dictionary = _encode(np.asarray(columns[f"salary_{name}"], dtype=object))
+            frame_columns[name] = codes
+            dictionaries[name] = dictionary
+        return cls(frame_columns, dictionaries)
+
+###########################################
+def _from_array(values) -> np.ndarray:
+    # array.array ➜ NumPy bez kopiowania (typ z kodu tablicy)
+    dtype = np.dtype(values.typecode if values.typecode != "l" else f"i{values.itemsize}")
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype=dtype)
+###########################################
+def _encode(values: np.ndarray):
+    values = np.where(values == None, "", values).astype(str)  # noqa: E711 – porównanie elementowe
+    dictionary, codes = np.unique(values, return_inverse=True)
+    return codes.astype(np.int32), [str(value) for value in dictionary]
+###########################################
+def _month_from_timestamp(ts: np.ndarray) -> np.ndarray:
+    # RRRRMM jako liczba całkowita (NaN ➜ 0)
+    months = np.where(np.isnan(ts), 0, ts).astype("datetime64[s]").astype("datetime64[M]")
+    years = months.astype(int) // 12 + 1970
+    result = years * 100 + months.astype(int) % 12 + 1
+    return np.where(np.isnan(ts), 0, result).astype(np.int32)
+###########################################
+def _nullable_float(values) -> np.ndarray:
+    return np.array(values, dtype=np.float64)  # None ➜ nan
+###########################################
+def _nullable_int(values) -> np.ndarray:
+    # None ➜ -1 (liczby całkowite i tekst "202405" z strftime)
+    array = np.array([np.nan if value is None else value for value in values], dtype=np.float64) \
+        if None in values else np.array(values, dtype=np.float64)
+    return np.where(np.isnan(array), -1, array).astype(np.int64)
+
+###########################################
+def load_salary_frame(session: Session, chunk_size: int = LOAD_CHUNK, date_from=None, date_to=None) -> SalaryFrame:
+    query = select(
+        EmploymentType.offer_id, Offer.category_id, Offer.experience_level_id, Offer.company_id,
+        func.strftime("%Y%m", Offer.published_at),  # miesiąc liczony w SQLite, bez obiektów datetime
+        EmploymentType.gross, EmploymentType.from_amount, EmploymentType.to_amount,
+        EmploymentType.type, EmploymentType.currency, EmploymentType.unit,
+    ).join(Offer, EmploymentType.offer_id == Offer.id)
+    if date_from is not None:
+        query = query.where(Offer.published_at >= date_from)
+    if date_to is not None:
+        query = query.where(Offer.published_at < date_to)
+
+    result = session.execute(query)
+    chunks = []
+    while True:
+        batch = result.fetchmany(chunk_size)
+        if not batch:
+            break
+        (offer_id, category_id, level_id, company_id, published, gross,
+         from_amount, to_amount, types, currencies, units) = zip(*batch)
+        chunks.append({
+            "offer_id": np.array(offer_id, dtype=np.int64),
+            "category_id": _nullable_int(category_id),
+            "experience_level_id": _nullable_int(level_id),
+            "company_id": _nullable_int(company_id),
+            "month": _nullable_int(published),
+            "gross": _nullable_int(gross).astype(np.int8),
+            "from_amount": _nullable_float(from_amount),
+            "to_amount": _nullable_float(to_amount),
+            "type": np.array(types, dtype=object),
+            "currency": np.array(currencies, dtype=object),
+            "unit": np.array(units, dtype=object),
+        })
+        logging.debug(f"💰 Wczytano partię {len(batch)} wynagrodzeń")
+
+    if not chunks:
+        empty = {name: np.zeros(0, dtype=np.int64) for name in SalaryFrame.NUMERIC + ("month",)}
+        empty.update({"gross": np.zeros(0, dtype=np.int8), "from_amount": np.zeros(0), "to_amount": np.zeros(0)})
+        empty.update({name: np.zeros(0, dtype=np.int32) for name in SalaryFrame.CODED})
+        return SalaryFrame(empty, {name: [] for name in SalaryFrame.CODED})
+
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    dictionaries = {}
+    for name in SalaryFrame.CODED:
+        columns[name], dictionaries[name] = _encode(columns[name])
+    return SalaryFrame(columns, dictionaries)
+
+###########################################
+def _factor_table(dictionary: list, factors: dict, default: float) -> np.ndarray:
+    # współczynnik dla każdego kodu słownika (pętla po słowniku, nie po wierszach)
+    return np.array([factors.get(value.lower(), default) for value in dictionary], dtype=np.float64)
+###########################################
+def normalize_monthly_pln(frame: SalaryFrame, config: SalaryConfig = None) -> np.ndarray:
+    # Środek widełek jako miesięczne brutto w PLN; NaN, gdy nie da się przeliczyć
+    config = config or SalaryConfig()
+    rate = _factor_table(frame.dictionaries["currency"], config.rates, np.nan)[frame["currency"]]
+    unit = _factor_table(frame.dictionaries["unit"], config.units, np.nan)[frame["unit"]]
+    contract = _factor_table(frame.dictionaries["type"], config.contract, 1.0)[frame["type"]]
+    net_to_gross = _factor_table(frame.dictionaries["type"], config.net_to_gross, 1.0)[frame["type"]]
+    gross = np.where(frame["gross"] == 0, net_to_gross, 1.0)
+
+    low = frame["from_amount"]
+    high = frame["to_amount"]
+    midpoint = np.where(np.isnan(low), high, np.where(np.isnan(high), low, (low + high) / 2))
+    midpoint = np.where(midpoint > 0, midpoint, np.nan)
+    return midpoint * rate * unit * contract * gross
+
+###########################################
+def _group_codes(frame: SalaryFrame, by: tuple):
+    if not by:
+        return np.zeros(len(frame), dtype=np.int64), [()]
+    stacked = np.stack([frame[name].astype(np.int64) for name in by], axis=1)
+    keys, codes = np.unique(stacked, axis=0, return_inverse=True)
+    return codes.reshape(-1), [tuple(key) for key in keys]
+###########################################
+def _decode_key(frame: SalaryFrame, by: tuple, key: tuple) -> dict:
+    return {
+        name: frame.dictionaries[name][value] if name in frame.dictionaries else int(value)
+        for name, value in zip(by, key)
+    }
+###########################################
+def group_percentiles(frame: SalaryFrame, values: np.ndarray, by: tuple = (), q=(10, 25, 50, 75, 90), min_count: int = 1) -> list:
+    # Percentyle (interpolacja liniowa jak w np.percentile) dla każdej grupy naraz
+    codes, keys = _group_codes(frame, by)
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    if not len(values):
+        return []
+
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    counts = np.diff(np.r_[starts, len(sorted_values)])
+
+    result = {"count": counts, "mean": np.add.reduceat(sorted_values, starts) / counts}
+    for percentile in q:
+        position = starts + (counts - 1) * (percentile / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        result[f"p{percentile}"] = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * fraction
+
+    rows = []
+    for i in np.flatnonzero(counts >= min_count):
+        row = _decode_key(frame, by, keys[sorted_codes[starts[i]]])
+        row.update({name: float(column[i]) if name != "count" else int(column[i]) for name, column in result.items()})
+        rows.append(row)
+    return rows
+###########################################
+def group_histogram(frame: SalaryFrame, values: np.ndarray, by: tuple = (), bins=None):
+    # Zwraca (klucze grup, krawędzie przedziałów, macierz liczności [grupa x przedział])
+    codes, keys = _group_codes(frame, by)
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    if bins is None:
+        bins = np.arange(0, 60001, 2500, dtype=np.float64)
+    edges = np.asarray(bins, dtype=np.float64)
+    index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    counts = np.bincount(codes * (len(edges) - 1) + index, minlength=len(keys) * (len(edges) - 1))
+    return [_decode_key(frame, by, key) for key in keys], edges, counts.reshape(len(keys), len(edges) - 1)
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Percentyle wynagrodzeń (miesięczne brutto PLN)")
+    parser.add_argument("--db", default="sqlite:///data/sql/jobs.sqlite", help="URL bazy SQLite")
+    parser.add_argument("--by", nargs="*", default=["category_id", "experience_level_id"],
+                        help="wymiary: category_id, experience_level_id, company_id, month, type, currency, unit")
+    parser.add_argument("--min-count", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    engine = create_sqlite_engine(args.db)
+    with Session(bind=engine) as session:
+        frame = load_salary_frame(session)
+        names = {
+            "category_id": dict(session.execute(select(Category.id, Category.name)).all()),
+            "experience_level_id": dict(session.execute(select(ExperienceLevel.id, ExperienceLevel.name)).all()),
+        }
+    engine.dispose()
+
+    values = normalize_monthly_pln(frame)
+    logging.info(f"💰 Wynagrodzenia: {len(frame)} (przeliczone: {int((~np.isnan(values)).sum())})")
+    for row in group_percentiles(frame, values, tuple(args.by), min_count=args.min_count):
+        labels = [str(names.get(name, {}).get(row[name], row[name])) for name in args.by]
+        print(" | ".join(labels), f"n={row['count']}", *(f"{key}={row[key]:.0f}" for key in ("p10", "p25", "p50", "p75", "p90")))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
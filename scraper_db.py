@@ -1,21 +1,33 @@
-from sqlalchemy import create_engine, func
+from sqlalchemy import func
 from sqlalchemy.orm import sessionmaker
+from sql_engine import create_sqlite_engine
 from sql_models import Slug, Scraper, Skill, RequiredSkillAssociation, NiceToHaveSkillAssociation
+from sql_search import index_scraped_offer
+from sql_aggregates import add_skill_demand
 from datetime import datetime, timezone
+import metrics
+
+DB_SECONDS = metrics.histogram("scraper_db_seconds", "Operacje bazy scrapera (sesja, zapytania, commit)")
 
 class Database:
-    def __init__(self, db_url):
-        self.engine = create_engine(db_url)
+    def __init__(self, db_url, profile="scraper"):
+        self.engine = create_sqlite_engine(db_url, profile=profile)
         self.Session = sessionmaker(bind=self.engine)
 
     ##########################################
+    def close(self):
+        self.engine.dispose()
+
+    ##########################################
+    @DB_SECONDS.time(method="get_unscraped_slugs")
     def get_unscraped_slugs(self):
         session = self.Session()
         try:
-            scraped_ids = {row.offer_id for row in session.query(Scraper.offer_id).all()}
+            # anti-join zamiast listy wszystkich offer_id w klauzuli IN
             offers = (
                 session.query(Slug)
-                .filter(~Slug.offer_id.in_(scraped_ids))
+                .outerjoin(Scraper, Scraper.offer_id == Slug.offer_id)
+                .filter(Scraper.offer_id.is_(None))
                 .order_by(Slug.offer_id, Slug.slug)
                 .all()
             )
@@ -31,6 +43,7 @@ class Database:
             session.close()
 
     ##########################################
+    @DB_SECONDS.time(method="save_scraper_entry")
     def save_scraper_entry(self, offer_id, status, url, notes,
                            experience_description=None,
                            years_of_experience=None,
@@ -62,6 +75,9 @@ class Database:
                 company_size=company_size
             )
             session.add(scraper_entry)
+            if status == "ok":
+                # opis trafia do indeksu FTS w tej samej transakcji
+                index_scraped_offer(session, offer_id, notes, requirements)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -70,6 +86,7 @@ class Database:
             session.close()
 
     ##########################################
+    @DB_SECONDS.time(method="get_required_skills_for_offer")
     def get_required_skills_for_offer(self, offer_id):
         session = self.Session()
         try:
@@ -84,6 +101,7 @@ class Database:
             session.close()
 
     ##########################################
+    @DB_SECONDS.time(method="update_skill_level")
     def update_skill_level(self, offer_id, skill_id, level):
         session = self.Session()
         try:
@@ -93,6 +111,8 @@ class Database:
             else:
                 assoc = RequiredSkillAssociation(offer_id=offer_id, skill_id=skill_id, level=level)
                 session.add(assoc)
+                # nowe powiązanie – agregat zapotrzebowania w tej samej transakcji
+                add_skill_demand(session, offer_id, skill_id, required=True)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -101,6 +121,7 @@ class Database:
             session.close()
 
     ##########################################
+    @DB_SECONDS.time(method="add_or_update_nice_to_have_skill")
     def add_or_update_nice_to_have_skill(self, offer_id, skill_id, level=1):
         session = self.Session()
         try:
@@ -110,6 +131,7 @@ class Database:
             else:
                 assoc = NiceToHaveSkillAssociation(offer_id=offer_id, skill_id=skill_id, level=level)
                 session.add(assoc)
+                add_skill_demand(session, offer_id, skill_id, required=False)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -5,7 +5,67 @@ import time
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-
+import metrics
+
+# Selektory sekcji strony oferty (klasy MUI generowane przez justjoin.it –
+# zmieniają się przy przebudowie strony; poprawność pilnuje bench_pages.py check)
+SECTION_SELECTOR = 'div.MuiBox-root.css-16nvqld'
+SKILL_SELECTOR = 'div.css-qsaw8'
+SKILL_LEVELS_CLASS = 'css-1qii1b7'
+SKILL_LEVEL_ON_CLASS = 'css-j1kr6i'
+
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "Czas zapytań HTTP (API listy ofert, strony ofert)")
+HTTP_BYTES = metrics.counter("http_response_bytes", "Rozmiar odpowiedzi HTTP")
+PARSE_SECONDS = metrics.histogram("page_parse_seconds", "Parsowanie strony oferty (BeautifulSoup + selektory)")
+
+# Parsowanie bez pobierania – tekst HTML ➜ wynik (używane przez Pages i bench_pages.py)
+##################################################
+def select_css(text, css_selector):
+    soup = BeautifulSoup(text, 'html.parser')
+    for tag in soup(['style', 'script']):
+        tag.decompose()
+    return soup.select(css_selector)
+##################################################
+def _find_sections(sections):
+    tech_stack_div = None
+    job_description_div = None
+    for div in sections:
+        header = div.find("h3")
+        if header:
+            if "tech stack" in header.text.lower():
+                tech_stack_div = div
+            elif "description" in header.text.lower() or "job description" in header.text.lower():
+                job_description_div = div
+    return tech_stack_div, job_description_div
+##################################################
+def parse_page_notes(text, url=None):
+    tech_stack_div, job_description_div = _find_sections(select_css(text, SECTION_SELECTOR))
+    if not tech_stack_div and not job_description_div:
+        raise ValueError(f"Nie znaleziono wymaganych sekcji (tech stack / job description) na stronie {url}")
+    return f'<div class="offer">\n<div class="job_techstack">\n{tech_stack_div}\n</div>\n<div class="job_description">\n{job_description_div}\n</div>\n</div>'
+##################################################
+def parse_skill_levels(text, skill_names):
+    wanted = {s.lower() for s in skill_names}
+    skill_levels = {}
+    for section in select_css(text, SKILL_SELECTOR):
+        h4 = section.find('h4')
+        ul = section.find('ul', class_=SKILL_LEVELS_CLASS)
+        if not h4 or not ul:
+            continue
+
+        skill_name = h4.get_text(strip=True)
+        if skill_name.lower() in wanted:
+            level = sum(1 for li in ul.find_all('li') if SKILL_LEVEL_ON_CLASS in li.get('class', []))
+            skill_levels[skill_name] = level
+    return skill_levels
+##################################################
+def parse_description_text(text, url=None):
+    _, job_description_div = _find_sections(select_css(text, SECTION_SELECTOR))
+    if not job_description_div:
+        raise ValueError(f"Nie znaleziono wymaganych sekcji (job description) na stronie {url}")
+    return job_description_div.get_text(separator='\n', strip=True)
+
+##################################################
 class Pages:
     def __init__(self, proxy_manager):
         self.proxy_manager = proxy_manager
@@ -18,6 +78,7 @@ class Pages:
         reraise=True
     )
     def get_page(self, url):
+        start = time.perf_counter()
         try:
             proxy_url = self.proxy_manager.get_random_proxy()
 
@@ -30,6 +91,9 @@ class Pages:
                 }
                 response = requests.get(url, proxies=proxies, timeout=10)
                 logging.info(f"Pobieranie strony {url} przy użyciu proxy {proxy_url}")
+            HTTP_SECONDS.observe(time.perf_counter() - start, client="pages", status=response.status_code,
+                                 cached=getattr(response, "from_cache", False))
+            HTTP_BYTES.inc(len(response.content), client="pages")
 
             if response.status_code == 404:
                 raise ValueError("Not Found (404)")
@@ -40,18 +104,14 @@ class Pages:
             
             return response.text
         except Exception as e:
+            if isinstance(e, requests.exceptions.RequestException) and e.response is None:
+                HTTP_SECONDS.observe(time.perf_counter() - start, client="pages", status="error", cached=False)
             logging.error(f"Error fetching {url}: {e}")
             return None
     ##################################################
     def page_getfrom_css(self, text, css_selector):
         try:
-            soup = BeautifulSoup(text, 'html.parser')
-            for tag in soup(['style', 'script']):
-                tag.decompose()
-
-            css_content = soup.select(css_selector)
-
-            return css_content
+            return select_css(text, css_selector)
         except Exception as e:
             logging.error(f"Error parsing page: {e}")
             return None
@@ -61,26 +121,8 @@ class Pages:
             text = self.get_page(url)
             if text is None:
                 raise ValueError("Failed to fetch page content")
-            
-            sections = self.page_getfrom_css(text, 'div.MuiBox-root.css-16nvqld')
-            
-            tech_stack_div = None
-            job_description_div = None
-
-            for div in sections:
-                header = div.find("h3")
-                if header:
-                    if "tech stack" in header.text.lower():
-                        tech_stack_div = div
-                    elif "description" in header.text.lower() or "job description" in header.text.lower():
-                        job_description_div = div
-
-            if not tech_stack_div and not job_description_div:
-                raise ValueError(f"Nie znaleziono wymaganych sekcji (tech stack / job description) na stronie {url}")
-
-            notes = f'<div class="offer">\n<div class="job_techstack">\n{tech_stack_div}\n</div>\n<div class="job_description">\n{job_description_div}\n</div>\n</div>'
-
-            return notes
+            with PARSE_SECONDS.time(extractor="page_notes"):
+                return parse_page_notes(text, url)
         except Exception as e:
             logging.error(f"Error fetching {url}: {e}")
             return None
@@ -90,25 +132,8 @@ class Pages:
             text = self.get_page(url)
             if text is None:
                 raise ValueError("Failed to fetch page content")
-            
-            sections = self.page_getfrom_css(text, 'div.css-qsaw8')
-
-            skill_levels = {}
-
-            for section in sections:
-                h4 = section.find('h4')
-                ul = section.find('ul', class_='css-1qii1b7')
-
-                if not h4 or not ul:
-                    continue
-
-                skill_name = h4.get_text(strip=True).lower()
-                if skill_name in [s.lower() for s in skill_names]:
-                    lis = ul.find_all('li')
-                    level = sum(1 for li in lis if 'css-j1kr6i' in li.get('class', []))
-                    skill_levels[h4.get_text(strip=True)] = level
-
-            return skill_levels
+            with PARSE_SECONDS.time(extractor="skill_levels"):
+                return parse_skill_levels(text, skill_names)
         except Exception as e:
             logging.error(f"Error extracting skill levels from {url}: {e}")
             return {}
@@ -119,22 +144,8 @@ class Pages:
             text = self.get_page(url)
             if text is None:
                 raise ValueError("Failed to fetch page content")
-
-            sections = self.page_getfrom_css(text, 'div.MuiBox-root.css-16nvqld')
-            
-            job_description_div = None
-
-            for div in sections:
-                header = div.find("h3")
-                if header:
-                    if "description" in header.text.lower() or "job description" in header.text.lower():
-                        job_description_div = div
-
-            if not job_description_div:
-                raise ValueError(f"Nie znaleziono wymaganych sekcji (job description) na stronie {url}")
-
-            job_description = job_description_div.get_text(separator='\n', strip=True)
-            return job_description
+            with PARSE_SECONDS.time(extractor="description_text"):
+                return parse_description_text(text, url)
         except Exception as e:
             logging.error(f"Error extracting job description from {url}: {e}")
-            return None
\ No newline at end of file
+            return None
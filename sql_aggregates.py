@@ -0,0 +1,257 @@
+import logging
+import math
+from collections import Counter
+from sqlalchemy import func, select, delete, insert, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from sql_import_offers import ImportSink
+from sql_models import (
+    Offer, Skill, Company, ExperienceLevel, EmploymentType,
+    SkillDemandDaily, SalaryHistogram, CompanyOfferStats,
+    RequiredSkillAssociation, NiceToHaveSkillAssociation
+)
+
+# Tabele zagregowane dla raportów: dzienne zapotrzebowanie na umiejętności,
+# histogram wynagrodzeń (kategoria / doświadczenie / typ umowy / waluta / jednostka)
+# i liczba ofert na firmę. AggregateSink aktualizuje je przyrostowo w tej samej
+# transakcji SQLite co importowane oferty; rebuild_aggregates liczy je od zera.
+
+# Przedziały logarytmiczne co 2% – percentyle z histogramu z dokładnością ~1%
+# niezależnie od jednostki (godzina / dzień / miesiąc) i waluty
+SALARY_BUCKET_RATIO = 1.02
+_LOG_RATIO = math.log(SALARY_BUCKET_RATIO)
+
+###########################################
+def salary_value(from_amount, to_amount):
+    # środek widełek; przy jednej granicy – ta granica
+    values = [value for value in (from_amount, to_amount) if value]
+    if not values:
+        return None
+    value = sum(values) / len(values)
+    return value if value > 0 else None
+###########################################
+def salary_bucket(value: float) -> int:
+    return math.floor(math.log(value) / _LOG_RATIO)
+###########################################
+def bucket_value(bucket: int) -> float:
+    # środek geometryczny przedziału
+    return SALARY_BUCKET_RATIO ** (bucket + 0.5)
+###########################################
+def _salary_key(category_id, experience_level_id, type, currency, unit):
+    # NULL w kluczu głównym nie łączy się w ON CONFLICT – zamieniamy na ""
+    return category_id, experience_level_id, type or "", currency or "", unit or ""
+###########################################
+def _ids_by_name(session: Session, model, names) -> dict:
+    names = list(names)
+    ids = {}
+    for i in range(0, len(names), 500):
+        for row in session.execute(select(model.name, model.id).where(model.name.in_(names[i:i + 500]))):
+            ids[row.name] = row.id
+    return ids
+
+###########################################
+class AggregateSink(ImportSink):
+    def __init__(self):
+        self.reset()
+    ####################################################
+    def reset(self):
+        self.skills = Counter()       # (dzień, nazwa, wymagana) ➜ liczba ofert
+        self.salaries = Counter()     # (kategoria, doświadczenie, typ, waluta, jednostka, przedział) ➜ liczba
+        self.companies = {}           # nazwa ➜ [liczba, pierwsza publikacja, ostatnia publikacja]
+    ####################################################
+    def add(self, record, offer_id: int):
+        day = record.published_at.date()
+        for skill in set(record.required_skills):
+            self.skills[(day, skill, True)] += 1
+        for skill in set(record.nice_skills):
+            self.skills[(day, skill, False)] += 1
+
+        for salary in record.salaries:
+            value = salary_value(salary.from_amount, salary.to_amount)
+            if value is not None:
+                key = (record.category_id, record.experience_level, salary.type, salary.currency, salary.unit)
+                self.salaries[(key, salary_bucket(value))] += 1
+
+        stats = self.companies.get(record.company_name)
+        if stats is None:
+            self.companies[record.company_name] = [1, record.published_at, record.published_at]
+        else:
+            stats[0] += 1
+            stats[1] = min(stats[1], record.published_at)
+            stats[2] = max(stats[2], record.published_at)
+    ####################################################
+    def flush(self, session: Session):
+        if self.skills:
+            skill_ids = _ids_by_name(session, Skill, {name for _, name, _ in self.skills})
+            rows = {}
+            for (day, name, required), count in self.skills.items():
+                row = rows.setdefault((day, skill_ids[name]), {"day": day, "skill_id": skill_ids[name], "required_count": 0, "nice_count": 0})
+                row["required_count" if required else "nice_count"] += count
+            stmt = sqlite_insert(SkillDemandDaily)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["day", "skill_id"],
+                set_={
+                    "required_count": SkillDemandDaily.required_count + stmt.excluded.required_count,
+                    "nice_count": SkillDemandDaily.nice_count + stmt.excluded.nice_count,
+                },
+            ), list(rows.values()))
+
+        if self.salaries:
+            level_ids = _ids_by_name(session, ExperienceLevel, {key[1] for key, _ in self.salaries})
+            rows = []
+            for (key, bucket), count in self.salaries.items():
+                category_id, level, type, currency, unit = _salary_key(key[0], level_ids[key[1]], *key[2:])
+                rows.append({
+                    "category_id": category_id, "experience_level_id": level, "type": type,
+                    "currency": currency, "unit": unit, "bucket": bucket, "offers_count": count,
+                })
+            stmt = sqlite_insert(SalaryHistogram)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["category_id", "experience_level_id", "type", "currency", "unit", "bucket"],
+                set_={"offers_count": SalaryHistogram.offers_count + stmt.excluded.offers_count},
+            ), rows)
+
+        if self.companies:
+            company_ids = _ids_by_name(session, Company, self.companies)
+            rows = [
+                {"company_id": company_ids[name], "offers_count": count, "first_published_at": first, "last_published_at": last}
+                for name, (count, first, last) in self.companies.items()
+            ]
+            stmt = sqlite_insert(CompanyOfferStats)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["company_id"],
+                set_={
+                    "offers_count": CompanyOfferStats.offers_count + stmt.excluded.offers_count,
+                    "first_published_at": func.min(CompanyOfferStats.first_published_at, stmt.excluded.first_published_at),
+                    "last_published_at": func.max(CompanyOfferStats.last_published_at, stmt.excluded.last_published_at),
+                },
+            ), rows)
+        self.reset()
+    ####################################################
+    def commit(self):
+        self.reset()
+    ####################################################
+    def rollback(self):
+        self.reset()
+
+###########################################
+def add_skill_demand(session: Session, offer_id: int, skill_id: int, required: bool):
+    # Nowe powiązanie oferty ze skillem poza importem (scraper) – w tej samej transakcji
+    published_at = session.scalar(select(Offer.published_at).where(Offer.id == offer_id))
+    if published_at is None:
+        return
+    stmt = sqlite_insert(SkillDemandDaily).values(
+        day=published_at.date(), skill_id=skill_id,
+        required_count=1 if required else 0, nice_count=0 if required else 1,
+    )
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["day", "skill_id"],
+        set_={
+            "required_count": SkillDemandDaily.required_count + stmt.excluded.required_count,
+            "nice_count": SkillDemandDaily.nice_count + stmt.excluded.nice_count,
+        },
+    ))
+###########################################
+def rebuild_skill_demand(session: Session):
+    session.execute(delete(SkillDemandDaily))
+    session.execute(text("""
+        INSERT INTO agg_skill_demand_daily (day, skill_id, required_count, nice_count)
+        SELECT day, skill_id, sum(required), sum(nice) FROM (
+            SELECT date(o.published_at) AS day, r.skill_id, 1 AS required, 0 AS nice
+            FROM required_skill_association r JOIN offers o ON o.id = r.offer_id
+            UNION ALL
+            SELECT date(o.published_at), n.skill_id, 0, 1
+            FROM nice_to_have_skill_association n JOIN offers o ON o.id = n.offer_id
+        ) GROUP BY day, skill_id
+    """))
+###########################################
+def skill_demand_in_sync(session: Session) -> bool:
+    # Sumy w agregacie = liczba powiązań istniejących ofert ze skillami (jak w rebuild_skill_demand)
+    required, nice = session.execute(
+        select(func.coalesce(func.sum(SkillDemandDaily.required_count), 0),
+               func.coalesce(func.sum(SkillDemandDaily.nice_count), 0))
+    ).one()
+    linked = [
+        session.scalar(select(func.count()).select_from(model).join(Offer, Offer.id == model.offer_id))
+        for model in (RequiredSkillAssociation, NiceToHaveSkillAssociation)
+    ]
+    return [required, nice] == linked
+###########################################
+def rebuild_aggregates(session: Session):
+    # Przeliczenie od zera (pierwsze uruchomienie, po przebudowie bazy)
+    for model in (SalaryHistogram, CompanyOfferStats):
+        session.execute(delete(model))
+
+    rebuild_skill_demand(session)
+    session.execute(text("""
+        INSERT INTO agg_company_offers (company_id, offers_count, first_published_at, last_published_at)
+        SELECT company_id, count(*), min(published_at), max(published_at) FROM offers GROUP BY company_id
+    """))
+
+    # Histogram liczony w Pythonie – ta sama funkcja przedziałów co w imporcie
+    histogram = Counter()
+    result = session.execute(
+        select(
+            Offer.category_id, Offer.experience_level_id, EmploymentType.type, EmploymentType.currency,
+            EmploymentType.unit, EmploymentType.from_amount, EmploymentType.to_amount,
+        ).join(Offer, EmploymentType.offer_id == Offer.id)
+    )
+    while True:
+        batch = result.fetchmany(10000)
+        if not batch:
+            break
+        for category_id, level_id, type, currency, unit, from_amount, to_amount in batch:
+            value = salary_value(from_amount, to_amount)
+            if value is not None:
+                histogram[(_salary_key(category_id, level_id, type, currency, unit), salary_bucket(value))] += 1
+    if histogram:
+        session.execute(insert(SalaryHistogram), [
+            {
+                "category_id": key[0], "experience_level_id": key[1], "type": key[2],
+                "currency": key[3], "unit": key[4], "bucket": bucket, "offers_count": count,
+            }
+            for (key, bucket), count in histogram.items()
+        ])
+    session.commit()
+    logging.info(f"📊 Przeliczono tabele zagregowane ({len(histogram)} przedziałów wynagrodzeń)")
+###########################################
+def ensure_aggregates(session: Session):
+    # Baza sprzed wprowadzenia agregatów – jednorazowe wypełnienie
+    if session.execute(select(CompanyOfferStats.company_id).limit(1)).first() is None \
+            and session.execute(select(Offer.id).limit(1)).first() is not None:
+        rebuild_aggregates(session)
+        return
+    # skille dopisane poza importem przed aktualizacją agregatu w scraper_db
+    if not skill_demand_in_sync(session):
+        rebuild_skill_demand(session)
+        session.commit()
+        logging.info("📊 Przeliczono zapotrzebowanie na skille (agregat niezgodny z powiązaniami)")
+###########################################
+def salary_percentiles(session: Session, currency: str = "pln", unit: str = "month", type: str = None,
+                       category_id: int = None, experience_level_id: int = None, percentiles=(25, 50, 75)) -> dict:
+    # Percentyle środka widełek odczytane z histogramu (bez przeglądania ofert)
+    query = select(SalaryHistogram.bucket, func.sum(SalaryHistogram.offers_count)).where(
+        SalaryHistogram.currency == currency, SalaryHistogram.unit == unit
+    )
+    if type is not None:
+        query = query.where(SalaryHistogram.type == type)
+    if category_id is not None:
+        query = query.where(SalaryHistogram.category_id == category_id)
+    if experience_level_id is not None:
+        query = query.where(SalaryHistogram.experience_level_id == experience_level_id)
+    buckets = session.execute(query.group_by(SalaryHistogram.bucket).order_by(SalaryHistogram.bucket)).all()
+
+    total = sum(count for _, count in buckets)
+    result = {}
+    if not total:
+        return result
+    for percentile in percentiles:
+        threshold = total * percentile / 100
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= threshold:
+                result[percentile] = round(bucket_value(bucket), 2)
+                break
+    return result
@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Dead-letter dla linii, których nie udało się zaimportować. Każdy wpis to
+# jedna linia JSON: klasa i treść błędu, plik źródłowy, numer linii oraz
+# oryginalna linia ("raw"), dzięki czemu można ją później ponownie zaimportować.
+DEAD_LETTER_PATH = os.getenv("SQL_DEAD_LETTER_PATH", "offers_failed.jsonl")
+DEAD_LETTER_BUFFER = 1024 * 1024
+
+###########################################
+class DeadLetterWriter:
+    # Jeden buforowany uchwyt na cały przebieg importu; plik powstaje dopiero
+    # przy pierwszym błędzie
+    def __init__(self, path=DEAD_LETTER_PATH, buffer_size: int = DEAD_LETTER_BUFFER):
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.stages = {}
+        self._file = None
+    ####################################################
+    def write(self, raw, error, source_file: str = None, line_number: int = None, stage: str = "import"):
+        # stage: "parse" – błąd JSON / formatu, "import" – błąd zapisu do bazy
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8", errors="replace")
+        entry = {
+            "error_class": type(error).__name__,
+            "error": str(error),
+            "source_file": source_file,
+            "line_number": line_number,
+            "stage": stage,
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+            "raw": raw.rstrip("\n"),
+        }
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8", buffering=self.buffer_size)
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.count += 1
+        self.stages[stage] = self.stages.get(stage, 0) + 1
+    ####################################################
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+    ####################################################
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logging.info(f"📮 Zapisano {self.count} błędnych linii do {self.path}")
+    ####################################################
+    def __enter__(self):
+        return self
+    ####################################################
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+###########################################
+def read_dead_letters(path):
+    # Starsze pliki offers_failed.jsonl zawierają same surowe linie bez opisu błędu
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = None
+            if isinstance(entry, dict) and "raw" in entry and "error_class" in entry:
+                yield entry
+            else:
+                yield {"error_class": None, "error": None, "source_file": None, "line_number": None, "stage": None, "raw": line}
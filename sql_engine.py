@@ -0,0 +1,122 @@
+import logging
+import time
+from pathlib import Path
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+import metrics
+
+# Profile PRAGM dla SQLite zależnie od rodzaju zadania.
+# cache_size < 0 oznacza rozmiar w KiB (np. -262144 = 256 MiB).
+PROFILES = {
+    "default": {},
+    "import": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -262144,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "scraper": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Tylko dla nowo tworzonej bazy (pełna przebudowa) – awaria oznacza po prostu
+    # ponowne uruchomienie przebudowy, więc można zrezygnować z fsync i dziennika
+    # na dysku. Dziennik w pamięci zostaje: bez niego ROLLBACK / ROLLBACK TO
+    # SAVEPOINT nic nie cofa i błędna oferta zostawiłaby osierocone wiersze.
+    "rebuild": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -524288,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "locking_mode": "EXCLUSIVE",
+    },
+}
+
+ORM_FLUSH_SECONDS = metrics.histogram("orm_flush_seconds", "Czas flush sesji SQLAlchemy (także autoflush przed zapytaniem)")
+ORM_COMMIT_SECONDS = metrics.histogram("orm_commit_seconds", "Czas commit sesji SQLAlchemy (z końcowym flush)")
+
+# Pomiar dla wszystkich sesji (import, scraper_db) – początek zapisany w session.info
+###########################################
+@event.listens_for(Session, "before_flush")
+def _flush_started(session, flush_context, instances):
+    session.info["_flush_started"] = time.perf_counter()
+###########################################
+@event.listens_for(Session, "after_flush_postexec")
+def _flush_finished(session, flush_context):
+    start = session.info.pop("_flush_started", None)
+    if start is not None:
+        ORM_FLUSH_SECONDS.observe(time.perf_counter() - start)
+###########################################
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["_commit_started"] = time.perf_counter()
+###########################################
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    start = session.info.pop("_commit_started", None)
+    if start is not None:
+        ORM_COMMIT_SECONDS.observe(time.perf_counter() - start)
+
+###########################################
+def sqlite_path(db_url: str):
+    database = make_url(db_url).database
+    if not database or database == ":memory:":
+        return None
+    return Path(database)
+###########################################
+def create_sqlite_engine(db_url: str, profile: str = "default", **kwargs):
+    if profile not in PROFILES:
+        raise ValueError(f"Nieznany profil SQLite: {profile}")
+
+    if profile == "rebuild":
+        path = sqlite_path(db_url)
+        if path is not None and path.exists() and path.stat().st_size > 0:
+            raise ValueError(f"Profil 'rebuild' wymaga nowej, pustej bazy – plik {path} już istnieje")
+
+    engine = create_engine(db_url, **kwargs)
+    pragmas = PROFILES[profile]
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        # pysqlite sam otwiera transakcje tylko przed DML, przez co SAVEPOINT
+        # na początku transakcji zatwierdzałby się przy RELEASE – transakcje
+        # rozpoczynamy jawnie w zdarzeniu "begin"
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    logging.info(f"🗄 Silnik SQLite: {db_url} (profil: {profile})")
+    return engine
+###########################################
+def finish_sqlite(engine, analyze: bool = False):
+    # Koniec zadania: statystyki dla planera i przeniesienie WAL do pliku bazy,
+    # tak aby wysyłany na S3 plik .sqlite był kompletny.
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE" if analyze else "PRAGMA optimize")
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+            if str(journal_mode).lower() == "wal":
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            cursor.close()
+        finally:
+            raw.close()
+    except Exception as e:
+        logging.warning(f"Nie udało się zoptymalizować bazy SQLite: {e}")
+    finally:
+        engine.dispose()
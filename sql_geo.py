@@ -0,0 +1,159 @@
+import argparse
+import logging
+import math
+import sys
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from sql_engine import create_sqlite_engine
+
+# Indeks przestrzenny lokalizacji (SQLite R*Tree). Wpis dla każdej lokalizacji
+# ze współrzędnymi utrzymują triggery na tabeli locations – działa dla importu,
+# scalania shardów w sql_rebuild i ręcznych zmian. Zapytania o promień:
+# prostokąt z R*Tree, potem dokładna odległość (haversine) dla kandydatów.
+GEO_TABLE = "locations_rtree"
+EARTH_RADIUS_KM = 6371.0088
+
+GEO_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {GEO_TABLE} USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    f"""CREATE TRIGGER IF NOT EXISTS {GEO_TABLE}_insert AFTER INSERT ON locations
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO {GEO_TABLE} VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {GEO_TABLE}_update AFTER UPDATE OF latitude, longitude ON locations
+        BEGIN
+            DELETE FROM {GEO_TABLE} WHERE id = OLD.id;
+            INSERT INTO {GEO_TABLE}
+            SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {GEO_TABLE}_delete AFTER DELETE ON locations
+        BEGIN
+            DELETE FROM {GEO_TABLE} WHERE id = OLD.id;
+        END""",
+]
+
+###########################################
+def haversine_km(lat1, lon1, lat2, lon2):
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+###########################################
+def bounding_box(latitude: float, longitude: float, radius_km: float):
+    # (min_lat, max_lat, min_lon, max_lon) obejmujący okrąg o danym promieniu
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if max_lat >= 90 or min_lat <= -90:
+        # okrąg obejmuje biegun – cały zakres długości
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude)))))
+    return min_lat, max_lat, longitude - delta_lon, longitude + delta_lon
+###########################################
+def _register_functions(session: Session):
+    session.connection().connection.driver_connection.create_function("haversine_km", 4, haversine_km, deterministic=True)
+
+###########################################
+def create_geo_index(engine):
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (GEO_TABLE,)
+        ).first()
+        for statement in GEO_SCHEMA:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            # istniejąca baza – jednorazowe wypełnienie, dalej pilnują tego triggery
+            added = conn.exec_driver_sql(f"""
+                INSERT INTO {GEO_TABLE}
+                SELECT id, latitude, latitude, longitude, longitude FROM locations
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """).rowcount
+            logging.info(f"🗺 Utworzono indeks przestrzenny lokalizacji ({added} wpisów)")
+###########################################
+def city_center(session: Session, city: str):
+    # Średnie współrzędne lokalizacji z danego miasta (np. "Kraków") albo None
+    row = session.execute(text(
+        "SELECT avg(latitude), avg(longitude) FROM locations WHERE city = :city AND latitude IS NOT NULL"
+    ), {"city": city}).first()
+    return None if row is None or row[0] is None else (row[0], row[1])
+###########################################
+def locations_within_radius(session: Session, latitude: float, longitude: float, radius_km: float) -> list:
+    # [(location_id, odległość_km)] posortowane od najbliższej
+    _register_functions(session)
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    return session.execute(text(f"""
+        SELECT id, distance FROM (
+            SELECT l.id, haversine_km(:lat, :lon, l.latitude, l.longitude) AS distance
+            FROM {GEO_TABLE} r JOIN locations l ON l.id = r.id
+            WHERE r.max_lat >= :min_lat AND r.min_lat <= :max_lat
+              AND r.max_lon >= :min_lon AND r.min_lon <= :max_lon
+        ) WHERE distance <= :radius ORDER BY distance
+    """), {
+        "lat": latitude, "lon": longitude, "radius": radius_km,
+        "min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon,
+    }).all()
+###########################################
+def offers_within_radius(session: Session, latitude: float, longitude: float, radius_km: float,
+                         date_from=None, date_to=None, limit: int = None) -> list:
+    # [(offer_id, odległość_km)] – dla ofert z kilkoma lokalizacjami liczy się najbliższa
+    _register_functions(session)
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    conditions = ""
+    if date_from is not None:
+        conditions += " AND o.published_at >= :date_from"
+    if date_to is not None:
+        conditions += " AND o.published_at < :date_to"
+    query = f"""
+        WITH nearby AS (
+            SELECT id, distance FROM (
+                SELECT l.id, haversine_km(:lat, :lon, l.latitude, l.longitude) AS distance
+                FROM {GEO_TABLE} r JOIN locations l ON l.id = r.id
+                WHERE r.max_lat >= :min_lat AND r.min_lat <= :max_lat
+                  AND r.max_lon >= :min_lon AND r.min_lon <= :max_lon
+            ) WHERE distance <= :radius
+        )
+        SELECT a.offer_id, min(n.distance) AS distance
+        FROM nearby n
+        JOIN offer_location_association a ON a.location_id = n.id
+        JOIN offers o ON o.id = a.offer_id
+        WHERE 1 = 1{conditions}
+        GROUP BY a.offer_id ORDER BY distance, a.offer_id
+    """
+    if limit is not None:
+        query += " LIMIT :limit"
+    params = {
+        "lat": latitude, "lon": longitude, "radius": radius_km,
+        "min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon,
+        "date_from": date_from, "date_to": date_to, "limit": limit,
+    }
+    return session.execute(text(query), params).all()
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Oferty w promieniu od punktu lub miasta")
+    parser.add_argument("--db", default="sqlite:///data/sql/jobs.sqlite", help="URL bazy SQLite")
+    parser.add_argument("--city", help="środek okręgu – miasto z tabeli locations")
+    parser.add_argument("--lat", type=float)
+    parser.add_argument("--lon", type=float)
+    parser.add_argument("--radius", type=float, default=30.0, help="promień w km")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    engine = create_sqlite_engine(args.db)
+    create_geo_index(engine)
+    with Session(bind=engine) as session:
+        center = city_center(session, args.city) if args.city else (args.lat, args.lon)
+        if center is None or None in center:
+            parser.error("podaj --city (obecne w bazie) albo --lat i --lon")
+        start = time.perf_counter()
+        offers = offers_within_radius(session, center[0], center[1], args.radius)
+        elapsed = (time.perf_counter() - start) * 1000
+    engine.dispose()
+    logging.info(f"📍 {len(offers)} ofert w promieniu {args.radius} km od {center[0]:.4f}, {center[1]:.4f} ({elapsed:.1f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,9 @@
 import json
 import logging
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Union, TextIO
+from typing import Union, TextIO, Iterable
 from sqlalchemy.orm import Session
 
 from sql_models import (
@@ -11,18 +12,21 @@ from sql_models import (
     Slug, EmploymentType, RequiredSkillAssociation, NiceToHaveSkillAssociation,
     LanguageAssociation, OfferLocationAssociation, ImportedFile
 )
+from sql_normalize import (
+    NormalizedOffer, detect_version, normalize_offer,
+    normalize_v1, normalize_v2, normalize_v3
+)
+from sql_dead_letter import DeadLetterWriter, read_dead_letters
+from log_manager import SAMPLED
+import metrics
 
-# logging.basicConfig(level=logging.INFO)
+JSON_DECODE_SECONDS = metrics.histogram("json_decode_seconds", "Czas json.loads pojedynczej oferty / odpowiedzi")
+NORMALIZE_SECONDS = metrics.histogram("import_normalize_seconds", "Rozpoznanie wersji i normalizacja oferty")
+DEDUP_SECONDS = metrics.histogram("dedup_seconds", "Sprawdzenie, czy oferta już istnieje")
+SAVE_OFFER_SECONDS = metrics.histogram("import_save_offer_seconds", "Zapis oferty w SAVEPOINT (z wyszukaniem duplikatu i flush)")
+IMPORT_LINES = metrics.counter("import_lines", "Linie importu wg wyniku")
 
-###########################################
-def detect_version(data: dict) -> str:
-    if "guid" in data and "slug" in data and "publishedAt" in data:
-        return "v1"
-    elif "guid" not in data and "slug" in data and "publishedAt" in data:
-        return "v2"
-    elif "id" in data and "published_at" in data:
-        return "v3"
-    return "unknown"
+# logging.basicConfig(level=logging.INFO)
 
 ###########################################
 def get_or_create(session, model, defaults=None, **kwargs):
@@ -46,31 +50,31 @@ def get_or_create_id(session, model, id, **kwargs):
     session.flush()
     return instance
 ###########################################
-def import_offer_v1(data: dict, session: Session, line_number: int):
-    # od 2025-03-21
-    published_at = (
-        datetime.fromisoformat(data["publishedAt"].replace("Z", "+00:00"))
-        if data.get("publishedAt") else None
-    )
-
-    if session.query(Offer).filter_by(original_id=data["guid"], published_at=published_at).first():
-        logging.info(f"[{line_number}] Pomijam istniejącą ofertę: {data['guid']} ({published_at})")
-        return True, 1 #ilosc duplikatów
-
-    # category = get_or_create(session, Category, id=data["categoryId"], name=f"Kategoria {data['categoryId']}")
-    category = get_or_create_id(session, Category, id=data["categoryId"])
-    experience = get_or_create(session, ExperienceLevel, name=data["experienceLevel"])
-    workplace = get_or_create(session, WorkplaceType, name=data["workplaceType"])
-    working_time = get_or_create(session, WorkingTime, name=data["workingTime"])
-    company = get_or_create(session, Company, name=data["companyName"], defaults={"logo_url": data.get("companyLogoThumbUrl")})
+def save_offer(record: NormalizedOffer, session: Session, line_number: int):
+    # Zwraca id nowej oferty albo None, gdy oferta już istnieje
+    start = time.perf_counter()
+    existing = session.query(Offer).filter_by(original_id=record.original_id, published_at=record.published_at).first()
+    DEDUP_SECONDS.observe(time.perf_counter() - start, stage="import")
+    if existing:
+        logging.info(f"[{line_number}] Pomijam istniejącą ofertę: {record.original_id} ({record.published_at})", extra=SAMPLED)
+        return None
+
+    if record.category_name is None:
+        category = get_or_create_id(session, Category, id=record.category_id)
+    else:
+        category = get_or_create(session, Category, id=record.category_id, name=record.category_name)
+    experience = get_or_create(session, ExperienceLevel, name=record.experience_level)
+    workplace = get_or_create(session, WorkplaceType, name=record.workplace_type)
+    working_time = get_or_create(session, WorkingTime, name=record.working_time)
+    company = get_or_create(session, Company, name=record.company_name, defaults={"logo_url": record.company_logo_url})
     offerent = get_or_create(session, Offerent, name="JustJoinIt", defaults={"url": "https://justjoin.it/"})
 
     offer = Offer(
-        original_id=data["guid"],
-        title=data["title"],
-        remote_interview=data.get("remoteInterview"),
-        published_at=datetime.fromisoformat(data["publishedAt"].replace("Z", "+00:00")) if data.get("publishedAt") else None,
-        open_to_hire_ukrainians=data.get("openToHireUkrainians"),
+        original_id=record.original_id,
+        title=record.title,
+        remote_interview=record.remote_interview,
+        published_at=record.published_at,
+        open_to_hire_ukrainians=record.open_to_hire_ukrainians,
         category_id=category.id,
         experience_level_id=experience.id,
         workplace_type_id=workplace.id,
@@ -81,349 +85,279 @@ def import_offer_v1(data: dict, session: Session, line_number: int):
     session.add(offer)
     session.flush()
 
-    multilocations = data.get("multilocation")
-    locations = []
-
-    if multilocations:
-        for i, loc in enumerate(multilocations):
-            session.add(Slug(offer_id=offer.id, slug=loc["slug"]))
-            location = get_or_create(
-                session, Location,
-                company_id=company.id,
-                city=loc["city"], street=loc["street"],
-                latitude=loc["latitude"], longitude=loc["longitude"],
-                is_main=(i == 0)
-            )
-            locations.append(location)
-    else:
-        slug_value = data.get("slug")
-        if isinstance(slug_value, str):
-            session.add(Slug(offer_id=offer.id, slug=slug_value))
+    for slug in record.slugs:
+        session.add(Slug(offer_id=offer.id, slug=slug))
 
+    seen_locations = set()
+    for loc in record.locations:
         location = get_or_create(
             session, Location,
             company_id=company.id,
-            city=data["city"], street=data["street"],
-            latitude=data["latitude"], longitude=data["longitude"],
-            is_main=True
+            city=loc.city, street=loc.street,
+            latitude=loc.latitude, longitude=loc.longitude,
+            is_main=loc.is_main
         )
-        locations = [location]
-
-    seen_locations = set()
-    for loc in locations:
-        key = (offer.id, loc.id)
-        if key not in seen_locations:
-            session.add(OfferLocationAssociation(offer_id=offer.id, location_id=loc.id))
-            seen_locations.add(key)
+        if location.id not in seen_locations:
+            session.add(OfferLocationAssociation(offer_id=offer.id, location_id=location.id))
+            seen_locations.add(location.id)
 
-    for skill in data.get("requiredSkills", []):
+    for skill in record.required_skills:
         s = get_or_create(session, Skill, name=skill)
         session.add(RequiredSkillAssociation(offer_id=offer.id, skill_id=s.id,level=0))
 
-    nice_skills = data.get("niceToHaveSkills") or []
-    for skill in nice_skills:
+    for skill in record.nice_skills:
         s = get_or_create(session, Skill, name=skill)
         session.add(NiceToHaveSkillAssociation(offer_id=offer.id, skill_id=s.id))
 
-    for lang in data.get("languages", []):
-        l = get_or_create(session, Language, code=lang["code"], defaults={"level": lang["level"]})
+    for code, level in record.languages:
+        l = get_or_create(session, Language, code=code, defaults={"level": level})
         session.add(LanguageAssociation(offer_id=offer.id, language_id=l.id))
 
-    for et in data.get("employmentTypes", []):
-        session.add(EmploymentType(
-            offer_id=offer.id,
-            type=et["type"],
-            currency=et["currency"],
-            unit=et["unit"],
-            gross=et["gross"],
-            from_amount=et["from"], to_amount=et["to"],
-            from_pln=et.get("fromPln"), to_pln=et.get("toPln"),
-            from_usd=et.get("fromUsd"), to_usd=et.get("toUsd"),
-            from_eur=et.get("fromEur"), to_eur=et.get("toEur"),
-            from_gbp=et.get("fromGbp"), to_gbp=et.get("toGbp"),
-            from_chf=et.get("fromChf"), to_chf=et.get("toChf")
-        ))
-
-    logging.info(f"[{line_number}] ✅ Dodano ofertę (v1): {data['guid']} - {data['title']}")
-    return True, 0 #ilosc duplikatów
+    for salary in record.salaries:
+        session.add(EmploymentType(offer_id=offer.id, **salary.as_dict()))
 
+    logging.info(f"[{line_number}] ✅ Dodano ofertę ({record.version}): {record.original_id} - {record.title}", extra=SAMPLED)
+    return offer.id
+###########################################
+def import_offer(record: NormalizedOffer, session: Session, line_number: int):
+    offer_id = save_offer(record, session, line_number)
+    return True, 1 if offer_id is None else 0 #ilosc duplikatów
+###########################################
+def import_offer_v1(data: dict, session: Session, line_number: int):
+    return import_offer(normalize_v1(data), session, line_number)
 ###########################################
 def import_offer_v2(data: dict, session: Session, line_number: int):
-    # od 2023-01-01
-    # do 2025-03-21
-    published_at = (
-        datetime.fromisoformat(data["publishedAt"].replace("Z", "+00:00"))
-        if data.get("publishedAt") else None
-    )
-
-    if session.query(Offer).filter_by(original_id=data["slug"], published_at=published_at).first():
-        logging.info(f"[{line_number}] Pomijam istniejącą ofertę: {data['slug']} ({published_at})")
-        return True, 1 #ilosc duplikatów
-
-    category = get_or_create(session, Category, id=data["categoryId"], name=f"Kategoria {data['categoryId']}")
-    experience = get_or_create(session, ExperienceLevel, name=data["experienceLevel"])
-    workplace = get_or_create(session, WorkplaceType, name=data["workplaceType"])
-    working_time = get_or_create(session, WorkingTime, name=data["workingTime"])
-    company = get_or_create(session, Company, name=data["companyName"], defaults={"logo_url": data.get("companyLogoThumbUrl")})
-    offerent = get_or_create(session, Offerent, name="JustJoinIt", defaults={"url": "https://justjoin.it/"})
-
-    offer = Offer(
-        original_id=data["slug"],
-        title=data["title"],
-        remote_interview=data.get("remoteInterview"),
-        published_at=datetime.fromisoformat(data["publishedAt"].replace("Z", "+00:00")) if data.get("publishedAt") else None,
-        open_to_hire_ukrainians=data.get("openToHireUkrainians"),
-        category_id=category.id,
-        experience_level_id=experience.id,
-        workplace_type_id=workplace.id,
-        working_time_id=working_time.id,
-        company_id=company.id,
-        offerent_id=offerent.id
-    )
-    session.add(offer)
-    session.flush()
-
-    multilocations = data.get("multilocation")
-    locations = []
-
-    if multilocations:
-        for i, loc in enumerate(multilocations):
-            session.add(Slug(offer_id=offer.id, slug=loc["slug"]))
-            location = get_or_create(
-                session, Location,
-                company_id=company.id,
-                city=loc["city"], street=loc["street"],
-                latitude=loc["latitude"], longitude=loc["longitude"],
-                is_main=(i == 0)
-            )
-            locations.append(location)
-    else:
-        slug_value = data.get("slug")
-        if isinstance(slug_value, str):
-            session.add(Slug(offer_id=offer.id, slug=slug_value))
-
-        location = get_or_create(
-            session, Location,
-            company_id=company.id,
-            city=data["city"], street=data["street"],
-            latitude=data["latitude"], longitude=data["longitude"],
-            is_main=True
-        )
-        locations = [location]
-
-    seen_locations = set()
-    for loc in locations:
-        key = (offer.id, loc.id)
-        if key not in seen_locations:
-            session.add(OfferLocationAssociation(offer_id=offer.id, location_id=loc.id))
-            seen_locations.add(key)
-
-    for skill in data.get("requiredSkills", []):
-        s = get_or_create(session, Skill, name=skill)
-        session.add(RequiredSkillAssociation(offer_id=offer.id, skill_id=s.id,level=0))
-
-    nice_skills = data.get("niceToHaveSkills") or []
-    for skill in nice_skills:
-        s = get_or_create(session, Skill, name=skill)
-        session.add(NiceToHaveSkillAssociation(offer_id=offer.id, skill_id=s.id))
-
-    for lang in data.get("languages", []):
-        l = get_or_create(session, Language, code=lang["code"], defaults={"level": lang["level"]})
-        session.add(LanguageAssociation(offer_id=offer.id, language_id=l.id))
-
-    for et in data.get("employmentTypes", []):
-        session.add(EmploymentType(
-            offer_id=offer.id,
-            type=et["type"],
-            currency=et["currency"],
-            unit=et["unit"],
-            gross=et["gross"],
-            from_amount=et["from"], to_amount=et["to"],
-            from_pln=et.get("fromPln"), to_pln=et.get("toPln"),
-            from_usd=et.get("fromUsd"), to_usd=et.get("toUsd"),
-            from_eur=et.get("fromEur"), to_eur=et.get("toEur"),
-            from_gbp=et.get("fromGbp"), to_gbp=et.get("toGbp"),
-            from_chf=et.get("fromChf"), to_chf=et.get("toChf")
-        ))
-
-    logging.info(f"[{line_number}] ✅ Dodano ofertę (v2): {data['slug']} - {data['title']}")
-    return True, 0 #ilosc duplikatów
-
+    return import_offer(normalize_v2(data), session, line_number)
 ###########################################
 def import_offer_v3(data: dict, session: Session, line_number: int):
-    # do 2023-12-31
-    
-    published_at = (
-        datetime.fromisoformat(data["published_at"].replace("Z", "+00:00"))
-        if data.get("published_at") else None
-    )
-
-    if session.query(Offer).filter_by(original_id=data["id"], published_at=published_at).first():
-        logging.info(f"[{line_number}] Pomijam istniejącą ofertę: {data['id']} ({published_at})")
-        return True, 1 #ilosc duplikatów
-
-    category = get_or_create(session, Category, id=0, name=f"Kategoria 0")
-    experience = get_or_create(session, ExperienceLevel, name=data["experience_level"])
-    workplace = get_or_create(session, WorkplaceType, name=data["workplace_type"])
-    working_time = get_or_create(session, WorkingTime, name="unknown")
-    company = get_or_create(session, Company, name=data["company_name"], defaults={"logo_url": data.get("company_logo_url")})
-    offerent = get_or_create(session, Offerent, name="JustJoinIt", defaults={"url": "https://justjoin.it/"})
-
-    offer = Offer(
-        original_id=data["id"],
-        title=data["title"],
-        remote_interview=data.get("remote_interview"),
-        published_at=datetime.fromisoformat(data["published_at"].replace("Z", "+00:00")) if data.get("published_at") else None,
-        open_to_hire_ukrainians=data.get("open_to_hire_ukrainians", False),
-        category_id=category.id,
-        experience_level_id=experience.id,
-        workplace_type_id=workplace.id,
-        working_time_id=working_time.id,
-        company_id=company.id,
-        offerent_id=offerent.id
-    )
-    session.add(offer)
-    session.flush()
-
-    multilocations = data.get("multilocation")
-    locations = []
-
-    if multilocations:
-        for i, loc in enumerate(multilocations):
-            # Dodaj slug
-            if "slug" in loc:
-                session.add(Slug(offer_id=offer.id, slug=loc["slug"]))
-
-            # Dodaj lokalizację
-            location = get_or_create(session, Location,
-                company_id=company.id,
-                city=loc.get("city", "unknown"),
-                street=loc.get("street", ""),
-                latitude=float(loc["latitude"]) if loc.get("latitude") else None,
-                longitude=float(loc["longitude"]) if loc.get("longitude") else None,
-                is_main=(i == 0)
-            )
-            locations.append(location)
-    else:
-        # Dodaj slug (jeśli nie multilocation, slug może być w `id`)
-        slug_value = data.get("id")
-        if slug_value:
-            session.add(Slug(offer_id=offer.id, slug=slug_value))
-
-        # Dodaj pojedynczą lokalizację
-        location = get_or_create(session, Location,
-            company_id=company.id,
-            city=data.get("city", "unknown"),
-            street=data.get("street", ""),
-            latitude=float(data["latitude"]),
-            longitude=float(data["longitude"]),
-            is_main=True
-        )
-        locations = [location]
-
-    # Dodaj powiązania lokalizacji z ofertą
-    seen_locations = set()
-    for loc in locations:
-        key = (offer.id, loc.id)
-        if key not in seen_locations:
-            session.add(OfferLocationAssociation(offer_id=offer.id, location_id=loc.id))
-            seen_locations.add(key)
-
-    for skill_obj in data.get("skills", []):
-        s = get_or_create(session, Skill, name=skill_obj["name"])
-        session.add(RequiredSkillAssociation(offer_id=offer.id, skill_id=s.id,level=0))
-
-    for et in data.get("employment_types", []):
-        salary = et.get("salary") or {}
-        session.add(EmploymentType(
-            offer_id=offer.id,
-            type=et["type"],
-            currency=salary.get("currency"),
-            unit=et.get("unit", "month"),
-            gross=salary.get("gross") if isinstance(salary, dict) else None,
-            from_amount=salary.get("from"),
-            to_amount=salary.get("to")
-        ))
-
-    logging.info(f"[{line_number}] ✅ Dodano ofertę (v3): {data['id']} - {data['title']}")
-    return True, 0 #ilosc duplikatów
-
+    return import_offer(normalize_v3(data), session, line_number)
 
 ###########################################
-def import_offers_from_jsonl(source: Union[str, Path, TextIO], session: Session, filename: str = None):
-    if not filename:
-        raise ValueError("Brakuje nazwy pliku - filename jest wymagany dla rejestracji importu.")
-    if isinstance(source, (str, Path)):
-        f = open(source, "r", encoding="utf-8")
-        should_close = True
-    else:
-        f = (line.decode("utf-8") for line in source.readlines())
-        should_close = False
+class ImportSink:
+    # Dodatkowy odbiorca zaimportowanych ofert (np. baza analityczna, agregaty).
+    # add() dostaje znormalizowany rekord i id oferty, flush() działa w transakcji
+    # SQLite tuż przed commitem, commit()/rollback() – po jej zakończeniu.
+    def add(self, record: NormalizedOffer, offer_id: int):
+        pass
+    def flush(self, session: Session):
+        pass
+    def commit(self):
+        pass
+    def rollback(self):
+        pass
+    def close(self):
+        pass
 
+###########################################
+class ParsedLine:
+    __slots__ = ("line_number", "raw", "record", "version", "error")
+
+    def __init__(self, line_number, raw, record=None, version=None, error=None):
+        self.line_number = line_number
+        self.raw = raw
+        self.record = record
+        self.version = version
+        self.error = error
+###########################################
+def parse_offer_line(line_number: int, line) -> ParsedLine:
+    try:
+        start = time.perf_counter()
+        data = json.loads(line)
+        decoded = time.perf_counter()
+        JSON_DECODE_SECONDS.observe(decoded - start, source="import")
+        version = detect_version(data)
+        record = normalize_offer(data)
+        NORMALIZE_SECONDS.observe(time.perf_counter() - decoded, version=version)
+        return ParsedLine(line_number, line, record, version)
+    except Exception as e:
+        return ParsedLine(line_number, line, error=e)
+###########################################
+def parse_offer_lines(lines, start_line: int = 1):
+    for line_number, line in enumerate(lines, start=start_line):
+        yield parse_offer_line(line_number, line)
+###########################################
+def parse_jsonl_bytes(data: bytes, start_line: int = 1) -> list:
+    # Dekodowanie i normalizacja całego pliku – uruchamiane w procesach roboczych
+    lines = data.split(b"\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    return list(parse_offer_lines(lines, start_line))
+###########################################
+class FileCursor:
+    # Pozycja importu w pliku źródłowym: liczba zaimportowanych bajtów i ETag obiektu;
+    # start – pozycja, od której zaczął się bieżący import, end – koniec pobranego obiektu
+    __slots__ = ("offset", "etag", "start", "end")
+
+    def __init__(self, offset: int = 0, etag: str = None):
+        self.offset = offset
+        self.etag = etag
+        self.start = offset
+        self.end = None
+    ####################################################
+    def track(self, parsed_lines: Iterable[ParsedLine]):
+        # linie z S3 przychodzą jako bytes bez końcowego "\n"; ostatnia linia obiektu
+        # może go nie mieć – pozycja nie wychodzi wtedy poza koniec pliku
+        for parsed in parsed_lines:
+            self.offset += len(parsed.raw) + 1
+            if self.end is not None and self.offset > self.end:
+                self.offset = self.end
+            yield parsed
+###########################################
+def register_imported_file(session: Session, filename: str, lines_total: int, lines_ok: int,
+                           lines_duplikate: int, lines_failed: int, cursor: FileCursor = None):
+    imported = session.query(ImportedFile).filter_by(filename=filename).first()
+    if imported is None:
+        imported = ImportedFile(filename=filename, lines_total=0, lines_ok=0, lines_duplikate=0, lines_failed=0)
+        session.add(imported)
+
+    if cursor is not None and cursor.start == 0:
+        # import od początku pliku (np. nadpisanego krótszą wersją) – liczniki od zera
+        imported.lines_total = imported.lines_ok = imported.lines_duplikate = imported.lines_failed = 0
+    # kolejne fragmenty tego samego pliku sumują się w jednym wpisie
+    imported.lines_total = (imported.lines_total or 0) + lines_total
+    imported.lines_ok = (imported.lines_ok or 0) + lines_ok
+    imported.lines_duplikate = (imported.lines_duplikate or 0) + lines_duplikate
+    imported.lines_failed = (imported.lines_failed or 0) + lines_failed
+    imported.status = "all_ok" if imported.lines_failed == 0 else "partial" if imported.lines_ok > 0 else "failed"
+    imported.imported_at = datetime.now(timezone.utc)
+    if cursor is not None:
+        imported.bytes_imported = cursor.offset
+        imported.etag = cursor.etag
+    return imported
+###########################################
+def import_parsed_offers(parsed_lines: Iterable[ParsedLine], session: Session, filename: str, cursor: FileCursor = None,
+                         dead_letters: DeadLetterWriter = None, register: bool = True, sinks: Iterable[ImportSink] = ()):
     lines_total = 0
     lines_ok = 0
     lines_failed = 0
     lines_duplikate = 0
 
+    if cursor is not None:
+        parsed_lines = cursor.track(parsed_lines)
+
+    own_dead_letters = dead_letters is None
+    if own_dead_letters:
+        dead_letters = DeadLetterWriter()
+
     try:
-        for line_number, line in enumerate(f, start=1):
+        for parsed in parsed_lines:
+            line_number = parsed.line_number
             lines_total += 1
+            if parsed.error is not None:
+                lines_failed += 1
+                logging.error(f"[{line_number}] ❌ Błąd parsowania: {parsed.error}")
+                dead_letters.write(parsed.raw, parsed.error, filename, line_number, stage="parse")
+                continue
+            offer_id = None
             try:
-                data = json.loads(line)
-                version = detect_version(data)
-
-                if version == "v1":
-                    success, duplikate = import_offer_v1(data, session, line_number)
-                    if success:
-                        lines_ok += 1
-                        lines_duplikate += duplikate
-                    else:
-                        lines_failed += 1
-                elif version == "v2":
-                    success, duplikate = import_offer_v2(data, session, line_number)
-                    if success:
-                        lines_ok += 1
-                        lines_duplikate += duplikate
-                    else:
-                        lines_failed += 1
-                elif version == "v3":
-                    success, duplikate = import_offer_v3(data, session, line_number)
-                    if success:
-                        lines_ok += 1
-                        lines_duplikate += duplikate
-                    else:
-                        lines_failed += 1
+                if parsed.record is not None:
+                    # SAVEPOINT na ofertę – błąd wycofuje tylko bieżący rekord,
+                    # a wcześniejsze oferty z pliku zostają w transakcji
+                    start = time.perf_counter()
+                    with session.begin_nested():
+                        offer_id = save_offer(parsed.record, session, line_number)
+                    SAVE_OFFER_SECONDS.observe(time.perf_counter() - start, result="new" if offer_id else "duplicate")
+                    lines_ok += 1
+                    if offer_id is None:
+                        lines_duplikate += 1
                 else:
-                    logging.warning(f"[{line_number}] ⚠️ Nieobsługiwana wersja: {version}")
+                    logging.warning(f"[{line_number}] ⚠️ Nieobsługiwana wersja: {parsed.version}")
                     lines_failed += 1
+                    dead_letters.write(parsed.raw, ValueError(f"Nieobsługiwana wersja: {parsed.version}"), filename, line_number, stage="parse")
 
             except Exception as e:
-                session.rollback()
                 lines_failed += 1
                 logging.exception(f"[{line_number}] ❌ Błąd importu: {e}")
-                with open("offers_failed.jsonl", "a", encoding="utf-8") as fail_file:
-                    fail_file.write(json.dumps(data, ensure_ascii=False) + "\n")
+                dead_letters.write(parsed.raw, e, filename, line_number)
+            # Poza obsługą błędów linii: oferta jest już zapisana, więc błąd odbiorcy nie może
+            # jej policzyć jako błędnej – przerywa import pliku (wywołujący wycofuje transakcję)
+            if offer_id is not None:
+                for sink in sinks:
+                    sink.add(parsed.record, offer_id)
+    except Exception:
+        for sink in sinks:
+            sink.rollback()
+        raise
+    finally:
+        if own_dead_letters:
+            dead_letters.close()
 
-        session.commit()
-        logging.info("✅ Import zakończony.")
+    IMPORT_LINES.inc(lines_ok - lines_duplikate, result="new")
+    IMPORT_LINES.inc(lines_duplikate, result="duplicate")
+    IMPORT_LINES.inc(lines_failed, result="failed")
 
-        # Zakończenie importu — rejestracja w bazie
-        if filename and lines_ok > 0:
-            status = "all_ok" if lines_failed == 0 else "partial" if lines_ok > 0 else "failed"
-            session.add(ImportedFile(
-                filename=filename,
-                imported_at=datetime.now(timezone.utc),
-                status=status,
-                lines_total=lines_total,
-                lines_ok=lines_ok,
-                lines_duplikate=lines_duplikate,
-                lines_failed=lines_failed
-            ))
-            session.commit()
-            logging.info(f"📦 Zarejestrowano plik: {filename} | status: {status} | total: {lines_total} | ok: {lines_ok} | duplikate: {lines_duplikate} | błędne: {lines_failed}")
+    # Zakończenie importu — rejestracja w bazie w tej samej transakcji co oferty
+    imported = None
+    # z kursorem rejestrujemy także fragment z samymi błędnymi liniami – inaczej
+    # bytes_imported stoi w miejscu i ten sam ogon pliku wraca przy każdym imporcie
+    if register and filename and (lines_ok > 0 or (cursor is not None and lines_total > 0)):
+        imported = register_imported_file(session, filename, lines_total, lines_ok, lines_duplikate, lines_failed, cursor)
 
+    try:
+        for sink in sinks:
+            sink.flush(session)
+        session.commit()
+    except Exception:
+        for sink in sinks:
+            sink.rollback()
+        raise
+    for sink in sinks:
+        sink.commit()
+    logging.info("✅ Import zakończony.")
+    if imported is not None:
+        logging.info(f"📦 Zarejestrowano plik: {filename} | status: {imported.status} | total: {lines_total} | ok: {lines_ok} | duplikate: {lines_duplikate} | błędne: {lines_failed}")
+
+    return lines_ok, lines_failed, lines_duplikate, lines_total
+###########################################
+def import_offers_from_jsonl(source: Union[str, Path, TextIO, Iterable[bytes]], session: Session, filename: str = None,
+                             dead_letters: DeadLetterWriter = None):
+    if not filename:
+        raise ValueError("Brakuje nazwy pliku - filename jest wymagany dla rejestracji importu.")
+    if isinstance(source, (str, Path)):
+        f = open(source, "r", encoding="utf-8")
+        should_close = True
+    else:
+        # strumień linii (bytes lub str) – przetwarzany na bieżąco, bez wczytywania całości
+        f = source
+        should_close = False
+
+    try:
+        return import_parsed_offers(parse_offer_lines(f), session, filename, dead_letters=dead_letters)
     finally:
         if should_close:
             f.close()
+###########################################
+def replay_dead_letters(path: Union[str, Path], session: Session, sinks: Iterable[ImportSink] = ()):
+    # Ponowny import linii z dead-letter (np. po poprawce importera). Linie
+    # z jednego pliku źródłowego idą jedną transakcją przez import_parsed_offers;
+    # te, które nadal się nie importują, zostają w pliku.
+    path = Path(path)
+    if not path.exists():
+        logging.info(f"📭 Brak pliku błędów: {path}")
+        return 0, 0, 0, 0
+
+    by_source = {}
+    for entry in read_dead_letters(path):
+        by_source.setdefault(entry["source_file"], []).append(entry)
+
+    lines_ok = lines_failed = lines_duplikate = lines_total = 0
+    pending_path = path.with_name(path.name + ".replay")
+    pending_path.unlink(missing_ok=True)
+    with DeadLetterWriter(pending_path) as dead_letters:
+        for source_file, entries in by_source.items():
+            logging.info(f"🔁 Ponowny import {len(entries)} linii z pliku {source_file or '(nieznany)'}")
+            parsed_lines = (parse_offer_line(entry["line_number"] or 0, entry["raw"]) for entry in entries)
+            ok, failed, duplikate, total = import_parsed_offers(
+                parsed_lines, session, source_file, dead_letters=dead_letters, register=False, sinks=sinks
+            )
+            lines_ok += ok
+            lines_failed += failed
+            lines_duplikate += duplikate
+            lines_total += total
 
-    return lines_ok, lines_failed, lines_duplikate, lines_total
\ No newline at end of file
+    if dead_letters.count:
+        pending_path.replace(path)
+    else:
+        path.unlink()
+    logging.info(f"🔁 Zakończono ponowny import {path}: total: {lines_total} | ok: {lines_ok} | duplikate: {lines_duplikate} | nadal błędne: {lines_failed}")
+    return lines_ok, lines_failed, lines_duplikate, lines_total
@@ -1,93 +1,293 @@
 import logging
+import multiprocessing
 import os
 from dotenv import load_dotenv
-from io import BytesIO
-import boto3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from queue import Queue
 from sqlalchemy.orm import Session
-from sql_import_offers import import_offers_from_jsonl
+from sql_import_offers import import_parsed_offers, parse_offer_lines, parse_jsonl_bytes, FileCursor
+from sql_dead_letter import DeadLetterWriter
 from sql_models import ImportedFile
-import re
-from datetime import datetime, timezone, timedelta
+from s3_manifest import Manifest, extract_date
+from client_s3 import get_s3_client
+from datetime import date
+import metrics
 
 load_dotenv()
 
 
-# Ustawienia S3
-ENDPOINT_URL = os.getenv("ENDPOINT_URL")
+# Ustawienia S3 (klient: client_s3.get_s3_client, tworzony przy pierwszym użyciu)
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 PREFIX = "jobs/"
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1 MiB na jeden odczyt z S3
+STREAM_PREFETCH = 4  # maks. liczba fragmentów buforowanych przed parserem
+# Import potokowy: wątki pobierające pliki, procesy parsujące, jeden zapis do SQLite.
+# DOWNLOAD_WORKERS=0 oznacza import szeregowy (strumieniowy) w jednym wątku.
+DOWNLOAD_WORKERS = int(os.getenv("SQL_DOWNLOAD_WORKERS", "4"))
+PARSE_WORKERS = int(os.getenv("SQL_PARSE_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+# Górny limit pobranych, a jeszcze niezapisanych danych (MiB) – pliki trzymane są w pamięci
+# w całości, a sparsowane rekordy zajmują kilka razy więcej niż surowy JSONL.
+# Plik większy niż limit jest pobierany sam (bez wyprzedzania kolejnych).
+PREFETCH_MB = int(os.getenv("SQL_PREFETCH_MB", "256"))
 
-s3 = boto3.client("s3", endpoint_url=ENDPOINT_URL)
+FETCH_SECONDS = metrics.histogram("import_fetch_seconds", "Pobranie całego pliku JSONL z S3 (GET + odczyt treści)")
+FILE_SECONDS = metrics.histogram("import_file_seconds", "Import jednego pliku: oczekiwanie na pobrane dane, zapis i commit")
+
+###################################################
+def _read_chunks(body, chunks: Queue, chunk_size: int, stop: threading.Event):
+    try:
+        while not stop.is_set():
+            chunk = body.read(chunk_size)
+            chunks.put(chunk)
+            if not chunk:
+                break
+    except Exception as e:
+        chunks.put(e)
+###################################################
+def iter_lines(body, chunk_size: int = STREAM_CHUNK_SIZE, prefetch: int = STREAM_PREFETCH):
+    # Wątek czytający pobiera kolejne fragmenty, gdy parser przetwarza bieżące –
+    # kolejka ogranicza pamięć do `prefetch` fragmentów.
+    chunks = Queue(maxsize=prefetch)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_chunks, args=(body, chunks, chunk_size, stop), daemon=True)
+    reader.start()
+
+    pending = b""
+    try:
+        while True:
+            chunk = chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+        # ostatnia linia bez "\n" – PUT w S3 podmienia cały obiekt, więc linia jest kompletna
+        if pending:
+            yield pending
+    finally:
+        # przerwany odczyt – zwalniamy wątek czekający na miejsce w kolejce
+        stop.set()
+        while not chunks.empty():
+            chunks.get_nowait()
+###################################################
+class ImportTask:
+    # size – liczba bajtów do pobrania (z listy obiektów, bez zaimportowanej już części)
+    __slots__ = ("key", "filename", "start_line", "cursor", "size")
+
+    def __init__(self, key: str, filename: str, start_line: int, cursor: FileCursor, size: int = 0):
+        self.key = key
+        self.filename = filename
+        self.start_line = start_line
+        self.cursor = cursor
+        self.size = size
 ###################################################
-def was_file_imported(session: Session, filename: str) -> bool:
-    return session.query(ImportedFile).filter_by(filename=filename).first() is not None
+def get_object_from(key: str, offset: int = 0):
+    # Ranged GET – przy imporcie przyrostowym pobieramy tylko nowy ogon pliku
+    if offset:
+        return get_s3_client().get_object(Bucket=BUCKET_NAME, Key=key, Range=f"bytes={offset}-")
+    return get_s3_client().get_object(Bucket=BUCKET_NAME, Key=key)
 ###################################################
-def extract_date(key):
-    match = re.search(r"justjoinit_(\d{4})-(\d{2})-(\d{2})\.jsonl", key)
-    if match:
-        return datetime(int(match[1]), int(match[2]), int(match[3]))
-    print(f"⚠️ Nie udało się sparsować daty z klucza: {key}")
-    return datetime.min
+def stream_jsonl_from_s3(key: str, cursor: FileCursor = None):
+    response = get_object_from(key, cursor.offset if cursor else 0)
+    if cursor is not None:
+        cursor.etag = response["ETag"].strip('"')
+        cursor.end = cursor.offset + response["ContentLength"]
+    body = response["Body"]
+    try:
+        lines = iter_lines(body)
+        if cursor is not None and cursor.offset:
+            first = next(lines, None)
+            if first == b"":
+                # "\n" dopisany za ostatnią linią zaimportowaną bez końca linii
+                cursor.offset += 1
+            elif first is not None:
+                yield first
+        yield from lines
+    finally:
+        body.close()
 ###################################################
-def get_jsonl_from_s3(key: str) -> BytesIO:
-    response = s3.get_object(Bucket=BUCKET_NAME, Key=key)
-    return BytesIO(response["Body"].read())
+def fetch_jsonl_from_s3(key: str, cursor: FileCursor = None) -> bytes:
+    start = time.perf_counter()
+    response = get_object_from(key, cursor.offset if cursor else 0)
+    if cursor is not None:
+        cursor.etag = response["ETag"].strip('"')
+    data = response["Body"].read()
+    if cursor is not None:
+        if cursor.offset and data.startswith(b"\n"):
+            # "\n" dopisany za ostatnią linią zaimportowaną bez końca linii
+            data = data[1:]
+            cursor.offset += 1
+        cursor.end = cursor.offset + len(data)
+    FETCH_SECONDS.observe(time.perf_counter() - start)
+    return data
 ###################################################
-def import_all_from_s3(session: Session):
-    paginator = s3.get_paginator("list_objects_v2")
-    all_files = []
+def _parse_in_worker(data: bytes, start_line: int):
+    # Proces roboczy: metryki parsowania tego pliku wracają do procesu głównego razem z wynikiem
+    metrics.REGISTRY.reset()
+    return parse_jsonl_bytes(data, start_line), metrics.REGISTRY.snapshot()
+###################################################
+def _download_and_parse(task: ImportTask, parse_pool: ProcessPoolExecutor) -> list:
+    data = fetch_jsonl_from_s3(task.key, task.cursor)
+    parsed, snapshot = parse_pool.submit(_parse_in_worker, data, task.start_line).result()
+    metrics.REGISTRY.merge(snapshot)
+    return parsed
+###################################################
+def _iter_streamed(tasks):
+    for task in tasks:
+        yield task, lambda task=task: parse_offer_lines(stream_jsonl_from_s3(task.key, task.cursor), task.start_line)
+###################################################
+def _iter_prefetched(tasks, download_workers: int, parse_workers: int, prefetch_mb: int = PREFETCH_MB):
+    # Pliki pobierane i parsowane są z wyprzedzeniem (okno 2 x liczba wątków, ale nie więcej
+    # niż prefetch_mb pobranych danych łącznie z plikiem w trakcie zapisu),
+    # a oddawane do zapisu dokładnie w kolejności listy plików.
+    window = download_workers * 2
+    max_bytes = prefetch_mb * 1024 * 1024
+    # Zadania do procesów parsujących zlecają wątki pobierające, a w procesie działa też
+    # wątek logów – fork() z wielowątkowego procesu grozi zakleszczeniem, stąd forkserver
+    # (parsowanie nie loguje, więc procesy robocze nie potrzebują konfiguracji logów)
+    mp_context = multiprocessing.get_context("forkserver")
+    # domyślnie forkserver importuje __main__ (app.py startuje przy imporcie LogManagera z wątkiem);
+    # wystarczy ten moduł
+    mp_context.set_forkserver_preload(["sql_import_s3"])
+    with ThreadPoolExecutor(max_workers=download_workers) as download_pool, \
+            ProcessPoolExecutor(max_workers=parse_workers, mp_context=mp_context) as parse_pool:
+        remaining = iter(tasks)
+        pending = deque()
+        state = {"next": next(remaining, None), "bytes": 0}
 
-    today = datetime.now(timezone.utc).date()
+        def submit_more():
+            # plik w trakcie zapisu wciąż liczy się do limitu; pierwszy plik zlecamy zawsze,
+            # nawet gdy sam przekracza limit
+            while state["next"] is not None and len(pending) < window and \
+                    (not state["bytes"] or state["bytes"] + state["next"].size <= max_bytes):
+                task = state["next"]
+                pending.append((task, download_pool.submit(_download_and_parse, task, parse_pool)))
+                state["bytes"] += task.size
+                state["next"] = next(remaining, None)
 
-    PREFIX = "jobs/year=2025"
+        submit_more()
+        try:
+            while pending:
+                task, future = pending.popleft()
+                submit_more()
+                yield task, future.result
+                # zapisany plik zwalnia miejsce – także gdy limit wstrzymał zlecanie i kolejka jest pusta
+                state["bytes"] -= task.size
+                submit_more()
+        finally:
+            for _, future in pending:
+                future.cancel()
+###################################################
+def plan_import(obj: dict, imported: ImportedFile):
+    key = obj["Key"]
+    filename = key.split("/")[-1]
+    size = obj["Size"]
+    # brak ETagu (np. wpis manifestu sprzed poprawki) – plik traktowany jako zmieniony
+    etag = (obj.get("ETag") or "").strip('"') or None
 
-    # Zbieramy wszystkie pliki .jsonl
-    for result in paginator.paginate(Bucket=BUCKET_NAME, Prefix=PREFIX):
-        for obj in result.get("Contents", []):
-            if obj["Key"].endswith(".jsonl"):
-                file_date = extract_date(obj["Key"]).date()
-                # Pomijamy pliki z ostatnich 2 dni: dzisiaj, wczoraj, przedwczoraj
-                if file_date >= today - timedelta(days=1):
-                    logging.info(f"\u23ed Pomijam plik z ostatnich 2 dni: {obj['Key']}")
-                    continue
-                all_files.append(obj)
+    if imported is None:
+        return ImportTask(key, filename, 1, FileCursor(), size)
+    if imported.bytes_imported is None:
+        # wpis sprzed importu przyrostowego – plik traktujemy jako w pełni zaimportowany
+        return None
+    # sam ETag nie wystarczy – wpis mógł zapisać tylko część obiektu
+    if etag is not None and imported.bytes_imported == size and imported.etag == etag:
+        return None
+    if size > imported.bytes_imported:
+        logging.info(f"➕ Plik {filename} urósł: {imported.bytes_imported} ➜ {size} B – importuję tylko nowe linie")
+        return ImportTask(key, filename, (imported.lines_total or 0) + 1, FileCursor(imported.bytes_imported),
+                          size - imported.bytes_imported)
+    # plik został nadpisany krótszą albo inną wersją – import od początku (duplikaty są pomijane),
+    # liczniki linii w imported_files liczone od nowa (register_imported_file, cursor.start == 0)
+    logging.warning(f"⚠️ Plik {filename} został nadpisany ({size} B, zaimportowano {imported.bytes_imported} B) – import od początku")
+    return ImportTask(key, filename, 1, FileCursor(), size)
+###################################################
+def list_archive_files(date_from: date = None, date_to: date = None, reconcile: bool = False) -> list:
+    # Lista plików pochodzi z manifestu; S3 listujemy tylko przy uzgadnianiu
+    # (brak manifestu albo reconcile=True), i to wyłącznie w zadanym zakresie dat
+    s3 = get_s3_client()
+    manifest = Manifest.load(s3, BUCKET_NAME)
+    if not manifest.exists:
+        # pierwszy manifest musi objąć cały bucket, nie tylko żądany zakres
+        manifest.reconcile(s3, BUCKET_NAME)
+    elif reconcile:
+        manifest.reconcile(s3, BUCKET_NAME, date_from, date_to)
+    if manifest.changed:
+        manifest.save(s3, BUCKET_NAME)
+
+    all_files = manifest.objects(date_from, date_to)
 
     # Sortujemy pliki od najnowszego do najstarszego
     all_files.sort(key=lambda x: extract_date(x["Key"]), reverse=True)
     # all_files.sort(key=lambda x: extract_date(x["Key"]), reverse=False)
-
-    # Statystyki
-    files_total = len(all_files)
+    return all_files
+###################################################
+def import_tasks(tasks: list, session: Session, dead_letters: DeadLetterWriter,
+                 download_workers: int = DOWNLOAD_WORKERS, parse_workers: int = PARSE_WORKERS, sinks: list = ()):
     files_imported = 0
-    files_skipped = 0
     files_failed = 0
     offers_total = 0
     offers_ok = 0
     offers_failed = 0
     offers_duplikate = 0
 
-    for obj in all_files:
-        key = obj["Key"]
-        logging.info(f"Znaleziono plik: {key}")
-        filename = key.split("/")[-1]
-
-        if was_file_imported(session, filename):
-            logging.info(f"⏭ Pomijam już zaimportowany plik: {filename}")
-            files_skipped += 1
-            continue
+    if download_workers:
+        sources = _iter_prefetched(tasks, download_workers, parse_workers)
+    else:
+        sources = _iter_streamed(tasks)
 
+    for task, load in sources:
         try:
-            logging.info(f"⬇️  Importuję plik: {filename} z klucza {key}")
-            stream = get_jsonl_from_s3(key)
-            # import_offers_from_jsonl(stream, session, filename)
-            lines_ok, lines_failed, lines_duplikate, lines_total = import_offers_from_jsonl(stream, session, filename)
+            logging.info(f"⬇️  Importuję plik: {task.filename} z klucza {task.key} (od bajtu {task.cursor.offset})")
+            with FILE_SECONDS.time():
+                lines_ok, lines_failed, lines_duplikate, lines_total = import_parsed_offers(
+                    load(), session, task.filename, task.cursor, dead_letters=dead_letters, sinks=sinks
+                )
             offers_total += lines_total
             offers_ok += lines_ok
             offers_failed += lines_failed
             offers_duplikate += lines_duplikate
             files_imported += 1
         except Exception as e:
-            logging.exception(f"❌ Błąd importu pliku {filename}: {e}")
+            session.rollback()
+            logging.exception(f"❌ Błąd importu pliku {task.filename}: {e}")
             files_failed += 1
 
-    return files_total, files_imported, files_skipped, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate  
\ No newline at end of file
+    return files_imported, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate
+###################################################
+def import_all_from_s3(session: Session, date_from: date = None, date_to: date = None, reconcile: bool = False,
+                       download_workers: int = DOWNLOAD_WORKERS, parse_workers: int = PARSE_WORKERS, sinks: list = ()):
+    all_files = list_archive_files(date_from, date_to, reconcile)
+
+    # Statystyki
+    files_total = len(all_files)
+    files_skipped = 0
+
+    imported_files = {imported.filename: imported for imported in session.query(ImportedFile)}
+    tasks = []
+    seen_filenames = set()
+    for obj in all_files:
+        key = obj["Key"]
+        logging.info(f"Znaleziono plik: {key}")
+        filename = key.split("/")[-1]
+
+        task = None if filename in seen_filenames else plan_import(obj, imported_files.get(filename))
+        if task is None:
+            logging.info(f"⏭ Pomijam już zaimportowany plik: {filename}")
+            files_skipped += 1
+            continue
+        seen_filenames.add(filename)
+        tasks.append(task)
+
+    # jeden plik dead-letter na cały przebieg
+    with DeadLetterWriter() as dead_letters:
+        files_imported, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate = import_tasks(
+            tasks, session, dead_letters, download_workers, parse_workers, sinks
+        )
+
+    return files_total, files_imported, files_skipped, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate
@@ -0,0 +1,47 @@
+import logging
+from sqlalchemy import inspect
+from sql_models import Base
+from sql_search import create_search_index
+from sql_geo import create_geo_index
+
+# Migracje istniejących plików jobs.sqlite: create_all tworzy tylko brakujące
+# tabele, więc indeksy dodane później do modeli trzeba założyć osobno.
+
+###########################################
+def create_missing_indexes(engine) -> int:
+    created = 0
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                index.create(conn)
+                created += 1
+                logging.info(f"🧱 Utworzono indeks {index.name} na tabeli {table.name}")
+    return created
+###########################################
+def add_missing_columns(engine) -> int:
+    # Nowe kolumny w modelach muszą być nullable – SQLite dodaje je jako NULL
+    added = 0
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+                added += 1
+                logging.info(f"🧱 Dodano kolumnę {table.name}.{column.name} ({column_type})")
+    return added
+###########################################
+def migrate(engine):
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    create_missing_indexes(engine)
+    # tabele wirtualne (FTS5, R*Tree) spoza modeli ORM
+    create_search_index(engine)
+    create_geo_index(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime, timezone
 
@@ -54,7 +54,10 @@ class Slug(Base):
     
     offers = relationship("Offer", back_populates="slugs")
     # Kombinacja offer_id i location_id zapewnia unikalność powiązania
-    __table_args__ = (UniqueConstraint('offer_id', 'slug', name='_offer_slug_unique'),)
+    __table_args__ = (
+        UniqueConstraint('offer_id', 'slug', name='_offer_slug_unique'),
+        Index("ix_slugs_slug", "slug"),  # wyszukiwanie oferty po slugu
+    )
 ####################################################
 class WorkplaceType(Base):
     __tablename__ = 'workplace_types'
@@ -129,6 +132,8 @@ class Location(Base):
     offers = relationship("Offer", secondary="offer_location_association", back_populates="locations")
 
     __table_args__ = (
+        # get_or_create lokalizacji w imporcie
+        Index("ix_locations_lookup", "company_id", "city", "street", "latitude", "longitude", "is_main"),
         {'sqlite_autoincrement': True},  # Dodanie autoinkrementacji w SQLite
     )
 ####################################################
@@ -138,6 +143,9 @@ class OfferLocationAssociation(Base):
     offer_id = Column(Integer, ForeignKey('offers.id'),primary_key=True)
     location_id = Column(Integer, ForeignKey('locations.id'),primary_key=True)
 
+    __table_args__ = (
+        Index("ix_offer_location_location", "location_id"),  # oferty dla lokalizacji (zapytania o promień)
+    )
 ####################################################
 class Offerent(Base):
     __tablename__ = 'offerents'
@@ -206,6 +214,7 @@ class EmploymentType(Base):
     offers = relationship("Offer", back_populates="employment_types")
 
     __table_args__ = (
+        Index("ix_employment_types_offer_id", "offer_id"),
         {'sqlite_autoincrement': True},  # Dodanie autoinkrementacji w SQLite
     )
 ####################################################
@@ -249,6 +258,10 @@ class Scraper(Base):
     company_size = Column(String,nullable=True)  # Rozmiar firmy (np. "mała", "średnia", "duża")
 
     offers = relationship("Offer", back_populates="scraper_data")    
+
+    __table_args__ = (
+        Index("ix_scraper_status", "status"),
+    )
 ####################################################
 class ImportedFile(Base):
     __tablename__ = 'imported_files'
@@ -263,4 +276,42 @@ class ImportedFile(Base):
     lines_total = Column(Integer, default=0)
     lines_ok = Column(Integer, default=0)
     lines_duplikate = Column(Integer, default=0)
-    lines_failed = Column(Integer, default=0)
\ No newline at end of file
+    lines_failed = Column(Integer, default=0)
+
+    # Import przyrostowy: ile bajtów pliku (pełnych linii) już zaimportowano i ETag tej wersji obiektu
+    bytes_imported = Column(Integer, nullable=True)
+    etag = Column(String(64), nullable=True)
+
+####################################################
+# Tabele zagregowane – aktualizowane przyrostowo podczas importu (sql_aggregates.py)
+####################################################
+class SkillDemandDaily(Base):
+    __tablename__ = 'agg_skill_demand_daily'
+
+    day = Column(Date, primary_key=True)  # dzień publikacji oferty
+    skill_id = Column(Integer, ForeignKey('skills.id'), primary_key=True)
+    required_count = Column(Integer, nullable=False, default=0)
+    nice_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_agg_skill_demand_daily_skill", "skill_id", "day"),
+    )
+####################################################
+class SalaryHistogram(Base):
+    __tablename__ = 'agg_salary_histogram'
+
+    category_id = Column(Integer, ForeignKey('categories.id'), primary_key=True)
+    experience_level_id = Column(Integer, ForeignKey('experience_levels.id'), primary_key=True)
+    type = Column(String(10), primary_key=True)
+    currency = Column(String(10), primary_key=True)
+    unit = Column(String(10), primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # przedział logarytmiczny środka widełek
+    offers_count = Column(Integer, nullable=False, default=0)
+####################################################
+class CompanyOfferStats(Base):
+    __tablename__ = 'agg_company_offers'
+
+    company_id = Column(Integer, ForeignKey('companies.id'), primary_key=True)
+    offers_count = Column(Integer, nullable=False, default=0)
+    first_published_at = Column(DateTime)
+    last_published_at = Column(DateTime)
@@ -0,0 +1,272 @@
+from array import array
+from datetime import datetime
+from math import nan
+
+# Warstwa normalizacji: każda z wersji (v1/v2/v3) zamieniana jest na jeden
+# kompaktowy rekord, z którego korzystają loadery i dalsze przetwarzanie.
+
+###########################################
+def detect_version(data: dict) -> str:
+    if "guid" in data and "slug" in data and "publishedAt" in data:
+        return "v1"
+    elif "guid" not in data and "slug" in data and "publishedAt" in data:
+        return "v2"
+    elif "id" in data and "published_at" in data:
+        return "v3"
+    return "unknown"
+###########################################
+def parse_datetime(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+###########################################
+class NormalizedLocation:
+    __slots__ = ("city", "street", "latitude", "longitude", "is_main")
+
+    def __init__(self, city, street, latitude, longitude, is_main):
+        self.city = city
+        self.street = street
+        self.latitude = latitude
+        self.longitude = longitude
+        self.is_main = is_main
+###########################################
+class NormalizedSalary:
+    __slots__ = (
+        "type", "currency", "unit", "gross", "from_amount", "to_amount",
+        "from_pln", "to_pln", "from_usd", "to_usd", "from_eur", "to_eur",
+        "from_gbp", "to_gbp", "from_chf", "to_chf",
+    )
+
+    def __init__(self, type, currency, unit, gross, from_amount, to_amount, **converted):
+        self.type = type
+        self.currency = currency
+        self.unit = unit
+        self.gross = gross
+        self.from_amount = from_amount
+        self.to_amount = to_amount
+        for name in NormalizedSalary.__slots__[6:]:
+            setattr(self, name, converted.get(name))
+    ####################################################
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in NormalizedSalary.__slots__}
+###########################################
+class NormalizedOffer:
+    __slots__ = (
+        "version", "original_id", "title", "published_at", "remote_interview",
+        "open_to_hire_ukrainians", "category_id", "category_name",
+        "experience_level", "workplace_type", "working_time",
+        "company_name", "company_logo_url",
+        "slugs", "locations", "required_skills", "nice_skills", "languages", "salaries",
+    )
+
+    def __init__(self, version, original_id, title, published_at, remote_interview,
+                 open_to_hire_ukrainians, category_id, category_name,
+                 experience_level, workplace_type, working_time,
+                 company_name, company_logo_url,
+                 slugs, locations, required_skills, nice_skills, languages, salaries):
+        self.version = version
+        self.original_id = original_id
+        self.title = title
+        self.published_at = published_at
+        self.remote_interview = remote_interview
+        self.open_to_hire_ukrainians = open_to_hire_ukrainians
+        self.category_id = category_id
+        self.category_name = category_name  # None = kategoria wyszukiwana tylko po id
+        self.experience_level = experience_level
+        self.workplace_type = workplace_type
+        self.working_time = working_time
+        self.company_name = company_name
+        self.company_logo_url = company_logo_url
+        self.slugs = slugs  # list[str]
+        self.locations = locations  # list[NormalizedLocation]
+        self.required_skills = required_skills  # list[str]
+        self.nice_skills = nice_skills  # list[str]
+        self.languages = languages  # list[(code, level)]
+        self.salaries = salaries  # list[NormalizedSalary]
+
+###########################################
+def _normalize_v1_v2(data: dict, version: str, original_id: str, category_name) -> NormalizedOffer:
+    slugs = []
+    locations = []
+    multilocations = data.get("multilocation")
+    if multilocations:
+        for i, loc in enumerate(multilocations):
+            slugs.append(loc["slug"])
+            locations.append(NormalizedLocation(
+                loc["city"], loc["street"], loc["latitude"], loc["longitude"], i == 0
+            ))
+    else:
+        slug_value = data.get("slug")
+        if isinstance(slug_value, str):
+            slugs.append(slug_value)
+        locations.append(NormalizedLocation(
+            data["city"], data["street"], data["latitude"], data["longitude"], True
+        ))
+
+    salaries = [
+        NormalizedSalary(
+            et["type"], et["currency"], et["unit"], et["gross"], et["from"], et["to"],
+            from_pln=et.get("fromPln"), to_pln=et.get("toPln"),
+            from_usd=et.get("fromUsd"), to_usd=et.get("toUsd"),
+            from_eur=et.get("fromEur"), to_eur=et.get("toEur"),
+            from_gbp=et.get("fromGbp"), to_gbp=et.get("toGbp"),
+            from_chf=et.get("fromChf"), to_chf=et.get("toChf"),
+        )
+        for et in data.get("employmentTypes", [])
+    ]
+
+    return NormalizedOffer(
+        version=version,
+        original_id=original_id,
+        title=data["title"],
+        published_at=parse_datetime(data.get("publishedAt")),
+        remote_interview=data.get("remoteInterview"),
+        open_to_hire_ukrainians=data.get("openToHireUkrainians"),
+        category_id=data["categoryId"],
+        category_name=category_name,
+        experience_level=data["experienceLevel"],
+        workplace_type=data["workplaceType"],
+        working_time=data["workingTime"],
+        company_name=data["companyName"],
+        company_logo_url=data.get("companyLogoThumbUrl"),
+        slugs=slugs,
+        locations=locations,
+        required_skills=list(data.get("requiredSkills", [])),
+        nice_skills=list(data.get("niceToHaveSkills") or []),
+        languages=[(lang["code"], lang["level"]) for lang in data.get("languages", [])],
+        salaries=salaries,
+    )
+###########################################
+def normalize_v1(data: dict) -> NormalizedOffer:
+    # od 2025-03-21
+    return _normalize_v1_v2(data, "v1", data["guid"], None)
+###########################################
+def normalize_v2(data: dict) -> NormalizedOffer:
+    # od 2023-01-01
+    # do 2025-03-21
+    return _normalize_v1_v2(data, "v2", data["slug"], f"Kategoria {data['categoryId']}")
+###########################################
+def normalize_v3(data: dict) -> NormalizedOffer:
+    # do 2023-12-31
+    slugs = []
+    locations = []
+    multilocations = data.get("multilocation")
+    if multilocations:
+        for i, loc in enumerate(multilocations):
+            if "slug" in loc:
+                slugs.append(loc["slug"])
+            locations.append(NormalizedLocation(
+                loc.get("city", "unknown"),
+                loc.get("street", ""),
+                float(loc["latitude"]) if loc.get("latitude") else None,
+                float(loc["longitude"]) if loc.get("longitude") else None,
+                i == 0,
+            ))
+    else:
+        # slug może być w `id`
+        if data.get("id"):
+            slugs.append(data["id"])
+        locations.append(NormalizedLocation(
+            data.get("city", "unknown"),
+            data.get("street", ""),
+            float(data["latitude"]),
+            float(data["longitude"]),
+            True,
+        ))
+
+    salaries = []
+    for et in data.get("employment_types", []):
+        salary = et.get("salary") or {}
+        salaries.append(NormalizedSalary(
+            et["type"],
+            salary.get("currency"),
+            et.get("unit", "month"),
+            salary.get("gross") if isinstance(salary, dict) else None,
+            salary.get("from"),
+            salary.get("to"),
+        ))
+
+    return NormalizedOffer(
+        version="v3",
+        original_id=data["id"],
+        title=data["title"],
+        published_at=parse_datetime(data.get("published_at")),
+        remote_interview=data.get("remote_interview"),
+        open_to_hire_ukrainians=data.get("open_to_hire_ukrainians", False),
+        category_id=0,
+        category_name="Kategoria 0",
+        experience_level=data["experience_level"],
+        workplace_type=data["workplace_type"],
+        working_time="unknown",
+        company_name=data["company_name"],
+        company_logo_url=data.get("company_logo_url"),
+        slugs=slugs,
+        locations=locations,
+        required_skills=[skill_obj["name"] for skill_obj in data.get("skills", [])],
+        nice_skills=[],
+        languages=[],
+        salaries=salaries,
+    )
+
+NORMALIZERS = {
+    "v1": normalize_v1,
+    "v2": normalize_v2,
+    "v3": normalize_v3,
+}
+###########################################
+def normalize_offer(data: dict):
+    normalizer = NORMALIZERS.get(detect_version(data))
+    if normalizer is None:
+        return None
+    return normalizer(data)
+
+###########################################
+class OfferBatch:
+    # Kolumnowy widok na paczkę rekordów – tablice `array` można przekazać
+    # bez kopiowania do NumPy (np.frombuffer) i przetwarzać wektorowo.
+    __slots__ = ("records", "_columns")
+
+    def __init__(self, records):
+        self.records = list(records)
+        self._columns = None
+    ####################################################
+    def __len__(self):
+        return len(self.records)
+    ####################################################
+    def columns(self) -> dict:
+        if self._columns is None:
+            self._columns = self._build_columns()
+        return self._columns
+    ####################################################
+    def _build_columns(self) -> dict:
+        published_ts = array("d")
+        salary_offer_idx = array("l")
+        salary_from = array("d")
+        salary_to = array("d")
+        salary_gross = array("b")
+        salary_type = []
+        salary_currency = []
+        salary_unit = []
+
+        for i, record in enumerate(self.records):
+            published_ts.append(record.published_at.timestamp() if record.published_at else nan)
+            for salary in record.salaries:
+                salary_offer_idx.append(i)
+                salary_from.append(nan if salary.from_amount is None else float(salary.from_amount))
+                salary_to.append(nan if salary.to_amount is None else float(salary.to_amount))
+                salary_gross.append(-1 if salary.gross is None else int(bool(salary.gross)))
+                salary_type.append(salary.type)
+                salary_currency.append(salary.currency)
+                salary_unit.append(salary.unit)
+
+        return {
+            "published_ts": published_ts,
+            "salary_offer_idx": salary_offer_idx,
+            "salary_from": salary_from,
+            "salary_to": salary_to,
+            "salary_gross": salary_gross,
+            "salary_type": salary_type,
+            "salary_currency": salary_currency,
+            "salary_unit": salary_unit,
+        }
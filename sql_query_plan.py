@@ -0,0 +1,138 @@
+import argparse
+import json
+import logging
+import re
+import sys
+import tempfile
+from pathlib import Path
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+
+from sql_engine import create_sqlite_engine
+from sql_migrate import migrate
+from sql_models import Slug, Scraper, EmploymentType
+from sql_import_offers import import_offers_from_jsonl
+from scraper_db import Database
+
+# Kontrola regresji planów zapytań: uruchamia importer i zapis scrapera na
+# małej próbce, zbiera wykonane zapytania i sprawdza EXPLAIN QUERY PLAN.
+# Zapytanie, które czyta całą tabelę bez indeksu (SCAN <tabela>), jest błędem.
+
+SAMPLE_OFFERS = [
+    {   # v2
+        "slug": "firma-python-developer-krakow", "title": "Python Developer",
+        "publishedAt": "2025-01-10T10:00:00.000Z", "categoryId": 1,
+        "experienceLevel": "mid", "workplaceType": "remote", "workingTime": "full_time",
+        "companyName": "Firma", "companyLogoThumbUrl": None,
+        "city": "Kraków", "street": "Rynek 1", "latitude": 50.06, "longitude": 19.94,
+        "requiredSkills": ["Python"], "niceToHaveSkills": ["Docker"],
+        "languages": [{"code": "en", "level": "B2"}],
+        "employmentTypes": [{"type": "b2b", "currency": "pln", "unit": "month", "gross": False, "from": 1, "to": 2}],
+    },
+    {   # v1
+        "guid": "guid-1", "slug": "firma-data-engineer-warszawa", "title": "Data Engineer",
+        "publishedAt": "2025-04-10T10:00:00.000Z", "categoryId": 1,
+        "experienceLevel": "senior", "workplaceType": "hybrid", "workingTime": "full_time",
+        "companyName": "Firma", "companyLogoThumbUrl": None,
+        "multilocation": [
+            {"slug": "firma-data-engineer-warszawa", "city": "Warszawa", "street": "Prosta 1", "latitude": 52.23, "longitude": 21.01},
+        ],
+        "requiredSkills": ["SQL"], "niceToHaveSkills": [], "languages": [],
+        "employmentTypes": [],
+    },
+    {   # v3
+        "id": "firma-java-developer-wroclaw", "title": "Java Developer",
+        "published_at": "2023-05-10T10:00:00.000Z", "experience_level": "junior",
+        "workplace_type": "office", "company_name": "Firma",
+        "city": "Wrocław", "street": "Rynek 2", "latitude": "51.11", "longitude": "17.03",
+        "skills": [{"name": "Java", "level": 3}],
+        "employment_types": [{"type": "permanent", "salary": {"from": 1, "to": 2, "currency": "pln"}}],
+    },
+]
+
+# Zapytania raportowe / ręczne wyszukiwania, których nie wykonuje import
+REPORT_QUERIES = [
+    select(Slug.offer_id).where(Slug.slug == "x"),
+    select(Scraper.offer_id).where(Scraper.status == "error"),
+    select(EmploymentType).where(EmploymentType.offer_id == 1),
+]
+
+SCAN_RE = re.compile(r"^SCAN (\w+)$")
+
+###########################################
+def collect_statements(workdir: Path) -> list:
+    db_url = f"sqlite:///{workdir / 'plan_check.sqlite'}"
+    engine = create_sqlite_engine(db_url)
+    migrate(engine)
+
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    session = sessionmaker(bind=engine)()
+    lines = [json.dumps(offer) for offer in SAMPLE_OFFERS]
+    # druga kopia pliku – ścieżka duplikatów
+    import_offers_from_jsonl(lines, session, "plan_check_1.jsonl")
+    import_offers_from_jsonl(lines, session, "plan_check_2.jsonl")
+    session.close()
+
+    db = Database(db_url, profile="default")
+    event.listen(db.engine, "before_cursor_execute", _capture)
+    for slug in db.get_unscraped_slugs():
+        db.save_scraper_entry(slug.offer_id, "ok", "url", "<div>notes</div>")
+        for skill in db.get_required_skills_for_offer(slug.offer_id):
+            db.update_skill_level(slug.offer_id, skill.id, 1)
+            db.add_or_update_nice_to_have_skill(slug.offer_id, skill.id, 1)
+    db.close()
+
+    for query in REPORT_QUERIES:
+        statements.append(str(query.compile(engine)))
+
+    engine.dispose()
+    return statements
+###########################################
+def explain(engine, statement: str) -> list:
+    with engine.connect() as conn:
+        params = [None] * statement.count("?")
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(params)).fetchall()
+    return [row[-1] for row in rows]
+###########################################
+def check_query_plans(db_url: str = None) -> list:
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        statements = collect_statements(workdir)
+        engine = create_sqlite_engine(db_url or f"sqlite:///{workdir / 'plan_check.sqlite'}")
+
+        seen = set()
+        for statement in statements:
+            if statement in seen or not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            seen.add(statement)
+            plan = explain(engine, statement)
+            scans = [detail for detail in plan if SCAN_RE.match(detail)]
+            if scans:
+                failures.append((statement, plan))
+                logging.error(f"❌ Pełny skan tabeli: {scans}\n{statement}")
+            else:
+                logging.info(f"✅ {' | '.join(plan)}")
+        engine.dispose()
+    return failures
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sprawdzenie planów zapytań importera i scrapera (EXPLAIN QUERY PLAN)")
+    parser.add_argument("--db", help="URL bazy do sprawdzenia (domyślnie świeża baza ze schematu sql_models)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    failures = check_query_plans(args.db)
+    if failures:
+        logging.error(f"Zapytania z pełnym skanem tabeli: {len(failures)}")
+        return 1
+    logging.info("Wszystkie zapytania korzystają z indeksów")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
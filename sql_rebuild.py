@@ -0,0 +1,274 @@
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from sqlalchemy.orm import Session
+
+from sql_engine import create_sqlite_engine, finish_sqlite
+from sql_migrate import migrate
+from sql_models import Base
+from sql_dead_letter import DeadLetterWriter, DEAD_LETTER_PATH
+from sql_import_s3 import list_archive_files, import_tasks, ImportTask
+from sql_import_offers import FileCursor
+from sql_aggregates import rebuild_aggregates
+from sql_search import rebuild_search_index
+
+# Pełna przebudowa jobs.sqlite z archiwum S3 (np. po zmianie schematu w sql_models).
+# Pliki dzienne – w kolejności importu szeregowego (od najnowszego) – dzielone są
+# na ciągłe zakresy dat; każdy zakres trafia w osobnym procesie do własnej bazy
+# (shardu), a shardy są potem łączone po kolei przez ATTACH i INSERT…SELECT
+# z przemapowaniem identyfikatorów słowników. Wynik jest taki sam jak przy
+# imporcie szeregowym. Archiwum nie zawiera danych scrapera (tabela scraper).
+
+REBUILD_WORKERS = int(os.getenv("SQL_REBUILD_WORKERS", "0")) or max(1, os.cpu_count() or 1)
+
+# Kolejność łączenia tabel (zależności kluczy obcych) i klucz naturalny,
+# po którym wiersz shardu odnajdujemy w bazie docelowej. None – wiersze
+# zawsze dopisywane; keep_id – tabela z jawnymi identyfikatorami.
+MERGE_PLAN = [
+    # (tabela, klucz naturalny, keep_id)
+    ("categories", ("id",), True),
+    ("experience_levels", ("name",), False),
+    ("workplace_types", ("name",), False),
+    ("working_times", ("name",), False),
+    ("companies", ("name",), False),
+    ("offerents", ("name",), False),
+    ("skills", ("name",), False),
+    ("languages", ("code",), False),
+    ("locations", ("company_id", "city", "street", "latitude", "longitude", "is_main"), False),
+    ("offers", ("original_id", "published_at"), False),
+    ("slugs", None, False),
+    ("offer_location_association", None, False),
+    ("required_skill_association", None, False),
+    ("nice_to_have_skill_association", None, False),
+    ("language_association", None, False),
+    ("employment_types", None, False),
+    ("scraper", None, False),
+    ("imported_files", ("filename",), False),
+]
+
+###########################################
+def split_into_shards(files: list, shards: int) -> list:
+    # Ciągłe fragmenty listy o zbliżonej łącznej wielkości plików
+    total = sum(obj["Size"] for obj in files) or 1
+    target = total / shards
+    result = [[]]
+    size = 0
+    for obj in files:
+        if size >= target * len(result) and len(result) < shards:
+            result.append([])
+        result[-1].append(obj)
+        size += obj["Size"]
+    return [shard for shard in result if shard]
+###########################################
+def plan_rebuild(date_from: date = None, date_to: date = None) -> list:
+    tasks = []
+    seen_filenames = set()
+    for obj in list_archive_files(date_from, date_to, reconcile=True):
+        filename = obj["Key"].split("/")[-1]
+        if filename in seen_filenames:
+            continue
+        seen_filenames.add(filename)
+        tasks.append((obj, ImportTask(obj["Key"], filename, 1, FileCursor(), obj["Size"])))
+    return tasks
+###########################################
+def build_shard(shard_id: int, tasks: list, shard_path: str, failed_path: str):
+    # Uruchamiane w procesie roboczym: import zakresu plików do osobnej bazy
+    engine = create_sqlite_engine(f"sqlite:///{shard_path}", profile="rebuild")
+    migrate(engine)
+    session = Session(bind=engine)
+    try:
+        with DeadLetterWriter(failed_path) as dead_letters:
+            stats = import_tasks(tasks, session, dead_letters, download_workers=0)
+    finally:
+        session.close()
+        engine.dispose()
+    logging.info(f"🧩 Shard {shard_id}: {len(tasks)} plików ➜ {shard_path}")
+    return stats, dead_letters.stages.get("import", 0)
+###########################################
+def _columns(table_name: str) -> list:
+    return [column.name for column in Base.metadata.tables[table_name].columns]
+###########################################
+def _remapped(table_name: str, remapped: set) -> dict:
+    # kolumna ➜ tabela słownika, której identyfikatory trzeba przemapować
+    result = {}
+    for column in Base.metadata.tables[table_name].columns:
+        for fk in column.foreign_keys:
+            if fk.column.table.name in remapped:
+                result[column.name] = fk.column.table.name
+    return result
+###########################################
+def merge_table(cursor, table_name: str, key: tuple, keep_id: bool, remapped: set):
+    columns = _columns(table_name)
+    has_id = "id" in columns
+    if has_id and not keep_id:
+        columns.remove("id")
+    fks = _remapped(table_name, remapped)
+
+    joins = "".join(f" LEFT JOIN temp.map_{target} AS m_{col} ON m_{col}.old_id = src.{col}" for col, target in fks.items())
+    values = {col: f"m_{col}.new_id" if col in fks else f"src.{col}" for col in columns}
+    order = "src.id" if has_id else "src.rowid"
+
+    where = ""
+    if key:
+        match = " AND ".join(f"dst.{col} IS {values[col]}" for col in key)
+        where = f" WHERE NOT EXISTS (SELECT 1 FROM main.{table_name} AS dst WHERE {match})"
+
+    cursor.execute(
+        f"INSERT INTO main.{table_name} ({', '.join(columns)}) "
+        f"SELECT {', '.join(values[col] for col in columns)} FROM shard.{table_name} AS src{joins}{where} ORDER BY {order}"
+    )
+    inserted = cursor.rowcount
+
+    if key and has_id and not keep_id:
+        match = " AND ".join(f"dst.{col} IS {values[col]}" for col in key)
+        cursor.execute(f"CREATE TEMP TABLE map_{table_name} (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+        cursor.execute(
+            f"INSERT INTO temp.map_{table_name} (old_id, new_id) "
+            f"SELECT src.id, dst.id FROM shard.{table_name} AS src{joins} JOIN main.{table_name} AS dst ON {match}"
+        )
+        remapped.add(table_name)
+    return inserted
+###########################################
+def needs_serial_import(cursor, import_failures: int) -> str:
+    # Sytuacje, w których wynik shardu zależy od danych z wcześniejszych zakresów
+    # – taki shard importujemy szeregowo do bazy docelowej
+    if not cursor.execute("SELECT 1 FROM main.offers LIMIT 1").fetchone():
+        return None
+    duplicates = cursor.execute(
+        "SELECT count(*) FROM shard.offers AS src JOIN main.offers AS dst "
+        "ON dst.original_id = src.original_id AND dst.published_at = src.published_at"
+    ).fetchone()[0]
+    if duplicates:
+        return f"{duplicates} ofert występuje też we wcześniejszych zakresach"
+    conflicts = cursor.execute(
+        "SELECT count(*) FROM shard.categories AS src JOIN main.categories AS dst "
+        "ON dst.id = src.id WHERE dst.name IS NOT src.name"
+    ).fetchone()[0]
+    if conflicts:
+        return f"{conflicts} kategorii ma inną nazwę niż we wcześniejszych zakresach"
+    if import_failures:
+        # np. oferta z samym categoryId – przy imporcie szeregowym kategoria mogła
+        # już istnieć dzięki wcześniejszym zakresom (błędy parsowania nie zależą od bazy)
+        return f"{import_failures} linii nie zapisało się do bazy shardu"
+    return None
+###########################################
+def merge_shard(cursor, shard_path: str, import_failures: int) -> tuple:
+    cursor.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        reason = needs_serial_import(cursor, import_failures)
+        if reason:
+            return None, reason
+        remapped = set()
+        inserted = {}
+        cursor.execute("BEGIN")
+        try:
+            for table_name, key, keep_id in MERGE_PLAN:
+                inserted[table_name] = merge_table(cursor, table_name, key, keep_id, remapped)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            for table_name in remapped:
+                cursor.execute(f"DROP TABLE temp.map_{table_name}")
+        return inserted, None
+    finally:
+        cursor.execute("DETACH DATABASE shard")
+###########################################
+def _append_dead_letters(source: Path, target: Path):
+    if source.exists():
+        with open(source, "rb") as src, open(target, "ab") as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                dst.write(chunk)
+        source.unlink()
+###########################################
+def _finish_rebuild(engine):
+    # Shardy importowane są bez AggregateSink i SearchSink – agregaty i indeks
+    # wyszukiwania liczymy raz dla całej bazy
+    with Session(bind=engine) as session:
+        rebuild_aggregates(session)
+        rebuild_search_index(session)
+    finish_sqlite(engine, analyze=True)
+###########################################
+def rebuild_database(output: Path, date_from: date = None, date_to: date = None, workers: int = REBUILD_WORKERS,
+                     failed_path: Path = Path(DEAD_LETTER_PATH)):
+    output = Path(output)
+    tasks = plan_rebuild(date_from, date_to)
+    shards = split_into_shards([obj for obj, _ in tasks], max(1, workers))
+    task_by_key = {obj["Key"]: task for obj, task in tasks}
+    shard_tasks = [[task_by_key[obj["Key"]] for obj in shard] for shard in shards]
+    logging.info(f"🏗 Przebudowa {output}: {len(tasks)} plików w {len(shard_tasks)} zakresach")
+
+    engine = create_sqlite_engine(f"sqlite:///{output}", profile="rebuild")
+    migrate(engine)
+
+    totals = [0, 0, 0, 0, 0, 0]
+    if len(shard_tasks) <= 1:
+        # jeden zakres – zwykły import szeregowy prosto do bazy docelowej
+        session = Session(bind=engine)
+        try:
+            with DeadLetterWriter(failed_path) as dead_letters:
+                totals = list(import_tasks(shard_tasks[0] if shard_tasks else [], session, dead_letters, download_workers=0))
+        finally:
+            session.close()
+        _finish_rebuild(engine)
+        return len(tasks), *totals
+
+    shard_paths = [output.with_name(f"{output.stem}.shard{i}.sqlite") for i in range(len(shard_tasks))]
+    shard_failed = [output.with_name(f"{output.stem}.shard{i}.failed.jsonl") for i in range(len(shard_tasks))]
+    for path in shard_paths + shard_failed:
+        path.unlink(missing_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(build_shard, i, shard_tasks[i], str(shard_paths[i]), str(shard_failed[i]))
+            for i in range(len(shard_tasks))
+        ]
+        # łączenie w kolejności zakresów, gdy tylko kolejny shard jest gotowy
+        with engine.connect() as conn:
+            for i, future in enumerate(futures):
+                stats, import_failures = future.result()
+                cursor = conn.connection.driver_connection.cursor()
+                inserted, reason = merge_shard(cursor, str(shard_paths[i]), import_failures)
+                cursor.close()
+                if reason:
+                    logging.warning(f"⚠️ Shard {i}: {reason} – import szeregowy zakresu")
+                    session = Session(bind=conn)
+                    try:
+                        with DeadLetterWriter(failed_path) as dead_letters:
+                            stats = import_tasks(shard_tasks[i], session, dead_letters, download_workers=0)
+                    finally:
+                        session.close()
+                    shard_failed[i].unlink(missing_ok=True)
+                else:
+                    logging.info(f"🔗 Shard {i} dołączony: {inserted.get('offers', 0)} ofert")
+                    _append_dead_letters(shard_failed[i], Path(failed_path))
+                shard_paths[i].unlink()
+                totals = [total + value for total, value in zip(totals, stats)]
+
+    _finish_rebuild(engine)
+    files_imported, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate = totals
+    logging.info(
+        f"✅ Przebudowa zakończona: plików {files_imported}/{len(tasks)} (błędy: {files_failed}), "
+        f"ofert {offers_ok}/{offers_total}, duplikaty: {offers_duplikate}, błędne: {offers_failed}"
+    )
+    return len(tasks), files_imported, files_failed, offers_total, offers_ok, offers_failed, offers_duplikate
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pełna przebudowa bazy SQLite z archiwum ofert w S3 (równoległe shardy)")
+    parser.add_argument("output", help="ścieżka nowej bazy (plik nie może istnieć)")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS, help="liczba procesów / zakresów dat")
+    parser.add_argument("--date-from", type=date.fromisoformat, help="pierwszy dzień (RRRR-MM-DD)")
+    parser.add_argument("--date-to", type=date.fromisoformat, help="ostatni dzień (RRRR-MM-DD)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    rebuild_database(Path(args.output), args.date_from, args.date_to, args.workers)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
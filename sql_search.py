@@ -0,0 +1,135 @@
+import html
+import logging
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from sql_import_offers import ImportSink
+
+# Pełnotekstowe wyszukiwanie ofert (SQLite FTS5) po tytule oraz zescrapowanym
+# opisie (notes – HTML zamieniony na tekst) i wymaganiach. rowid = offers.id.
+# Importer dopisuje tytuły (SearchSink), scraper – opis (index_scraped_offer),
+# braki uzupełnia sync_search_index.
+SEARCH_TABLE = "offers_fts"
+# waga kolumn w bm25: tytuł, opis, wymagania
+SEARCH_WEIGHTS = (10.0, 1.0, 2.0)
+
+# remove_diacritics 2 – "krakow" znajduje "Kraków"; "+#" jako część słowa dla C++ / C#
+CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, notes, requirements, "
+    "tokenize = \"unicode61 remove_diacritics 2 tokenchars '+#'\")"
+)
+
+_SCRIPT_RE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+_TERM_RE = re.compile(r"[\w+#]+")
+
+###########################################
+def html_to_text(value):
+    # Treść notes bez znaczników, encji i nadmiarowych białych znaków
+    if not value:
+        return value
+    value = _TAG_RE.sub(" ", _SCRIPT_RE.sub(" ", value))
+    return _SPACE_RE.sub(" ", html.unescape(value)).strip()
+###########################################
+def _as_text(value):
+    # wymagania z parsera GPT mogą być listą
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(item) for item in value)
+    return value
+###########################################
+def to_fts_query(query: str, prefix: bool = True) -> str:
+    # Słowa z zapytania użytkownika ➜ bezpieczne zapytanie FTS5 (wszystkie słowa, prefiksowo)
+    terms = _TERM_RE.findall(query)
+    suffix = "*" if prefix else ""
+    return " ".join(f'"{term}"{suffix}' for term in terms)
+###########################################
+def _register_functions(session: Session):
+    # html_text() w SQL – pełne przeliczenie indeksu bez pobierania opisów do Pythona
+    session.connection().connection.driver_connection.create_function("html_text", 1, html_to_text, deterministic=True)
+
+###########################################
+def create_search_index(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(CREATE_SEARCH_TABLE)
+###########################################
+def sync_search_index(session: Session) -> int:
+    # Dopisanie ofert, których nie ma w indeksie (pierwsze uruchomienie, importy bez SearchSink)
+    _register_functions(session)
+    added = session.execute(text(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, title, notes, requirements)
+        SELECT o.id, o.title, html_text(s.notes), s.requirements
+        FROM offers o LEFT JOIN scraper s ON s.offer_id = o.id AND s.status = 'ok'
+        WHERE NOT EXISTS (SELECT 1 FROM {SEARCH_TABLE} f WHERE f.rowid = o.id)
+        ORDER BY o.id
+    """)).rowcount
+    session.commit()
+    if added:
+        logging.info(f"🔎 Dodano {added} ofert do indeksu wyszukiwania")
+    return added
+###########################################
+def rebuild_search_index(session: Session):
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    sync_search_index(session)
+    # scalenie segmentów FTS5 po masowym zapisie
+    session.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+    session.commit()
+###########################################
+def index_scraped_offer(session: Session, offer_id: int, notes, requirements):
+    # Wywoływane przez scraper w transakcji zapisu wpisu Scraper
+    values = {"offer_id": offer_id, "notes": html_to_text(notes), "requirements": _as_text(requirements)}
+    updated = session.execute(text(
+        f"UPDATE {SEARCH_TABLE} SET notes = :notes, requirements = :requirements WHERE rowid = :offer_id"
+    ), values).rowcount
+    if not updated:
+        session.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, notes, requirements)
+            SELECT id, title, :notes, :requirements FROM offers WHERE id = :offer_id
+        """), values)
+
+###########################################
+class SearchSink(ImportSink):
+    def __init__(self):
+        self.rows = []
+    ####################################################
+    def add(self, record, offer_id: int):
+        self.rows.append({"offer_id": offer_id, "title": record.title})
+    ####################################################
+    def flush(self, session: Session):
+        if self.rows:
+            session.execute(text(
+                f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title) VALUES (:offer_id, :title)"
+            ), self.rows)
+        self.rows = []
+    ####################################################
+    def commit(self):
+        self.rows = []
+    ####################################################
+    def rollback(self):
+        self.rows = []
+
+###########################################
+def search_offers(session: Session, query: str, limit: int = 50, raw: bool = False, with_scores: bool = False) -> list:
+    # Id ofert od najlepiej dopasowanej (bm25); raw=True – składnia FTS5 bez zmian
+    match = query if raw else to_fts_query(query)
+    if not match:
+        return []
+    rows = session.execute(text(f"""
+        SELECT rowid, bm25({SEARCH_TABLE}, {", ".join(str(weight) for weight in SEARCH_WEIGHTS)}) AS score
+        FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match
+        ORDER BY score LIMIT :limit
+    """), {"match": match, "limit": limit}).all()
+    if with_scores:
+        return [(offer_id, score) for offer_id, score in rows]
+    return [offer_id for offer_id, _ in rows]
+###########################################
+def like_search(session: Session, keyword: str, limit: int = 50) -> list:
+    # Dotychczasowe wyszukiwanie (LIKE po HTML) – punkt odniesienia dla bench_search.py
+    pattern = f"%{keyword}%"
+    return session.execute(text("""
+        SELECT o.id FROM offers o LEFT JOIN scraper s ON s.offer_id = o.id
+        WHERE o.title LIKE :pattern OR s.notes LIKE :pattern OR s.requirements LIKE :pattern
+        LIMIT :limit
+    """), {"pattern": pattern, "limit": limit}).scalars().all()
@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from client_s3 import S3Client, compression_enabled, compress_bytes, decompress_bytes, ZSTD_SUFFIX
+
+load_dotenv()
+
+# Synchronizacja jobs.sqlite z S3 porcjami zamiast całego pliku. Plik dzielony
+# jest na porcje o stałym rozmiarze (wielokrotność strony SQLite – baza zmienia
+# strony w miejscu, więc niezmienione porcje mają ten sam hash). Porcje leżą
+# w S3 pod kluczem = sha256 treści, a każda wersja bazy to manifest z listą
+# hashy. HEAD.json wskazuje bieżącą wersję; starsze można odtworzyć (pull --version).
+# Przy SQLITE_COMPRESSION=zstd porcje zapisywane są skompresowane (<hash>.zst).
+SYNC_PREFIX = os.getenv("SQLITE_SYNC_PREFIX", "jobs/sql/chunks")
+SYNC_CHUNK_SIZE = int(os.getenv("SQLITE_SYNC_CHUNK_SIZE", str(1024 * 1024)))
+SYNC_WORKERS = int(os.getenv("SQLITE_SYNC_WORKERS", "8"))
+
+###########################################
+def sqlite_page_size(path) -> int:
+    # Rozmiar strony z nagłówka pliku SQLite (bajty 16-17, wartość 1 = 65536)
+    with open(path, "rb") as f:
+        header = f.read(100)
+    if len(header) < 18 or not header.startswith(b"SQLite format 3\x00"):
+        return 4096
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+###########################################
+def aligned_chunk_size(chunk_size: int, page_size: int) -> int:
+    return max(page_size, chunk_size - chunk_size % page_size)
+###########################################
+def file_chunks(path, chunk_size: int):
+    # (lista hashy porcji, sha256 całego pliku, rozmiar)
+    hashes = []
+    whole = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            hashes.append(hashlib.sha256(data).hexdigest())
+            whole.update(data)
+            size += len(data)
+    return hashes, whole.hexdigest(), size
+
+###########################################
+class SqliteChunkSync:
+    def __init__(self, s3: S3Client, prefix: str = SYNC_PREFIX, chunk_size: int = SYNC_CHUNK_SIZE, workers: int = SYNC_WORKERS):
+        self.s3 = s3
+        self.prefix = prefix.rstrip("/")
+        self.chunk_size = chunk_size
+        self.workers = max(1, workers)
+    ####################################################
+    @property
+    def head_key(self) -> str:
+        return f"{self.prefix}/HEAD.json"
+    ####################################################
+    def version_key(self, version: str) -> str:
+        return f"{self.prefix}/versions/{version}.json"
+    ####################################################
+    def chunk_key(self, chunk_hash: str, compression: str = None) -> str:
+        suffix = ZSTD_SUFFIX if compression == "zstd" else ""
+        return f"{self.prefix}/data/{chunk_hash[:2]}/{chunk_hash}{suffix}"
+    ####################################################
+    @staticmethod
+    def state_path(local_path) -> Path:
+        # manifest ostatnio zsynchronizowanej wersji (odpowiednik pliku .etag)
+        return Path(f"{local_path}.sync.json")
+    ####################################################
+    def _get_json(self, key: str):
+        try:
+            response = self.s3.s3_client.get_object(Bucket=self.s3.bucket_name, Key=key)
+            return json.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+    ####################################################
+    def _put_json(self, key: str, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.s3.s3_client.put_object(Bucket=self.s3.bucket_name, Key=key, Body=body, ContentType="application/json")
+    ####################################################
+    def load_head(self):
+        return self._get_json(self.head_key)
+    ####################################################
+    def load_version(self, version: str):
+        return self._get_json(self.version_key(version))
+    ####################################################
+    def list_versions(self) -> list:
+        prefix = f"{self.prefix}/versions/"
+        return sorted(key[len(prefix):-len(".json")] for key in self.s3.list_keys(prefix) if key.endswith(".json"))
+    ####################################################
+    def _load_state(self, local_path):
+        path = self.state_path(local_path)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            return None
+    ####################################################
+    def _save_state(self, local_path, manifest: dict):
+        path = self.state_path(local_path)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp, path)
+
+    ####################################################
+    def push(self, local_path, update_head: bool = True, label: str = "main"):
+        # Wysyła brakujące porcje i zapisuje nową wersję. update_head=False –
+        # wersja tylko jako kopia (np. lokalna baza przed nadpisaniem), bez zmiany HEAD.
+        # Zwraca manifest wersji albo None przy błędzie.
+        try:
+            chunk_size = aligned_chunk_size(self.chunk_size, sqlite_page_size(local_path))
+            compression = "zstd" if compression_enabled() else None
+            hashes, sha256, size = file_chunks(local_path, chunk_size)
+            head = self.load_head()
+            state = self._load_state(local_path)
+            for known in (head, state):
+                if known and known["sha256"] == sha256 and (not update_head or known is head):
+                    logging.info(f"✅ Baza bez zmian względem wersji {known['version']} – pomijam wysyłanie")
+                    return known
+
+            # porcje z HEAD na pewno są w S3; pozostałe wysyłamy (zapis jest idempotentny)
+            same_layout = head and head["chunk_size"] == chunk_size and head.get("compression") == compression
+            uploaded = set(head["chunks"]) if same_layout else set()
+            missing = {}
+            for index, chunk_hash in enumerate(hashes):
+                if chunk_hash not in uploaded and chunk_hash not in missing:
+                    missing[chunk_hash] = index
+
+            def upload(item):
+                chunk_hash, index = item
+                with open(local_path, "rb") as f:
+                    f.seek(index * chunk_size)
+                    data = f.read(chunk_size)
+                if compression:
+                    data = compress_bytes(data)
+                self.s3.s3_client.put_object(Bucket=self.s3.bucket_name, Key=self.chunk_key(chunk_hash, compression), Body=data)
+                return len(data)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                sent = sum(executor.map(upload, missing.items()))
+
+            created_at = datetime.now(timezone.utc)
+            manifest = {
+                "format": 1,
+                "version": f"{created_at.strftime('%Y%m%d_%H%M%S')}_{sha256[:12]}",
+                "label": label,
+                "created_at": created_at.isoformat(),
+                "parent": head["version"] if head else None,
+                "size": size,
+                "chunk_size": chunk_size,
+                "compression": compression,
+                "sha256": sha256,
+                "chunks": hashes,
+            }
+            self._put_json(self.version_key(manifest["version"]), manifest)
+            if update_head:
+                self._put_json(self.head_key, manifest)
+                self._save_state(local_path, manifest)
+            logging.info(
+                f"📤 Wersja bazy {manifest['version']} ({label}): wysłano {len(missing)}/{len(hashes)} porcji "
+                f"({sent / 1024 / 1024:.1f} MiB z {size / 1024 / 1024:.1f} MiB)"
+            )
+            return manifest
+        except Exception as e:
+            logging.error(f"❌ Błąd podczas wysyłania bazy porcjami: {e}")
+            return None
+    ####################################################
+    def pull(self, local_path, version: str = None):
+        # Doprowadza plik lokalny do wersji z S3 (domyślnie HEAD), pobierając tylko
+        # porcje, które różnią się od lokalnych. None – brak wersji w S3,
+        # False – błąd (plik lokalny bez zmian), True – plik zgodny z wersją.
+        local_path = Path(local_path)
+        tmp_path = Path(f"{local_path}.sync-tmp")
+        try:
+            manifest = self.load_version(version) if version else self.load_head()
+            if manifest is None:
+                if version:
+                    logging.error(f"❌ Brak wersji bazy {version} w S3")
+                    return False
+                logging.info(f"ℹ️ Brak wersji bazy w {self.prefix}")
+                return None
+
+            chunk_size = manifest["chunk_size"]
+            compression = manifest.get("compression")
+            local_hashes = []
+            if local_path.exists():
+                local_hashes, sha256, _ = file_chunks(local_path, chunk_size)
+                if sha256 == manifest["sha256"]:
+                    self._save_state(local_path, manifest)
+                    logging.info(f"✅ Lokalna baza zgodna z wersją {manifest['version']} – pomijam pobieranie")
+                    return True
+
+            needed = {}
+            for index, chunk_hash in enumerate(manifest["chunks"]):
+                if index >= len(local_hashes) or local_hashes[index] != chunk_hash:
+                    needed.setdefault(chunk_hash, []).append(index)
+
+            # nowy plik obok: kopia lokalnego + pobrane porcje w miejscu różnic
+            if local_path.exists():
+                shutil.copyfile(local_path, tmp_path)
+            else:
+                local_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.touch()
+            os.truncate(tmp_path, manifest["size"])
+            fd = os.open(tmp_path, os.O_WRONLY)
+            try:
+                def download(item):
+                    chunk_hash, indexes = item
+                    response = self.s3.s3_client.get_object(Bucket=self.s3.bucket_name, Key=self.chunk_key(chunk_hash, compression))
+                    data = response["Body"].read()
+                    wire_size = len(data)
+                    if compression == "zstd":
+                        data = decompress_bytes(data)
+                    if hashlib.sha256(data).hexdigest() != chunk_hash:
+                        raise ValueError(f"Uszkodzona porcja {chunk_hash}")
+                    for index in indexes:
+                        os.pwrite(fd, data, index * chunk_size)
+                    return wire_size
+
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    received = sum(executor.map(download, needed.items()))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            _, sha256, _ = file_chunks(tmp_path, chunk_size)
+            if sha256 != manifest["sha256"]:
+                raise ValueError(f"Suma kontrolna bazy nie zgadza się z wersją {manifest['version']}")
+            # WAL i SHM należą do poprzedniego pliku bazy
+            for suffix in ("-wal", "-shm"):
+                Path(f"{local_path}{suffix}").unlink(missing_ok=True)
+            os.replace(tmp_path, local_path)
+            self._save_state(local_path, manifest)
+            logging.info(
+                f"📥 Pobrano wersję bazy {manifest['version']}: {len(needed)}/{len(manifest['chunks'])} porcji "
+                f"({received / 1024 / 1024:.1f} MiB z {manifest['size'] / 1024 / 1024:.1f} MiB)"
+            )
+            return True
+        except Exception as e:
+            logging.error(f"❌ Błąd podczas pobierania bazy porcjami: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+###########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronizacja jobs.sqlite z S3 porcjami")
+    parser.add_argument("command", choices=["push", "pull", "versions"])
+    parser.add_argument("--path", default="data/sql/jobs.sqlite", help="lokalny plik bazy")
+    parser.add_argument("--version", help="wersja do odtworzenia (pull)")
+    parser.add_argument("--prefix", default=SYNC_PREFIX)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    sync = SqliteChunkSync(S3Client(), prefix=args.prefix)
+    if args.command == "versions":
+        for version in sync.list_versions():
+            print(version)
+        return 0
+    if args.command == "push":
+        return 0 if sync.push(args.path) else 1
+    return 0 if sync.pull(args.path, version=args.version) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())